@@ -0,0 +1,63 @@
+"""Fault-injecting stand-in for the upstream providers.
+
+Every POST is answered according to a queue of planned outcomes; when the queue
+is empty it answers normally. Plan entries:
+
+    "ok"            200 with a minimal chat completion (or image bytes under /v2beta)
+    "<status>"      that status, e.g. "503"
+    "<status>:<s>"  that status with `Retry-After: <s>`, e.g. "429:1"
+    "hang:<s>"      sleep <s> seconds before answering "ok"
+
+    cd backend && uvicorn bench.fault_stub:app --port 9200
+    curl -XPOST localhost:9200/_plan -d '["503", "429:1", "ok"]'
+"""
+import asyncio
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+app = FastAPI()
+
+plan = []
+calls = {"total": 0}
+
+# Smallest valid PNG (1x1), so image clients have something real to store.
+PNG_1PX = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100ffff03000006000557bfabd40000000049454e44ae426082"
+)
+
+
+def completion(content: str) -> dict:
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+@app.post("/_plan")
+async def set_plan(request: Request):
+    plan[:] = json.loads(await request.body())
+    calls["total"] = 0
+    return {"plan": plan}
+
+
+@app.get("/_calls")
+async def get_calls():
+    return calls
+
+
+@app.post("/{path:path}")
+async def upstream(path: str, request: Request):
+    calls["total"] += 1
+    outcome = plan.pop(0) if plan else "ok"
+
+    if outcome.startswith("hang:"):
+        await asyncio.sleep(float(outcome.split(":", 1)[1]))
+        outcome = "ok"
+    if outcome != "ok":
+        status, _, retry_after = outcome.partition(":")
+        headers = {"Retry-After": retry_after} if retry_after else {}
+        return JSONResponse({"error": f"planned {status}"}, status_code=int(status), headers=headers)
+
+    if path.startswith("v2beta"):
+        return Response(PNG_1PX, media_type="image/png")
+    return completion("ok")
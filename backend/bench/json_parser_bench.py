@@ -0,0 +1,115 @@
+"""Compare the legacy regex cleanup chain with services.llm_json_service.
+
+Runs both over the captured LLM outputs in bench/corpus and reports, per file,
+whether each approach parsed it and how long a parse takes.
+
+    cd backend && python -m bench.json_parser_bench [--iterations 2000] [--json out.json]
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import re
+import time
+
+from services import llm_json_service
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+
+def legacy_parse(raw_text: str):
+    """The cleanup chain the routers used before llm_json_service."""
+    if raw_text.strip().startswith("```json"):
+        raw_text = raw_text.strip()[7:-3].strip()
+    elif raw_text.strip().startswith("```"):
+        raw_text = raw_text.strip()[3:-3].strip()
+
+    match = re.search(r"\{.*\}", raw_text, re.DOTALL)
+    if not match:
+        raise ValueError("No valid JSON found.")
+    json_block = match.group(0)
+
+    json_block = re.sub(r"\[\d+\]", "", json_block)
+    json_block = json_block.replace("‘", "'").replace("’", "'").replace("“", "\"").replace("”", "\"")
+    json_block = re.sub(r'([{,]\s*)([a-zA-Z_][a-zA-Z0-9_]*)(\s*):', r'\1"\2"\3:', json_block)
+    json_block = re.sub(r",\s*(\}|\])", r"\1", json_block)
+
+    try:
+        return json.loads(json_block)
+    except json.JSONDecodeError:
+        return ast.literal_eval(json_block)
+
+
+def streaming_parse(text: str, chunk_size: int = 24):
+    parser = llm_json_service.StreamingParser()
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i:i + chunk_size])
+    return parser.close()
+
+
+def time_per_call(fn, text: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        try:
+            fn(text)
+        except Exception:
+            pass
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(iterations: int) -> dict:
+    results = []
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+
+        try:
+            legacy_value = legacy_parse(text)
+            legacy_ok = True
+        except Exception:
+            legacy_value = None
+            legacy_ok = False
+        value = llm_json_service.parse_llm_json(text)
+
+        results.append({
+            "file": os.path.basename(path),
+            "bytes": len(text.encode("utf-8")),
+            "legacyOk": legacy_ok,
+            "legacyMatches": legacy_ok and legacy_value == value,
+            "streamMatches": streaming_parse(text) == value,
+            "legacyUs": round(time_per_call(legacy_parse, text, iterations), 2),
+            "parserUs": round(time_per_call(llm_json_service.parse_llm_json, text, iterations), 2),
+            "streamUs": round(time_per_call(streaming_parse, text, iterations), 2),
+        })
+
+    return {
+        "iterations": iterations,
+        "files": results,
+        "legacyParsed": sum(r["legacyOk"] for r in results),
+        "total": len(results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    report = run(args.iterations)
+    print(f"{'file':38} {'bytes':>6} {'legacy':>7} {'same':>5} {'legacy µs':>10} {'parser µs':>10} {'stream µs':>10}")
+    for r in report["files"]:
+        print(
+            f"{r['file']:38} {r['bytes']:>6} {'ok' if r['legacyOk'] else 'FAIL':>7} "
+            f"{'yes' if r['legacyMatches'] else 'no':>5} {r['legacyUs']:>10} {r['parserUs']:>10} {r['streamUs']:>10}"
+        )
+    print(f"\nlegacy chain parsed {report['legacyParsed']}/{report['total']} files; llm_json_service parsed {report['total']}/{report['total']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,606 @@
+"""Replay campaign payloads against every router and report throughput and latency.
+
+    cd backend && python -m bench.load_test --start --duration 60 --concurrency 16
+    python -m bench.load_test --start --workers 4 --mock-args "--llm-latency 2 --error-rate 0.02"
+    python -m bench.load_test --base-url http://127.0.0.1:8000 --scenarios script=2,campaign=1
+    python -m bench.load_test --start --compare bench/results/<earlier run>.json
+
+--start launches bench.mock_upstream and the app (uvicorn with --workers) on
+free ports with throwaway state, so nothing real is called. Without it the app
+at --base-url must already point at a mock. Each request gets a unique
+description unless --cache-hits is given, so the LLM cache doesn't turn the run
+into a cache benchmark.
+
+Reports requests/s, p50/p95/p99 latency (and time to first byte for streams)
+per scenario, plus saturation sampled from /stats and /metrics (in-flight
+requests, upstream calls, queued jobs and rate-limited calls, worker CPU).
+Results are written to bench/results/<time>-<commit>.json (or --json) for
+comparing commits with --compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+DEFAULT_MIX = {
+    "recommendation": 2, "recommendation_stream": 1, "ad_types": 2, "questions": 2, "script": 2,
+    "script_stream": 1, "image_ad": 1, "image_variants": 1, "campaign": 3, "asset": 3, "trends": 1,
+}
+
+PARSER = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+PARSER.add_argument("--base-url", default="http://127.0.0.1:8000")
+PARSER.add_argument("--start", action="store_true", help="start the mock upstream and the app")
+PARSER.add_argument("--workers", type=int, default=1, help="app worker processes with --start")
+PARSER.add_argument("--mock-args", default="", help="extra arguments for bench.mock_upstream with --start")
+PARSER.add_argument("--duration", type=float, default=30, help="seconds of load after setup")
+PARSER.add_argument("--concurrency", type=int, default=8, help="closed-loop clients (ignored with --rate)")
+PARSER.add_argument("--rate", type=float, help="open loop: requests per second (Poisson arrivals)")
+PARSER.add_argument("--scenarios", help="name=weight,... (default: every scenario)")
+PARSER.add_argument("--payloads", default=os.path.join(BENCH_DIR, "payloads", "campaigns.json"))
+PARSER.add_argument("--cache-hits", action="store_true", help="reuse payloads verbatim so LLM calls can hit the cache")
+PARSER.add_argument("--sample-interval", type=float, default=1.0)
+PARSER.add_argument("--timeout", type=float, default=180)
+PARSER.add_argument("--seed", type=int, default=1)
+PARSER.add_argument("--label", default="", help="free text stored with the results")
+PARSER.add_argument("--json", help="results file (default: bench/results/<time>-<commit>.json)")
+PARSER.add_argument("--compare", help="earlier results file to compare against")
+PARSER.add_argument("--threshold", type=float, default=0.10, help="relative change flagged by --compare")
+
+VARIANTS = [
+    {"aspectRatio": "1:1", "format": "png"},
+    {"aspectRatio": "16:9", "format": "webp", "width": 640},
+    {"aspectRatio": "9:16", "format": "jpeg", "width": 540},
+]
+
+
+class Context:
+    """What scenarios share: the client, payloads and what earlier requests created."""
+
+    def __init__(self, client: httpx.AsyncClient, profiles: list, unique: bool, seed: int):
+        self.client = client
+        self.profiles = profiles
+        self.unique = unique
+        self.rng = random.Random(seed)
+        self.run_id = f"{int(time.time()):x}"
+        self.counter = 0
+        self.campaigns = []
+        self.assets = []
+
+    def nonce(self) -> str:
+        self.counter += 1
+        return f" [{self.run_id}-{self.counter}]" if self.unique else ""
+
+    def profile(self) -> dict:
+        profile = dict(self.rng.choice(self.profiles))
+        profile["businessDescription"] += self.nonce()
+        return profile
+
+    def campaign(self):
+        return self.rng.choice(self.campaigns) if self.campaigns else None
+
+    def remember(self, body: dict):
+        if body.get("campaignId"):
+            platforms = [p["name"] for p in body.get("recommendedPlatforms", [])] or ["Instagram"]
+            self.campaigns.append({"id": body["campaignId"], "platforms": platforms})
+
+    def answers(self) -> dict:
+        return {
+            "What product or offer should the ad feature?": "20% off the first month" + self.nonce(),
+            "Who is the target audience?": "Busy professionals nearby",
+            "What action should people take after seeing the ad?": "Book online",
+        }
+
+
+class Skip(Exception):
+    """The scenario has nothing to work on yet (e.g. no campaign was created)."""
+
+
+async def read_stream(response: httpx.Response, started: float) -> float:
+    ttfb = None
+    async for _ in response.aiter_bytes():
+        if ttfb is None:
+            ttfb = time.perf_counter() - started
+    return ttfb if ttfb is not None else time.perf_counter() - started
+
+
+async def recommendation(ctx: Context):
+    response = await ctx.client.post("/recommendation/generate-recommendation", json=ctx.profile())
+    if response.status_code == 200:
+        ctx.remember(response.json())
+    return response.status_code, None
+
+
+async def recommendation_stream(ctx: Context):
+    started = time.perf_counter()
+    async with ctx.client.stream("POST", "/recommendation/generate-recommendation/stream", json=ctx.profile()) as response:
+        ttfb = await read_stream(response, started)
+    return response.status_code, ttfb
+
+
+def pick_campaign(ctx: Context):
+    campaign = ctx.campaign()
+    if campaign is None:
+        raise Skip()
+    return campaign, ctx.rng.choice(campaign["platforms"])
+
+
+async def ad_types(ctx: Context):
+    campaign, platform = pick_campaign(ctx)
+    response = await ctx.client.post("/script/ask-questions", json={"platform": platform, "campaignId": campaign["id"]})
+    return response.status_code, None
+
+
+async def questions(ctx: Context):
+    campaign, platform = pick_campaign(ctx)
+    response = await ctx.client.post(
+        "/script/ask-questions/Video Ad", json={"platform": platform, "campaignId": campaign["id"]}
+    )
+    return response.status_code, None
+
+
+def script_body(ctx: Context) -> dict:
+    campaign, platform = pick_campaign(ctx)
+    return {"platform": platform, "adType": "Video Ad", "answers": ctx.answers(), "campaignId": campaign["id"]}
+
+
+async def script(ctx: Context):
+    response = await ctx.client.post("/script/generate-script", json=script_body(ctx))
+    return response.status_code, None
+
+
+async def script_stream(ctx: Context):
+    started = time.perf_counter()
+    async with ctx.client.stream("POST", "/script/generate-script/stream", json=script_body(ctx)) as response:
+        ttfb = await read_stream(response, started)
+    return response.status_code, ttfb
+
+
+def image_body(ctx: Context) -> dict:
+    campaign, _ = pick_campaign(ctx)
+    return {"campaignId": campaign["id"], "scriptQA": ctx.answers(), "script": "Visit us this weekend."}
+
+
+async def image_ad(ctx: Context):
+    response = await ctx.client.post("/generate-image-ad", json=image_body(ctx))
+    if response.status_code == 200:
+        ctx.assets.append(response.json()["imageUrl"])
+    return response.status_code, None
+
+
+async def image_variants(ctx: Context):
+    body = {**image_body(ctx), "variants": VARIANTS}
+    response = await ctx.client.post("/generate-image-variants", json=body)
+    return response.status_code, None
+
+
+async def campaign(ctx: Context):
+    found, _ = pick_campaign(ctx)
+    response = await ctx.client.get(f"/campaigns/{found['id']}")
+    return response.status_code, None
+
+
+async def asset(ctx: Context):
+    if not ctx.assets:
+        raise Skip()
+    started = time.perf_counter()
+    async with ctx.client.stream("GET", ctx.rng.choice(ctx.assets)) as response:
+        ttfb = await read_stream(response, started)
+    return response.status_code, ttfb
+
+
+async def trends(ctx: Context):
+    profile = ctx.profile()
+    body = {key: profile[key] for key in ("businessName", "businessDescription", "industry", "location")}
+    response = await ctx.client.post("/market-trends", json=body)
+    return response.status_code, None
+
+
+async def content(ctx: Context):
+    response = await ctx.client.post("/content/generate-content", json=ctx.profile())
+    return response.status_code, None
+
+
+SCENARIOS = {
+    "recommendation": recommendation,
+    "recommendation_stream": recommendation_stream,
+    "ad_types": ad_types,
+    "questions": questions,
+    "script": script,
+    "script_stream": script_stream,
+    "image_ad": image_ad,
+    "image_variants": image_variants,
+    "campaign": campaign,
+    "asset": asset,
+    "trends": trends,
+    "content": content,
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.ttfb = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.skipped = Counter()
+
+    async def run(self, name: str, ctx: Context, scheduled: float = None):
+        # Open-loop requests are timed from when they were due, not from when
+        # they started, so a backed-up client doesn't hide server latency.
+        started = scheduled or time.perf_counter()
+        try:
+            status, ttfb = await SCENARIOS[name](ctx)
+        except Skip:
+            self.skipped[name] += 1
+            return
+        except httpx.HTTPError as e:
+            status, ttfb = type(e).__name__, None
+        self.latencies[name].append(time.perf_counter() - started)
+        self.statuses[name][str(status)] += 1
+        if ttfb is not None:
+            self.ttfb[name].append(ttfb)
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values: list) -> dict:
+    if not values:
+        return {}
+    return {
+        "mean": round(sum(values) / len(values), 4),
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def parse_mix(text: str) -> dict:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# --- saturation ---------------------------------------------------------------
+
+def process_tree(pid: int) -> list:
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            for child in f.read().split():
+                pids.extend(process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def cpu_seconds(pid: int) -> float:
+    total = 0
+    for p in process_tree(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += int(fields[11]) + int(fields[12])
+        except (OSError, IndexError, ValueError):
+            pass
+    return total / os.sysconf("SC_CLK_TCK")
+
+
+def metric_sum(text: str, name: str) -> float:
+    total = 0.0
+    for line in text.splitlines():
+        if line.startswith(name + "{") or line.startswith(name + " "):
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+async def sample_saturation(client: httpx.AsyncClient, interval: float, app_pid, samples: list, stop: asyncio.Event):
+    last_cpu = cpu_seconds(app_pid) if app_pid else None
+    last_time = time.perf_counter()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        sample = {}
+        try:
+            stats = (await client.get("/stats")).json()
+            sample["jobsQueued"] = stats["jobs"]["queued"]
+            sample["jobsRunning"] = stats["jobs"].get("running", 0)
+            sample["rateLimitQueued"] = sum(
+                sum(s["queued"].values()) for s in stats.get("rateLimits", {}).values()
+            )
+            metrics = (await client.get("/metrics")).text
+            # Minus one for the /metrics request itself.
+            sample["httpInFlight"] = max(0.0, metric_sum(metrics, "http_requests_in_flight") - 1)
+            sample["upstreamInFlight"] = metric_sum(metrics, "upstream_requests_in_flight")
+        except (httpx.HTTPError, KeyError, ValueError):
+            pass
+        if app_pid:
+            now, cpu = time.perf_counter(), cpu_seconds(app_pid)
+            sample["cpuCores"] = round((cpu - last_cpu) / (now - last_time), 3)
+            last_cpu, last_time = cpu, now
+        samples.append(sample)
+
+
+def summarize_samples(samples: list, workers: int) -> dict:
+    summary = {}
+    for key in sorted({k for s in samples for k in s}):
+        values = [s[key] for s in samples if key in s]
+        summary[key] = {"mean": round(sum(values) / len(values), 3), "max": round(max(values), 3)}
+    if "cpuCores" in summary and workers:
+        # 1.0 means every worker process was busy the whole time.
+        summary["workerCpuUtilization"] = round(summary["cpuCores"]["mean"] / workers, 3)
+    return summary
+
+
+# --- stack --------------------------------------------------------------------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise SystemExit(f"{url} did not come up within {timeout:.0f}s")
+
+
+async def start_stack(args, state_dir: str):
+    mock_port, app_port = free_port(), free_port()
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "bench.mock_upstream", "--port", str(mock_port), *shlex.split(args.mock_args)],
+        cwd=BACKEND_DIR,
+    )
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    await wait_for(f"{mock_url}/_stats")
+
+    env = {
+        **os.environ,
+        "PERPLEXITY_API_KEY": "bench",
+        "PERPLEXITY_API_URL": f"{mock_url}/chat/completions",
+        "STABILITY_API_KEY": "bench",
+        "STABILITY_API_URL": f"{mock_url}/v2beta/stable-image/generate/core",
+        "DATAFORSEO_API_URL": f"{mock_url}/v3/keywords_data/google/search_volume/live",
+        "DFSEO_LOGIN": "bench",
+        "DFSEO_PASSWORD": "bench",
+        "GEMINI_API_KEY": "bench",
+        "GEMINI_API_URL": f"{mock_url}/v1beta",
+        "SIMILARWEB_API_KEY": "bench",
+        "SIMILARWEB_API_URL": mock_url,
+        # Measure the app, not the provider quotas.
+        **{f"RATE_LIMIT_{provider}_{quota}": "0"
+           for provider in ("PERPLEXITY", "STABILITY", "DATAFORSEO", "GEMINI", "SIMILARWEB") for quota in ("RPM", "TPM")},
+        "CAMPAIGN_SQLITE_PATH": os.path.join(state_dir, "campaigns.sqlite3"),
+        "JOB_SQLITE_PATH": os.path.join(state_dir, "jobs.sqlite3"),
+        "LLM_CACHE_SQLITE_PATH": os.path.join(state_dir, "cache.sqlite3"),
+        "SHARED_STATE_SQLITE_PATH": os.path.join(state_dir, "shared_state.sqlite3"),
+        "KEYWORD_METRICS_SQLITE_PATH": os.path.join(state_dir, "keyword_metrics.sqlite3"),
+        "BATCH_SQLITE_PATH": os.path.join(state_dir, "batches.sqlite3"),
+        "SIMILARITY_SQLITE_PATH": os.path.join(state_dir, "similarity.sqlite3"),
+        "ASSET_STORE_DIR": os.path.join(state_dir, "assets"),
+        "FAILED_OUTPUT_DIR": os.path.join(state_dir, "failed_llm_outputs"),
+        "LOG_PAYLOAD_SAMPLE_RATE": "0",
+    }
+    if args.workers > 1:
+        metrics_dir = os.path.join(state_dir, "metrics")
+        os.makedirs(metrics_dir)
+        env.update({
+            "SHARED_STATE_BACKEND": "sqlite",
+            "JOB_BACKEND": "sqlite",
+            "LLM_CACHE_BACKEND": "sqlite",
+            "PROMETHEUS_MULTIPROC_DIR": metrics_dir,
+        })
+    log = open(os.path.join(state_dir, "app.log"), "w")
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{app_port}"
+    await wait_for(f"{base_url}/health")
+    return base_url, mock_url, [app, mock]
+
+
+def git_commit() -> dict:
+    def git(*cmd):
+        return subprocess.run(["git", *cmd], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+# --- run ----------------------------------------------------------------------
+
+async def drive(ctx: Context, recorder: Recorder, mix: dict, args):
+    names, weights = list(mix), list(mix.values())
+    deadline = time.perf_counter() + args.duration
+
+    if args.rate:
+        tasks = []
+        next_at = time.perf_counter()
+        while next_at < deadline:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            name = ctx.rng.choices(names, weights)[0]
+            tasks.append(asyncio.create_task(recorder.run(name, ctx, scheduled=next_at)))
+            next_at += ctx.rng.expovariate(args.rate)
+        await asyncio.gather(*tasks)
+        return
+
+    async def client_loop():
+        while time.perf_counter() < deadline:
+            await recorder.run(ctx.rng.choices(names, weights)[0], ctx)
+
+    await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+
+
+async def setup(ctx: Context, profiles: list, mix: dict):
+    """One campaign per payload, and an image if any scenario reads assets."""
+    for profile in profiles:
+        response = await ctx.client.post("/recommendation/generate-recommendation", json=profile)
+        if response.status_code == 200:
+            ctx.remember(response.json())
+    if ctx.campaigns and ("asset" in mix):
+        await image_ad(ctx)
+    print(f"setup: {len(ctx.campaigns)} campaigns, {len(ctx.assets)} assets")
+
+
+async def main(args) -> dict:
+    with open(args.payloads) as f:
+        profiles = json.load(f)
+    mix = parse_mix(args.scenarios)
+    processes = []
+    state = tempfile.TemporaryDirectory(prefix="vega-bench-") if args.start else None
+    base_url, mock_url = args.base_url, None
+    try:
+        if args.start:
+            base_url, mock_url, processes = await start_stack(args, state.name)
+        app_pid = processes[0].pid if processes else None
+
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            ctx = Context(client, profiles, unique=not args.cache_hits, seed=args.seed)
+            await setup(ctx, profiles, mix)
+
+            recorder = Recorder()
+            samples = []
+            stop = asyncio.Event()
+            async with httpx.AsyncClient(base_url=base_url, timeout=10) as monitor:
+                sampler = asyncio.create_task(sample_saturation(monitor, args.sample_interval, app_pid, samples, stop))
+                started = time.perf_counter()
+                await drive(ctx, recorder, mix, args)
+                elapsed = time.perf_counter() - started
+                stop.set()
+                await sampler
+
+            upstream = None
+            if mock_url:
+                async with httpx.AsyncClient() as mock_client:
+                    upstream = (await mock_client.get(f"{mock_url}/_stats")).json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if state:
+            state.cleanup()
+
+    scenarios = {}
+    for name in mix:
+        latencies = recorder.latencies[name]
+        errors = sum(n for status, n in recorder.statuses[name].items() if not status.startswith(("2", "3")))
+        scenarios[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "skipped": recorder.skipped[name],
+            "statuses": dict(recorder.statuses[name]),
+            "rps": round(len(latencies) / elapsed, 3),
+            "latency": summarize(latencies),
+            "ttfb": summarize(recorder.ttfb[name]),
+        }
+    total = sum(s["requests"] for s in scenarios.values())
+    all_latencies = [v for name in mix for v in recorder.latencies[name]]
+    return {
+        "meta": {
+            **git_commit(),
+            "label": args.label,
+            "startedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "durationSeconds": round(elapsed, 2),
+            "mode": f"open loop {args.rate}/s" if args.rate else f"closed loop x{args.concurrency}",
+            "workers": args.workers if args.start else None,
+            "mockArgs": args.mock_args if args.start else None,
+            "cacheHits": args.cache_hits,
+            "mix": mix,
+        },
+        "totals": {
+            "requests": total,
+            "errors": sum(s["errors"] for s in scenarios.values()),
+            "rps": round(total / elapsed, 3),
+            "latency": summarize(all_latencies),
+        },
+        "scenarios": scenarios,
+        "saturation": summarize_samples(samples, args.workers if args.start else 0),
+        "upstream": upstream,
+    }
+
+
+def print_report(results: dict):
+    meta, totals = results["meta"], results["totals"]
+    print(f"\n{meta['commit']}{' (dirty)' if meta['dirty'] else ''}  {meta['mode']}  {meta['durationSeconds']}s")
+    print(f"{'scenario':24} {'req':>6} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'ttfb p50':>9}")
+    for name, s in results["scenarios"].items():
+        lat, ttfb = s["latency"], s["ttfb"]
+        print(f"{name:24} {s['requests']:>6} {s['errors']:>5} {s['rps']:>8} "
+              f"{lat.get('p50', '-'):>8} {lat.get('p95', '-'):>8} {lat.get('p99', '-'):>8} {ttfb.get('p50', '-'):>9}")
+    lat = totals["latency"]
+    print(f"{'total':24} {totals['requests']:>6} {totals['errors']:>5} {totals['rps']:>8} "
+          f"{lat.get('p50', '-'):>8} {lat.get('p95', '-'):>8} {lat.get('p99', '-'):>8}")
+    if results["saturation"]:
+        print("saturation:", json.dumps(results["saturation"]))
+
+
+def compare(old: dict, new: dict, threshold: float):
+    """Print rps and p95 changes per scenario, flagging those beyond `threshold`."""
+    print(f"\ncompared with {old['meta']['commit']} ({old['meta']['startedAt']}):")
+    for name, s in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if not before or not before["requests"] or not s["requests"]:
+            continue
+        rps_change = (s["rps"] - before["rps"]) / before["rps"] if before["rps"] else 0
+        p95_before, p95_after = before["latency"]["p95"], s["latency"]["p95"]
+        p95_change = (p95_after - p95_before) / p95_before if p95_before else 0
+        flag = "⚠️" if rps_change < -threshold or p95_change > threshold else "  "
+        print(f"{flag} {name:24} rps {before['rps']:>8} -> {s['rps']:<8} ({rps_change:+.0%})   "
+              f"p95 {p95_before:>8} -> {p95_after:<8} ({p95_change:+.0%})")
+
+
+if __name__ == "__main__":
+    ARGS = PARSER.parse_args()
+    RESULTS = asyncio.run(main(ARGS))
+    print_report(RESULTS)
+
+    path = ARGS.json
+    if not path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{RESULTS['meta']['commit'] or 'nogit'}.json")
+    with open(path, "w") as f:
+        json.dump(RESULTS, f, indent=2)
+    print(f"results: {path}")
+
+    if ARGS.compare:
+        with open(ARGS.compare) as f:
+            compare(json.load(f), RESULTS, ARGS.threshold)
@@ -0,0 +1,370 @@
+"""Local stand-in for Perplexity, Stability, DataForSEO, Gemini (generateContent) and Similarweb, for load tests.
+
+Answers look like the real APIs, with valid answers for every prompt this
+backend sends. Latency, errors and damaged output are drawn from configurable
+distributions, so runs cost nothing and can be repeated (--seed).
+
+    cd backend && python -m bench.mock_upstream --port 9300 --llm-latency 1.5 --error-rate 0.02
+
+Point the app at it with
+    PERPLEXITY_API_URL=http://127.0.0.1:9300/chat/completions
+    STABILITY_API_URL=http://127.0.0.1:9300/v2beta/stable-image/generate/core
+    DATAFORSEO_API_URL=http://127.0.0.1:9300/v3/keywords_data/google/search_volume/live
+    GEMINI_API_URL=http://127.0.0.1:9300/v1beta
+    SIMILARWEB_API_URL=http://127.0.0.1:9300
+
+GET /_stats returns per-endpoint call counts and the injected outcomes.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from PIL import Image
+
+PARSER = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+PARSER.add_argument("--host", default="127.0.0.1")
+PARSER.add_argument("--port", type=int, default=9300)
+PARSER.add_argument("--llm-latency", type=float, default=1.0, help="mean seconds per chat completion")
+PARSER.add_argument("--image-latency", type=float, default=3.0, help="mean seconds per Stability render")
+PARSER.add_argument("--seo-latency", type=float, default=0.5, help="mean seconds per DataForSEO call")
+PARSER.add_argument("--jitter", type=float, default=0.3, help="latency standard deviation as a share of the mean")
+PARSER.add_argument("--stream-chunks", type=int, default=40, help="chunks per streamed completion")
+PARSER.add_argument("--error-rate", type=float, default=0.0, help="share of calls answered 500/503")
+PARSER.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of calls answered 429")
+PARSER.add_argument("--malformed-rate", type=float, default=0.0,
+                    help="share of LLM answers damaged the usual ways (fences, prose, citations, trailing commas)")
+PARSER.add_argument("--garbage-rate", type=float, default=0.0, help="share of LLM answers with no JSON at all")
+PARSER.add_argument("--image-size", type=int, default=1024, help="long side of rendered images")
+PARSER.add_argument("--seed", type=int)
+
+# Defaults when imported (uvicorn bench.mock_upstream:app); main() replaces them.
+ARGS = PARSER.parse_args([])
+
+app = FastAPI()
+calls = Counter()
+outcomes = Counter()
+
+
+rng = random.Random()
+
+
+def configure(args):
+    global ARGS, rng
+    ARGS = args
+    rng = random.Random(args.seed)
+
+
+def latency(mean: float) -> float:
+    return max(0.0, rng.gauss(mean, mean * ARGS.jitter))
+
+
+def injected_failure():
+    """A planned error response for this call, or None."""
+    roll = rng.random()
+    if roll < ARGS.rate_limit_rate:
+        outcomes["429"] += 1
+        return JSONResponse({"error": "rate limited"}, status_code=429, headers={"Retry-After": "1"})
+    if roll < ARGS.rate_limit_rate + ARGS.error_rate:
+        status = rng.choice([500, 503])
+        outcomes[str(status)] += 1
+        return JSONResponse({"error": "upstream failure"}, status_code=status)
+    return None
+
+
+# --- Perplexity ---------------------------------------------------------------
+
+PLATFORMS = ["Instagram", "Facebook", "TikTok", "Google Ads", "LinkedIn", "YouTube", "Pinterest"]
+
+
+def strategy_for(prompt: str) -> dict:
+    seed = int(hashlib.sha256(prompt.encode()).hexdigest()[:8], 16)
+    pick = random.Random(seed)
+    recommended = pick.sample(PLATFORMS, 3)
+    others = [p for p in PLATFORMS if p not in recommended][:2]
+    location = re.search(r"- Location: (.*)", prompt)
+    city = location.group(1).split(",")[0] if location else "Austin"
+    return {
+        "recommendedPlatforms": [
+            {"name": name, "matchScore": pick.randint(70, 95), "rationale": f"{name} reaches the target audience.",
+             "campaignTypes": ["Awareness", "Conversions"]}
+            for name in recommended
+        ],
+        "notRecommendedPlatforms": [
+            {"name": name, "matchScore": pick.randint(10, 40), "rationale": f"{name} is a poor fit."} for name in others
+        ],
+        "keywords": {
+            "globalKeywords": ["best local deals", "near me", "seasonal offers"],
+            "localKeywords": [f"{city} events", f"things to do in {city}"],
+        },
+        "competitors": [
+            {"name": f"Competitor {i}", "domain": f"competitor{i}-{city.lower().replace(' ', '')}.com",
+             "description": "A nearby business.", "estimatedMonthlyTraffic": "12K",
+             "marketingChannels": ["Instagram", "Google Ads"], "strength": "Brand", "weakness": "Price"}
+            for i in (1, 2)
+        ],
+        "strategyTips": ["Post consistently.", "Use local hashtags.", "Retarget site visitors."],
+        "localContext": {
+            "weatherSummary": "Sunny, highs around 25°C.",
+            "eventsSummary": [{"name": "Spring Fair", "date": "May 1", "location": f"{city}, TX", "relevance": "High"}],
+        },
+    }
+
+
+def platform_content(name: str) -> dict:
+    return {
+        "platform": name,
+        "recommendations": [
+            {"caption": f"{name} caption {i}", "explanation": "Speaks to the audience's goals.",
+             "hashtags": ["#local", f"#{name.replace(' ', '').lower()}", "#deal"]}
+            for i in range(1, 4)
+        ],
+    }
+
+
+def completion_for(prompt: str) -> str:
+    section = re.search(r'single key "(\w+)"', prompt)
+    if section:
+        return json.dumps({section.group(1): strategy_for(prompt)[section.group(1)]})
+    if "recommendedPlatforms" in prompt and "weather" in prompt:
+        return json.dumps(strategy_for(prompt))
+    platform = re.search(r"for the ad platform (.+?)\.\n", prompt)
+    if platform:
+        return json.dumps(platform_content(platform.group(1)))
+    if "For each of the following ad platforms" in prompt:
+        names = prompt.split("Recommended Platforms:", 1)[1].strip().splitlines()[0]
+        # Leave the last platform out now and then, as real answers do.
+        platforms = [n.strip() for n in names.split(",") if n.strip()]
+        if len(platforms) > 1 and rng.random() < 0.2:
+            platforms = platforms[:-1]
+        return json.dumps([platform_content(name) for name in platforms])
+    if '"recommendedPlatform"' in prompt:
+        return json.dumps({"recommendedPlatform": "Instagram", "captions": [
+            {"text": f"Caption {i}", "rationale": "Speaks to the audience's goals.", "hashtags": ["#local", "#deal"]}
+            for i in range(1, 4)
+        ]})
+    if "recommendedAdTypes" in prompt:
+        return json.dumps({"recommendedAdTypes": rng.sample(["Video Ad", "Image Ad", "Carousel Ad", "Story Ad"], 2)})
+    if '"questions"' in prompt:
+        return json.dumps({"questions": [
+            {"question": "What product or offer should the ad feature?"},
+            {"question": "Who is the target audience?"},
+            {"question": "What action should people take after seeing the ad?"},
+        ]})
+    return " ".join(["Discover what makes us different this season and visit us today."] * 12)
+
+
+def damage(text: str) -> str:
+    """The ways LLM JSON usually arrives broken, all repairable by llm_json_service."""
+    text = text.replace("]}", "],}", 1)  # trailing comma
+    text = text.replace('."', '.[1]"', 1)  # citation marker
+    return f"Here is the JSON you asked for:\n```json\n{text}\n```\nLet me know if you need changes."
+
+
+def llm_answer(prompt: str) -> str:
+    text = completion_for(prompt)
+    roll = rng.random()
+    if roll < ARGS.garbage_rate:
+        outcomes["garbage"] += 1
+        return "I'm sorry, I can't provide that in JSON right now."
+    if roll < ARGS.garbage_rate + ARGS.malformed_rate and text.startswith(("{", "[")):
+        outcomes["malformed"] += 1
+        return damage(text)
+    return text
+
+
+def usage(prompt: str, text: str) -> dict:
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(text) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+@app.post("/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    calls["chat" if not body.get("stream") else "chat_stream"] += 1
+    delay = latency(ARGS.llm_latency)
+    failure = injected_failure()
+    if failure:
+        await asyncio.sleep(delay / 10)
+        return failure
+
+    prompt = body["messages"][-1]["content"]
+    text = llm_answer(prompt)
+    model = body.get("model", "sonar-pro")
+
+    if not body.get("stream"):
+        await asyncio.sleep(delay)
+        return {
+            "id": f"mock-{time.time_ns()}", "model": model, "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage(prompt, text),
+        }
+
+    async def events():
+        # A quarter of the time goes to the first token, the rest is spread over the chunks.
+        await asyncio.sleep(delay / 4)
+        size = max(1, len(text) // ARGS.stream_chunks)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        for piece in pieces:
+            chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": piece}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(delay * 0.75 / len(pieces))
+        final = {"model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage(prompt, text)}
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+# --- Stability ----------------------------------------------------------------
+
+_images = {}
+
+
+def rendered_image(aspect_ratio: str, output_format: str) -> bytes:
+    """Noise, so the encoded size is close to a real render. Cached per shape."""
+    key = (aspect_ratio, output_format)
+    if key not in _images:
+        w, h = (int(x) for x in aspect_ratio.split(":"))
+        scale = ARGS.image_size / max(w, h)
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        image = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG" if output_format == "jpeg" else output_format.upper())
+        _images[key] = buffer.getvalue()
+    return _images[key]
+
+
+@app.post("/v2beta/stable-image/generate/core")
+async def stability_generate(request: Request):
+    form = await request.form()
+    calls["stability"] += 1
+    delay = latency(ARGS.image_latency)
+    failure = injected_failure()
+    if failure:
+        await asyncio.sleep(delay / 10)
+        return failure
+    output_format = form.get("output_format", "png")
+    data = await asyncio.to_thread(rendered_image, form.get("aspect_ratio", "1:1"), output_format)
+    await asyncio.sleep(delay)
+    return Response(data, media_type=f"image/{output_format}")
+
+
+# --- DataForSEO ---------------------------------------------------------------
+
+def keyword_metrics(keyword: str) -> dict:
+    digest = hashlib.sha256(keyword.lower().encode()).digest()
+    return {
+        "keyword": keyword,
+        "location_code": 2840,
+        "language_code": "en",
+        "search_volume": int.from_bytes(digest[:3], "big") % 50000,
+        "cpc": round(digest[3] / 40, 2),
+        "competition": round(digest[4] / 255, 2),
+        "competition_index": digest[4] * 100 // 255,
+    }
+
+
+@app.post("/v3/keywords_data/google/search_volume/live")
+async def dataforseo_search_volume(request: Request):
+    tasks = await request.json()
+    calls["dataforseo"] += 1
+    await asyncio.sleep(latency(ARGS.seo_latency))
+    failure = injected_failure()
+    if failure:
+        return failure
+    return {
+        "status_code": 20000,
+        "status_message": "Ok.",
+        "tasks_count": len(tasks),
+        "tasks": [
+            {"status_code": 20000, "status_message": "Ok.", "data": task,
+             "result_count": len(task.get("keywords", [])),
+             "result": [keyword_metrics(k) for k in task.get("keywords", [])]}
+            for task in tasks
+        ],
+    }
+
+
+# --- Gemini -------------------------------------------------------------------
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def gemini_generate(model: str, request: Request):
+    body = await request.json()
+    calls["gemini"] += 1
+    await asyncio.sleep(latency(ARGS.llm_latency))
+    failure = injected_failure()
+    if failure:
+        return failure
+    prompt = " ".join(part.get("text", "") for c in body.get("contents", []) for part in c.get("parts", []))
+    industry = re.search(r"Industry: (.*)", prompt)
+    topic = industry.group(1).strip().lower() if industry else "marketing"
+    keywords = [f"{topic} {suffix}" for suffix in ("near me", "deals", "classes", "reviews", "prices", "ideas")]
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": json.dumps({"keywords": keywords})}]},
+                        "finishReason": "STOP", "index": 0}],
+        "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": 40},
+    }
+
+
+# --- Similarweb ---------------------------------------------------------------
+
+def month_starts(start: str, end: str):
+    year, month = map(int, start.split("-"))
+    end_year, end_month = map(int, end.split("-"))
+    while (year, month) <= (end_year, end_month):
+        yield f"{year}-{month:02d}-01"
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+@app.get("/v1/website/{domain}/total-traffic-and-engagement/visits")
+async def similarweb_visits(domain: str, start_date: str, end_date: str):
+    calls["similarweb"] += 1
+    await asyncio.sleep(latency(ARGS.seo_latency))
+    failure = injected_failure()
+    if failure:
+        return failure
+    digest = hashlib.sha256(domain.encode()).digest()
+    base = 1000 + int.from_bytes(digest[:3], "big") % 500000
+    return {
+        "meta": {"request": {"domain": domain, "granularity": "Monthly"}, "status": "Success"},
+        "visits": [{"date": date, "visits": base * (1 + i / 20)} for i, date in enumerate(month_starts(start_date, end_date))],
+    }
+
+
+@app.get("/v1/similar-rank/{domain}/rank")
+async def similarweb_rank(domain: str):
+    calls["similarweb"] += 1
+    await asyncio.sleep(latency(ARGS.seo_latency))
+    failure = injected_failure()
+    if failure:
+        return failure
+    digest = hashlib.sha256(domain.encode()).digest()
+    return {"meta": {"status": "Success"}, "similar_rank": {"rank": 10000 + int.from_bytes(digest[3:6], "big")}}
+
+
+@app.get("/_stats")
+async def stats():
+    return {"calls": calls, "outcomes": outcomes}
+
+
+def main():
+    import uvicorn
+
+    args = PARSER.parse_args()
+    configure(args)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
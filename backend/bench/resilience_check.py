@@ -0,0 +1,108 @@
+"""Drive services.resilience_service against bench/fault_stub.py.
+
+Starts the stub in-process, points the Perplexity client at it and runs a few
+fault scenarios (retries, Retry-After, read timeouts, circuit breaker,
+request deadline), printing what happened and how long it took.
+
+    cd backend && python -m bench.resilience_check [--port 9200] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+PARSER = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+PARSER.add_argument("--port", type=int, default=9200)
+PARSER.add_argument("--json", help="also write the results to this file")
+ARGS = PARSER.parse_args()
+
+# Must be set before the services read their configuration.
+os.environ["PERPLEXITY_API_URL"] = f"http://127.0.0.1:{ARGS.port}/chat/completions"
+os.environ.setdefault("PERPLEXITY_HTTP2", "0")
+os.environ.setdefault("RESILIENCE_PERPLEXITY_READ_TIMEOUT", "1")
+os.environ.setdefault("RESILIENCE_PERPLEXITY_BASE_DELAY", "0.05")
+os.environ.setdefault("RESILIENCE_PERPLEXITY_FAILURE_THRESHOLD", "3")
+os.environ.setdefault("RESILIENCE_PERPLEXITY_RESET_TIMEOUT", "2")
+os.environ.setdefault("RATE_LIMIT_PERPLEXITY_RPM", "0")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from bench import fault_stub  # noqa: E402
+from services import perplexity_service, resilience_service  # noqa: E402
+
+STUB = f"http://127.0.0.1:{ARGS.port}"
+
+# (name, plan, deadline seconds, expected outcome)
+SCENARIOS = [
+    ("retry 5xx then succeed", ["503", "502", "ok"], None, "ok"),
+    ("honor Retry-After", ["429:1", "ok"], None, "ok"),
+    ("retry read timeout", ["hang:3", "ok"], None, "ok"),
+    ("give up after max attempts", ["500", "500", "500"], None, "PerplexityError"),
+    ("circuit is open", [], None, "CircuitOpenError"),
+    ("half-open probe closes circuit", ["ok"], "wait_reset", "ok"),
+    ("request deadline", ["hang:3", "hang:3", "hang:3"], 1.5, "deadline"),
+]
+
+
+async def run_scenario(client: httpx.AsyncClient, name, plan, deadline, expected) -> dict:
+    await client.post(f"{STUB}/_plan", json=plan)
+    if deadline == "wait_reset":
+        await asyncio.sleep(resilience_service.POLICIES["perplexity"].reset_timeout + 0.1)
+        deadline = None
+    token = resilience_service.set_deadline(deadline)
+
+    started = time.perf_counter()
+    try:
+        await perplexity_service.chat_completion(f"resilience check: {name}")
+        outcome = "ok"
+    except (resilience_service.DeadlineExceeded, httpx.TimeoutException):
+        outcome = "deadline"
+    except Exception as e:
+        outcome = type(e).__name__
+    finally:
+        resilience_service._deadline.reset(token)
+    elapsed = time.perf_counter() - started
+
+    upstream_calls = (await client.get(f"{STUB}/_calls")).json()["total"]
+    return {
+        "scenario": name,
+        "expected": expected,
+        "outcome": outcome,
+        "passed": outcome == expected,
+        "upstreamCalls": upstream_calls,
+        "seconds": round(elapsed, 3),
+        "circuit": resilience_service.get_breaker("perplexity").state,
+    }
+
+
+async def main():
+    server = uvicorn.Server(uvicorn.Config(fault_stub.app, port=ARGS.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    results = []
+    try:
+        async with httpx.AsyncClient() as client:
+            for scenario in SCENARIOS:
+                results.append(await run_scenario(client, *scenario))
+    finally:
+        await perplexity_service.close_client()
+        server.should_exit = True
+        await server_task
+
+    print(f"{'scenario':34} {'outcome':18} {'calls':>5} {'seconds':>8}  circuit")
+    for r in results:
+        mark = "✅" if r["passed"] else "❌"
+        print(f"{mark} {r['scenario']:32} {r['outcome']:18} {r['upstreamCalls']:>5} {r['seconds']:>8}  {r['circuit']}")
+
+    if ARGS.json:
+        with open(ARGS.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return all(r["passed"] for r in results)
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,117 @@
+"""Check that /market-trends calls in flight don't stall the rest of the app.
+
+Starts bench.mock_upstream (slow Gemini and DataForSEO answers) and the app on
+one worker, fires a burst of /market-trends requests and, while they wait on
+the mock, probes cheap routes every few milliseconds. A blocking call anywhere
+on the trends path would freeze the event loop and show up as probe latency in
+the order of the upstream latency, and as trends requests finishing one after
+another instead of together.
+
+    cd backend && python -m bench.trends_concurrency_check [--requests 20] [--json out.json]
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+from bench.load_test import percentile, start_stack
+
+PARSER = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+PARSER.add_argument("--requests", type=int, default=20, help="concurrent /market-trends calls")
+PARSER.add_argument("--llm-latency", type=float, default=2.0, help="mock Gemini latency in seconds")
+PARSER.add_argument("--seo-latency", type=float, default=1.0, help="mock DataForSEO latency in seconds")
+PARSER.add_argument("--probe-interval", type=float, default=0.02)
+PARSER.add_argument("--max-probe-seconds", type=float, default=0.25, help="slowest acceptable probe")
+PARSER.add_argument("--json", help="also write the results to this file")
+
+PROBES = ["/health", "/stats", "/campaigns/does-not-exist"]
+TREND = {
+    "businessName": "Lotus Flow Yoga",
+    "businessDescription": "Boutique yoga studio offering vinyasa, yin and prenatal classes.",
+    "industry": "Fitness",
+    "location": "Austin, TX",
+}
+
+
+async def probe(client: httpx.AsyncClient, interval: float, latencies: list, stop: asyncio.Event):
+    i = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(PROBES[i % len(PROBES)])
+        latencies.append(time.perf_counter() - started)
+        i += 1
+        await asyncio.sleep(interval)
+
+
+async def run(base_url: str, args) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        # Warm up connections and the route once so the burst measures steady state.
+        await client.post("/market-trends", json=TREND)
+
+        latencies = []
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe(client, args.probe_interval, latencies, stop))
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post("/market-trends", json={**TREND, "businessName": f"{TREND['businessName']} {i}"})
+            for i in range(args.requests)
+        ))
+        burst = time.perf_counter() - started
+        stop.set()
+        await prober
+
+    upstream = args.llm_latency + args.seo_latency
+    statuses = sorted({r.status_code for r in responses})
+    checks = [
+        ("all trends calls succeeded", statuses == [200], f"statuses {statuses}"),
+        # Serialised calls would take requests x upstream latency.
+        ("trends calls overlapped", burst < 2 * upstream, f"{burst:.2f}s for {args.requests} calls "
+                                                            f"of ~{upstream:.1f}s each"),
+        ("probes stayed fast", max(latencies) < args.max_probe_seconds,
+         f"{len(latencies)} probes, p99 {percentile(latencies, 99) * 1000:.0f}ms, "
+         f"max {max(latencies) * 1000:.0f}ms"),
+    ]
+    return {
+        "requests": args.requests,
+        "burstSeconds": round(burst, 3),
+        "probes": len(latencies),
+        "probeP50": round(percentile(latencies, 50), 4),
+        "probeP99": round(percentile(latencies, 99), 4),
+        "probeMax": round(max(latencies), 4),
+        "checks": [{"check": name, "passed": passed, "detail": detail} for name, passed, detail in checks],
+    }
+
+
+async def main(args) -> bool:
+    stack_args = argparse.Namespace(
+        workers=1, mock_args=f"--llm-latency {args.llm_latency} --seo-latency {args.seo_latency} --jitter 0",
+    )
+    processes = []
+    with tempfile.TemporaryDirectory(prefix="vega-trends-check-") as state_dir:
+        try:
+            base_url, _, processes = await start_stack(stack_args, state_dir)
+            result = await run(base_url, args)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    for check in result["checks"]:
+        mark = "✅" if check["passed"] else "❌"
+        print(f"{mark} {check['check']:28} {check['detail']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    return all(check["passed"] for check in result["checks"])
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if asyncio.run(main(PARSER.parse_args())) else 1)
@@ -1,18 +1,81 @@
-from fastapi import FastAPI
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from routers.strategic_campaign_planner import (
     strategy,
     recommendation,
+    bulk,
     competitor,
     trends,
     scriptGenerator,
-    ImageGenerator  # ✅ NEW
+    contentGeneration,
+    ImageGenerator,  # ✅ NEW
+    jobs,
+    assets,
+    campaigns
 )
+from services import (
+    cache_service,
+    singleflight_service,
+    job_service,
+    resilience_service,
+    scheduler_service,
+    shared_state_service,
+    perplexity_service,
+    stability_service,
+    gemini_service,
+    dataforseo_service,
+    keyword_metrics_service,
+    similarweb_service,
+    similarity_service,
+    metrics_service,
+    log_service
+)
+
+log_service.configure()
+logger = log_service.get_logger("app")
+
+# How long shutdown waits for running jobs and upstream calls (keep it below the
+# process manager's kill timeout, e.g. uvicorn --timeout-graceful-shutdown).
+SHUTDOWN_DRAIN_SECONDS = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "25"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    gemini_service.init_model()
+    await job_service.get_queue().start()
+    flusher = asyncio.create_task(shared_state_service.flush_periodically())
+    logger.info(f"Worker {os.getpid()} started")
+
+    yield
+
+    # uvicorn has stopped accepting connections and finished in-flight HTTP
+    # requests by now; what is left is background work (jobs, prefetches).
+    logger.info(f"Worker {os.getpid()} draining")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SHUTDOWN_DRAIN_SECONDS
+    await job_service.get_queue().drain(SHUTDOWN_DRAIN_SECONDS)
+    left = await resilience_service.drain(max(0.0, deadline - loop.time()))
+    if left:
+        logger.warning(f"{left} upstream call(s) still in flight at shutdown")
+    flusher.cancel()
+    await shared_state_service.flush()
+    await perplexity_service.close_client()
+    await stability_service.close_client()
+    await gemini_service.close_client()
+    await dataforseo_service.close_client()
+    await similarweb_service.close_client()
+    metrics_service.mark_process_dead()
+    log_service.shutdown()
+
 
 app = FastAPI(
     title="Vega Digital API",
     description="Marketing Campaign Planner powered by Gemini + Perplexity",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS: include local dev + your Netlify site
@@ -24,12 +87,17 @@ origins = [
     "https://vega-digital.netlify.app"
 ]
 
+app.add_middleware(resilience_service.DeadlineMiddleware)
+app.add_middleware(metrics_service.MetricsMiddleware)
+app.add_middleware(log_service.RequestIdMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
 # --- Health & root routes ---
@@ -41,10 +109,32 @@ def root():
 def health():
     return {"ok": True}
 
+@app.get("/metrics")
+def metrics():
+    return Response(metrics_service.render(), media_type=metrics_service.CONTENT_TYPE)
+
+@app.get("/stats")
+async def stats():
+    return {
+        "cache": await cache_service.stats(),
+        "singleFlight": await singleflight_service.stats(),
+        "jobs": job_service.get_queue().stats(),
+        "circuits": resilience_service.stats(),
+        "rateLimits": scheduler_service.stats(),
+        "keywordMetrics": keyword_metrics_service.stats(),
+        "similarity": await similarity_service.stats(),
+        "logging": log_service.stats(),
+    }
+
 # --- Business routes ---
 app.include_router(strategy.router, prefix="/strategy", tags=["Strategy"])
 app.include_router(recommendation.router, prefix="/recommendation", tags=["Recommendation"])
+app.include_router(bulk.router, prefix="/recommendation", tags=["Bulk Recommendation"])
 app.include_router(scriptGenerator.router, prefix="/script", tags=["Script Generator"])
+app.include_router(contentGeneration.router, prefix="/content", tags=["Content Generation"])
 app.include_router(ImageGenerator.router, tags=["Image Generator"])  # ✅ NEW
-# app.include_router(competitor.router, prefix="/competitor", tags=["Competitor"])
-# app.include_router(trends.router, tags=["Market Trends"])
+app.include_router(jobs.router, tags=["Jobs"])
+app.include_router(assets.router, tags=["Assets"])
+app.include_router(campaigns.router, tags=["Campaigns"])
+app.include_router(competitor.router, prefix="/competitor", tags=["Competitor"])
+app.include_router(trends.router, tags=["Market Trends"])
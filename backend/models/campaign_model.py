@@ -0,0 +1,116 @@
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from typing import List, Optional, Union
+
+
+class LLMModel(BaseModel):
+    # LLMs routinely add fields we did not ask for; keep them instead of failing.
+    model_config = ConfigDict(extra="allow")
+
+
+class CampaignProfile(BaseModel):
+    """What the user entered in the strategy form."""
+    businessName: str
+    businessDescription: str
+    businessGoals: List[str]
+    demographics: List[str]
+    interests: List[str]
+    location: str
+    industry: str
+
+
+class RecommendedPlatform(LLMModel):
+    name: str
+    matchScore: Union[int, float]
+    rationale: str
+    campaignTypes: List[str]
+
+
+class NotRecommendedPlatform(LLMModel):
+    name: str
+    matchScore: Union[int, float]
+    rationale: str
+
+
+class Keywords(LLMModel):
+    globalKeywords: List[str]
+    localKeywords: List[str]
+
+
+class Competitor(LLMModel):
+    name: str
+    domain: Optional[str] = None
+    description: str
+    estimatedMonthlyTraffic: Optional[Union[int, float, str]] = None
+    marketingChannels: List[str] = []
+    strength: str = ""
+    weakness: str = ""
+
+
+class EventLocation(LLMModel):
+    street: str = ""
+    city: str = ""
+    state: str = ""
+    zip: str = ""
+    mapsLink: Optional[str] = None
+
+
+class LocalEvent(LLMModel):
+    name: str
+    date: str = ""
+    location: Union[EventLocation, str]
+    relevance: str = ""
+
+
+class LocalContext(LLMModel):
+    weatherSummary: str
+    eventsSummary: List[LocalEvent]
+
+
+class StrategyRecommendation(LLMModel):
+    """Output of the first recommendation prompt; also sent as its structured-output schema."""
+    recommendedPlatforms: List[RecommendedPlatform]
+    notRecommendedPlatforms: List[NotRecommendedPlatform]
+    keywords: Keywords
+    competitors: List[Competitor]
+    strategyTips: List[str]
+    localContext: LocalContext
+
+
+class ContentRecommendationItem(LLMModel):
+    caption: str
+    explanation: str = ""
+    hashtags: List[str] = []
+
+
+class PlatformContent(LLMModel):
+    platform: str
+    recommendations: List[ContentRecommendationItem]
+    error: Optional[str] = None
+
+
+class RecommendationResponse(StrategyRecommendation):
+    contentRecommendation: List[PlatformContent]
+    campaignId: Optional[str] = None
+
+
+class AdScript(BaseModel):
+    platform: str
+    adType: str
+    script: str
+    createdAt: float
+
+
+class Campaign(RecommendationResponse):
+    profile: CampaignProfile
+    scripts: List[AdScript] = []
+
+
+STRATEGY_SECTIONS = list(StrategyRecommendation.model_fields)
+
+# Validators for a single top-level section, used to check and repair sections
+# independently of each other.
+SECTION_ADAPTERS = {
+    name: TypeAdapter(field.annotation) for name, field in StrategyRecommendation.model_fields.items()
+}
+
+PLATFORM_CONTENT_LIST = TypeAdapter(List[PlatformContent])
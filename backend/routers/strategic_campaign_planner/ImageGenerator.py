@@ -1,45 +1,70 @@
-import json
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any
-import requests
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Literal, Optional
 import os
+import asyncio
+import hashlib
 from dotenv import load_dotenv
+from services import stability_service, job_service, asset_store_service, image_variant_service, scheduler_service, metrics_service, log_service, prompt_service
+from routers.strategic_campaign_planner.campaigns import campaign_profile
 
 load_dotenv()
 router = APIRouter()
+logger = log_service.get_logger("image")
+
+# Upstream renders in flight per batch; derived variants only use local CPU.
+IMAGE_VARIANT_CONCURRENCY = int(os.getenv("IMAGE_VARIANT_CONCURRENCY", "3"))
+IMAGE_VARIANT_MAX = int(os.getenv("IMAGE_VARIANT_MAX", "12"))
+
+AspectRatio = Literal["16:9", "1:1", "21:9", "2:3", "3:2", "4:5", "5:4", "9:16", "9:21"]
+ImageFormat = Literal["png", "webp", "jpeg"]
 
 class ImageAdRequest(BaseModel):
-    campaignData: Dict[str, Any]
+    campaignId: Optional[str] = None
+    campaignData: Optional[Dict[str, Any]] = None
     scriptQA: Dict[str, str]
     script: str
 
-@router.post("/generate-image-ad")
-def generate_image_ad(req: ImageAdRequest):
-    try:
-        campaign = req.campaignData
-        qa = req.scriptQA
-        script = req.script
-
-        business_name = campaign.get("businessName", "the business")
-        description = campaign.get("businessDescription", "")
-        goals = campaign.get("businessGoals", [])
-        goal_text = ", ".join(goals) if isinstance(goals, list) else str(goals)
-
-        def get_value_by_keywords(keywords):
-            for question, answer in qa.items():
-                if any(keyword in question.lower() for keyword in keywords):
-                    return answer
-            return ""
-
-        offer = get_value_by_keywords(["product", "offer", "service"])
-        target_audience = get_value_by_keywords(["audience", "target"])
-        cta = get_value_by_keywords(["action", "cta", "after seeing the ad"])
-        seasonal_theme = get_value_by_keywords(["season", "promotion", "limited"])
-        brand_style = get_value_by_keywords(["brand", "style", "color", "logo", "font"])
-
-        prompt = f"""
-Create a professional, realistic, high-quality Instagram image ad for a business. Don't use AI character or avtars images. 
+
+class ImageVariant(BaseModel):
+    aspectRatio: AspectRatio = "1:1"
+    format: ImageFormat = "png"
+    width: Optional[int] = Field(default=None, gt=0)
+
+
+class ImageVariantBatchRequest(ImageAdRequest):
+    variants: List[ImageVariant] = Field(min_length=1)
+    # True (default): a single upstream render at the first variant's ratio,
+    # every other ratio is a center crop of it. False: one paid render per
+    # distinct aspect ratio, for layouts a crop would cut badly.
+    cropFromMaster: bool = True
+
+
+def image_format(aspect_ratio: str) -> str:
+    width, height = image_variant_service.parse_ratio(aspect_ratio)
+    shape = "square" if width == height else "landscape" if width > height else "portrait"
+    return f"{shape}, {aspect_ratio} aspect ratio"
+
+
+def build_image_prompt(campaign: Dict[str, Any], qa: Dict[str, str], script: str, aspect_ratio: str = "1:1") -> str:
+    business_name = prompt_service.clip(campaign.get("businessName", "the business"), "short")
+    description = prompt_service.clip(campaign.get("businessDescription", ""), "description")
+    goal_text = prompt_service.listing(campaign.get("businessGoals", []))
+
+    def get_value_by_keywords(keywords):
+        for question, answer in qa.items():
+            if any(keyword in question.lower() for keyword in keywords):
+                return prompt_service.clip(answer, "answer")
+        return ""
+
+    offer = get_value_by_keywords(["product", "offer", "service"])
+    target_audience = get_value_by_keywords(["audience", "target"])
+    cta = get_value_by_keywords(["action", "cta", "after seeing the ad"])
+    seasonal_theme = get_value_by_keywords(["season", "promotion", "limited"])
+    brand_style = get_value_by_keywords(["brand", "style", "color", "logo", "font"])
+
+    return prompt_service.finalize("image", f"""
+Create a professional, realistic, high-quality Instagram image ad for a business. Don't use AI character or avtars images.
 
 Business Name: {business_name}
 Description: {description}
@@ -52,36 +77,149 @@ Brand Style (optional): {brand_style}
 Message Preview: "{script[:120]}..."
 Visual Style: realistic photography, soft lighting, clean layout, high resolution, space for text overlays.
 Avoid: embedded text in image.
-Format: square, 1024x1024
-"""
-
-        headers = {
-            "Authorization": f"Bearer {os.getenv('STABILITY_API_KEY')}",
-            "Accept": "application/json"
-        }
-
-
-        files = {
-            'prompt': (None, prompt.strip()),
-            'model': (None, "stable-diffusion-xl-1024-v1-0"),
-            'output_format': (None, "png"),
-            'aspect_ratio': (None, "1:1")
-        }
-
-        response = requests.post(
-            "https://api.stability.ai/v2beta/stable-image/generate/core",
-            headers=headers,
-            files=files
+Format: {image_format(aspect_ratio)}
+""")
+
+
+async def render_image(prompt: str, output_format: str = "png", aspect_ratio: str = "1:1") -> str:
+    """Stream one Stability render straight into the asset store and return its key."""
+    try:
+        with metrics_service.stage("image.render"):
+            return await asset_store_service.get_store().put_stream(
+                stability_service.stream_image(prompt, output_format, aspect_ratio), ext=output_format
+            )
+    except stability_service.StabilityError as se:
+        raise HTTPException(status_code=500, detail=f"Stability API Error: {se.text}")
+
+
+async def render_image_ad(req: ImageAdRequest) -> Dict[str, Any]:
+    campaign = await campaign_profile(req.campaignId, req.campaignData)
+    key = await render_image(build_image_prompt(campaign, req.scriptQA, req.script))
+    return {"imageUrl": asset_store_service.asset_url(key), "assetKey": key}
+
+
+async def render_image_variants(req: ImageVariantBatchRequest) -> Dict[str, Any]:
+    """Render each upstream master once (concurrently, capped) and derive every
+    requested size/format from it locally."""
+    if len(req.variants) > IMAGE_VARIANT_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {IMAGE_VARIANT_MAX} variants per batch")
+
+    campaign = await campaign_profile(req.campaignId, req.campaignData)
+    store = asset_store_service.get_store()
+    if req.cropFromMaster:
+        master_ratios = [req.variants[0].aspectRatio]
+    else:
+        master_ratios = list(dict.fromkeys(v.aspectRatio for v in req.variants))
+
+    limit = asyncio.Semaphore(IMAGE_VARIANT_CONCURRENCY)
+
+    async def render_master(aspect_ratio: str) -> Dict[str, Any]:
+        async with limit:
+            key = await render_image(
+                build_image_prompt(campaign, req.scriptQA, req.script, aspect_ratio), "png", aspect_ratio
+            )
+        data = await store.read(key)
+        width, height = await asyncio.to_thread(image_variant_service.dimensions, data)
+        return {"aspectRatio": aspect_ratio, "key": key, "data": data, "width": width, "height": height}
+
+    masters = await asyncio.gather(*(render_master(r) for r in master_ratios), return_exceptions=True)
+    masters = dict(zip(master_ratios, masters))
+
+    async def make_variant(variant: ImageVariant) -> Dict[str, Any]:
+        master = masters.get(variant.aspectRatio) or masters[master_ratios[0]]
+        result = variant.model_dump()
+        if isinstance(master, Exception):
+            result["error"] = getattr(master, "detail", None) or str(master)
+            return result
+
+        untouched = (
+            master["aspectRatio"] == variant.aspectRatio and variant.format == "png"
+            and (variant.width is None or variant.width >= master["width"])
         )
+        if untouched:
+            key, width, height = master["key"], master["width"], master["height"]
+        else:
+            try:
+                with metrics_service.stage("image.derive"):
+                    data, width, height = await asyncio.to_thread(
+                        image_variant_service.derive, master["data"], variant.aspectRatio, variant.format, variant.width
+                    )
+                key = await store.put_bytes(data, variant.format)
+            except Exception as e:
+                logger.error(f"Failed to derive {variant.aspectRatio} {variant.format} variant: {e}")
+                result["error"] = str(e)
+                return result
+
+        result.update({
+            "source": "upstream" if untouched else "derived",
+            "width": width,
+            "height": height,
+            "imageUrl": asset_store_service.asset_url(key),
+            "assetKey": key,
+        })
+        return result
 
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Stability API Error: {response.text}")
+    variants = await asyncio.gather(*(make_variant(v) for v in req.variants))
+    if all("error" in v for v in variants):
+        raise HTTPException(status_code=500, detail=variants[0]["error"])
 
-        image_url = response.json().get("image")
-        if not image_url:
-            raise HTTPException(status_code=500, detail="No image URL returned from Stability AI.")
+    return {
+        "masters": [
+            {"aspectRatio": r, "imageUrl": asset_store_service.asset_url(m["key"]), "assetKey": m["key"]}
+            for r, m in masters.items() if not isinstance(m, Exception)
+        ],
+        "variants": variants,
+    }
 
-        return {"imageUrl": image_url}
 
+async def run_image_ad_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await render_image_ad(ImageAdRequest(**payload))
+
+
+async def run_image_variants_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await render_image_variants(ImageVariantBatchRequest(**payload))
+
+
+job_service.get_queue().register("image_ad", run_image_ad_job)
+job_service.get_queue().register("image_variants", run_image_variants_job)
+
+
+def stability_key() -> str:
+    # Jobs sharing a Stability key share its concurrency limit.
+    return "stability:" + hashlib.sha256((os.getenv("STABILITY_API_KEY") or "").encode()).hexdigest()[:12]
+
+
+@router.post("/generate-image-ad")
+async def generate_image_ad(req: ImageAdRequest):
+    try:
+        return await render_image_ad(req)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Stability AI Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Stability AI Error: {str(e)}")
+
+
+@router.post("/generate-image-ad/jobs", status_code=202)
+async def submit_image_ad_job(req: ImageAdRequest):
+    """Queue the generation and return at once; poll /jobs/{jobId} or listen on /jobs/{jobId}/events."""
+    job = await job_service.get_queue().submit("image_ad", req.model_dump(), key=stability_key())
+    return job_service.public_view(job)
+
+
+@router.post("/generate-image-variants")
+async def generate_image_variants(req: ImageVariantBatchRequest):
+    """Several sizes/formats of the same ad from one prompt and as few upstream renders as possible."""
+    # Batches yield the Stability quota to single interactive renders.
+    scheduler_service.set_priority(scheduler_service.BACKGROUND)
+    try:
+        return await render_image_variants(req)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Stability AI Error: {str(e)}")
+
+
+@router.post("/generate-image-variants/jobs", status_code=202)
+async def submit_image_variants_job(req: ImageVariantBatchRequest):
+    job = await job_service.get_queue().submit("image_variants", req.model_dump(), key=stability_key())
+    return job_service.public_view(job)
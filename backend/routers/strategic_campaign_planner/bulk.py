@@ -0,0 +1,140 @@
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import Optional
+import os
+from dotenv import load_dotenv
+from services import batch_service, log_service
+from routers.strategic_campaign_planner.recommendation import RecommendationRequest, recommend, _ndjson
+
+load_dotenv()
+router = APIRouter()
+logger = log_service.get_logger("bulk")
+
+# Bulk campaigns skip the script-wizard prefetch unless asked; an agency
+# onboarding 500 businesses won't open the wizard for all of them.
+BULK_PREFETCH_WIZARD = os.getenv("BULK_PREFETCH_WIZARD", "false").lower() == "true"
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(5 * 1024 * 1024)))
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl",
+           "text/csv": "csv", "application/x-ndjson": "jsonl", "application/jsonl": "jsonl"}
+
+
+def upload_format(file: UploadFile) -> str:
+    name = (file.filename or "").lower()
+    for suffix, fmt in FORMATS.items():
+        if suffix.startswith(".") and name.endswith(suffix):
+            return fmt
+    fmt = FORMATS.get((file.content_type or "").split(";")[0].strip())
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Upload a .csv or .jsonl file")
+    return fmt
+
+
+def validate(raw: dict):
+    """(input, None) for a valid row, (raw, error) otherwise."""
+    if not isinstance(raw, dict) or "_error" in raw:
+        return None, raw.get("_error") if isinstance(raw, dict) else "Row is not an object"
+    try:
+        return RecommendationRequest.model_validate(raw).model_dump(), None
+    except ValidationError as e:
+        return raw, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+
+def row_line(row: dict, business: Optional[dict]) -> str:
+    line = {"row": row["row"], "businessName": (business or {}).get("businessName"), "status": row["status"]}
+    for key in ("campaignId", "error", "result"):
+        if row.get(key) is not None:
+            line[key] = row[key]
+    return _ndjson("row", line)
+
+
+async def _stream_batch(batch_id: str, invalid: list):
+    store = batch_service.get_store()
+    batch = await store.get(batch_id)
+    yield _ndjson("batch", batch)
+    for row in invalid:
+        yield row_line(row, row["input"])
+
+    inputs = {row["row"]: row["input"] for row in await store.rows(batch_id)}
+    options = batch["options"]
+
+    async def process(data: dict):
+        result = await recommend(RecommendationRequest.model_validate(data), options.get("contentMode"),
+                                 prefetch=options.get("prefetchWizard", False))
+        return result["campaignId"], result
+
+    try:
+        async for outcome in batch_service.run(batch_id, process, options.get("concurrency", batch_service.BULK_CONCURRENCY)):
+            yield row_line(outcome, inputs.get(outcome["row"]))
+    except Exception as e:
+        logger.error(f"Batch {batch_id} stopped: {e}")
+        yield _ndjson("error", {"batchId": batch_id, "detail": str(e)})
+    # Always the last line, so clients know the stream ended and can resume.
+    try:
+        summary = await store.get(batch_id)
+    except Exception as e:
+        logger.error(f"Could not load batch {batch_id}: {e}")
+        summary = {"batchId": batch_id}
+    yield _ndjson("done", summary)
+
+
+@router.post("/bulk")
+async def create_bulk(file: UploadFile = File(...), contentMode: Optional[str] = None, concurrency: Optional[int] = None):
+    """Generate a campaign per row of a CSV or JSON-lines upload of RecommendationRequest rows.
+
+    Streams NDJSON: a `batch` line (with the batchId to resume with), one `row`
+    line per business as it finishes (invalid rows first), then `done`.
+    CSV list columns take a JSON array or `;`-separated items.
+    """
+    if not os.getenv("PERPLEXITY_API_KEY"):
+        raise HTTPException(status_code=500, detail="Missing Perplexity API Key")
+    fmt = upload_format(file)
+    data = await file.read(BULK_MAX_BYTES + 1)
+    if len(data) > BULK_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload is larger than {BULK_MAX_BYTES} bytes")
+    try:
+        rows = [validate(raw) for raw in batch_service.parse_upload(data, fmt)]
+    except batch_service.BatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    options = {
+        "contentMode": contentMode,
+        "concurrency": max(1, min(concurrency or batch_service.BULK_CONCURRENCY, batch_service.BULK_CONCURRENCY)),
+        "prefetchWizard": BULK_PREFETCH_WIZARD,
+    }
+    store = batch_service.get_store()
+    batch_id = await store.create(rows, options)
+    logger.info("Created bulk batch", extra={"fields": {"batchId": batch_id, "rows": len(rows)}})
+    invalid = await store.rows(batch_id, (batch_service.INVALID,))
+    return StreamingResponse(_stream_batch(batch_id, invalid), media_type="application/x-ndjson")
+
+
+@router.post("/bulk/{batch_id}/resume")
+async def resume_bulk(batch_id: str):
+    """Continue a batch: only pending and failed rows (and rows abandoned by a dead worker) are processed."""
+    if await batch_service.get_store().get(batch_id) is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    return StreamingResponse(_stream_batch(batch_id, []), media_type="application/x-ndjson")
+
+
+@router.get("/bulk/{batch_id}")
+async def get_bulk(batch_id: str):
+    batch = await batch_service.get_store().get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    return batch
+
+
+@router.get("/bulk/{batch_id}/rows")
+async def get_bulk_rows(batch_id: str, status: Optional[str] = None):
+    """Every row's status and campaignId (fetch campaigns from /campaigns/{campaignId})."""
+    store = batch_service.get_store()
+    if await store.get(batch_id) is None:
+        raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+    statuses = (status,) if status else batch_service.STATUSES
+    rows = await store.rows(batch_id, statuses)
+    return {"rows": [
+        {"row": r["row"], "businessName": (r["input"] or {}).get("businessName"), "status": r["status"],
+         "campaignId": r["campaignId"], "error": r["error"]}
+        for r in rows
+    ]}
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any, Optional
+from services import campaign_store_service
+from models.campaign_model import Campaign
+
+router = APIRouter()
+
+
+async def campaign_profile(campaign_id: Optional[str], campaign_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Business profile for a downstream prompt: loaded by id, or taken from an inline
+    `campaignData` blob for clients that still send one."""
+    if campaign_id:
+        profile = await campaign_store_service.get_store().get_profile(campaign_id)
+        if profile is None:
+            raise HTTPException(status_code=404, detail=f"Campaign {campaign_id} not found")
+        return profile
+    if campaign_data is not None:
+        return campaign_data
+    raise HTTPException(status_code=422, detail="Either campaignId or campaignData is required")
+
+
+async def platform_content(campaign_id: Optional[str], platform: str, campaign_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """One platform's content recommendation, or an empty one if there is none."""
+    if campaign_id:
+        content = await campaign_store_service.get_store().get_platform_content(campaign_id, platform)
+        return content or {"platform": platform, "recommendations": []}
+    for item in (campaign_data or {}).get("contentRecommendation", []):
+        if item.get("platform") == platform:
+            return item
+    return {"platform": platform, "recommendations": []}
+
+
+@router.get("/campaigns/{campaign_id}", response_model=Campaign)
+async def get_campaign(campaign_id: str):
+    campaign = await campaign_store_service.get_store().get(campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail=f"Campaign {campaign_id} not found")
+    return campaign
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import List
+from services import competitor_service, log_service
+from models.campaign_model import Competitor
+
+router = APIRouter()
+logger = log_service.get_logger("competitor")
+
+
+class CompetitorEnrichRequest(BaseModel):
+    competitors: List[Competitor] = Field(min_length=1, max_length=50)
+
+
+def require_provider():
+    if competitor_service.get_provider() is None:
+        raise HTTPException(status_code=503, detail="No traffic provider configured (TRAFFIC_PROVIDER)")
+
+
+@router.post("/enrich")
+async def enrich_competitors(req: CompetitorEnrichRequest):
+    """Add provider traffic to competitors that name a domain, e.g. from a recommendation's `competitors`."""
+    require_provider()
+    competitors = [c.model_dump() for c in req.competitors]
+    return {"competitors": await competitor_service.enrich_competitors(competitors)}
+
+
+@router.get("/traffic/{domain:path}")
+async def get_traffic(domain: str):
+    require_provider()
+    normalized = competitor_service.normalize_domain(domain)
+    if normalized is None:
+        raise HTTPException(status_code=400, detail=f"Not a domain: {domain}")
+    try:
+        traffic = await competitor_service.get_traffic(normalized)
+    except Exception as e:
+        logger.error(f"Traffic lookup failed for {normalized}: {e}")
+        raise HTTPException(status_code=500, detail=f"Traffic provider error: {str(e)}")
+    if traffic is None:
+        raise HTTPException(status_code=404, detail=f"No traffic data for {normalized}")
+    return {"domain": normalized, "traffic": traffic}
@@ -1,14 +1,13 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List
-import requests
 import os
 from dotenv import load_dotenv
-import json
-import re
+from services import perplexity_service, llm_json_service, log_service, prompt_service
 
 load_dotenv()
 router = APIRouter()
+logger = log_service.get_logger("content")
 
 class ContentGenerationRequest(BaseModel):
     businessName: str
@@ -20,21 +19,16 @@ class ContentGenerationRequest(BaseModel):
     industry: str
 
 @router.post("/generate-content")
-def generate_content(data: ContentGenerationRequest):
+async def generate_content(data: ContentGenerationRequest):
     api_key = os.getenv("PERPLEXITY_API_KEY")
     if not api_key:
         raise HTTPException(status_code=500, detail="Missing Perplexity API Key")
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    goals = prompt_service.listing(data.businessGoals)
+    demographics = prompt_service.listing(data.demographics)
+    interests = prompt_service.listing(data.interests)
 
-    goals = ", ".join(data.businessGoals)
-    demographics = ", ".join(data.demographics)
-    interests = ", ".join(data.interests)
-
-    prompt = f"""
+    prompt = prompt_service.finalize("content", f"""
 You are a content strategist helping businesses create high-performing social media content.
 
 Given the following business details, generate:
@@ -51,68 +45,43 @@ Given the following business details, generate:
 4. Recommend hashtags relevant to each caption.
 
 Return a clean JSON with:
-{
+{{
   "recommendedPlatform": "Platform Name",
   "captions": [
-    {
+    {{
       "text": "...",
       "rationale": "...",
       "hashtags": ["...", "..."]
-    },
+    }},
     ...
   ]
-}
+}}
 
 Business Info:
-- Name: {data.businessName}
-- Description: {data.businessDescription}
+- Name: {prompt_service.clip(data.businessName, "short")}
+- Description: {prompt_service.clip(data.businessDescription, "description")}
 - Goals: {goals}
 - Demographics: {demographics}
 - Interests: {interests}
-- Location: {data.location}
-- Industry: {data.industry}
-"""
+- Location: {prompt_service.clip(data.location, "short")}
+- Industry: {prompt_service.clip(data.industry, "short")}
+""")
 
     try:
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json={
-                "model": "sonar-pro",
-                "messages": [{"role": "user", "content": prompt}]
-            }
-        )
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Perplexity Error: {response.text}")
-
-        raw_text = response.json()["choices"][0]["message"]["content"]
-
-        if raw_text.strip().startswith("```json"):
-            raw_text = raw_text.strip()[7:-3].strip()
-        elif raw_text.strip().startswith("```"):
-            raw_text = raw_text.strip()[3:-3].strip()
-
-        match = re.search(r"\{.*\}", raw_text, re.DOTALL)
-        if not match:
-            raise HTTPException(status_code=500, detail="No valid JSON found.")
-        json_block = match.group(0)
-
-        json_block = re.sub(r"\[\d+\]", "", json_block)
-        json_block = json_block.replace("‘", "'").replace("’", "'").replace("“", '"').replace("”", '"')
-        json_block = re.sub(r'([{,]\s*)([a-zA-Z_][a-zA-Z0-9_]*)(\s*):', r'"\2":', json_block)
-        json_block = re.sub(r",\s*(\}|\])", r"\1", json_block)
+        raw_text = await perplexity_service.chat_content(prompt, cache_namespace="content")
 
-        parsed = json.loads(json_block)
+        parsed = llm_json_service.parse_llm_object(raw_text)
 
         if "recommendedPlatform" not in parsed or "captions" not in parsed:
             raise HTTPException(status_code=500, detail="Missing required fields in Perplexity output")
 
         return parsed
 
-    except json.JSONDecodeError as jde:
-        print("❌ JSON Decode Error:", jde)
+    except llm_json_service.LLMJSONError as jde:
+        log_service.log_failed_output(logger, "content", raw_text, jde)
+        await perplexity_service.evict(prompt)
         raise HTTPException(status_code=500, detail=f"Perplexity returned invalid JSON: {str(jde)}")
 
     except Exception as e:
+        await perplexity_service.evict(prompt)
         raise HTTPException(status_code=500, detail=f"Perplexity Error: {str(e)}")
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+import json
+from services import job_service
+
+router = APIRouter()
+
+HEARTBEAT_SECONDS = 15
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    queue = job_service.get_queue()
+    await queue.start()
+    job = await queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_service.public_view(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Server-Sent Events: comment heartbeats while the job runs, then one `completion` event."""
+    queue = job_service.get_queue()
+    await queue.start()
+    if await queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        while True:
+            job = await queue.wait(job_id, timeout=HEARTBEAT_SECONDS)
+            if job is None:
+                return
+            if job["status"] in job_service.FINISHED:
+                yield f"event: completion\ndata: {json.dumps(job_service.public_view(job))}\n\n"
+                return
+            if await request.is_disconnected():
+                return
+            yield f": {job['status']}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
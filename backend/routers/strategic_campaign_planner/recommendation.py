@@ -1,44 +1,60 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import List, Optional
 import requests
 import os
+import time
 from dotenv import load_dotenv
+import asyncio
 import json
-import re
-import ast
+from services import perplexity_service, llm_json_service, campaign_store_service, job_service, metrics_service, log_service, prompt_service, competitor_service, similarity_service
+from models.campaign_model import (
+    CampaignProfile,
+    StrategyRecommendation,
+    PlatformContent,
+    RecommendationResponse,
+    STRATEGY_SECTIONS,
+    SECTION_ADAPTERS,
+)
 
 load_dotenv()
 router = APIRouter()
+logger = log_service.get_logger("recommendation")
+
+# "single" asks for every platform's captions in one completion; "per_platform"
+# fans out one smaller completion per platform, bounded by CONTENT_FANOUT_CONCURRENCY.
+CONTENT_MODE = os.getenv("CONTENT_RECOMMENDATION_MODE", "single")
+CONTENT_FANOUT_CONCURRENCY = int(os.getenv("CONTENT_FANOUT_CONCURRENCY", "4"))
+# Precompute the script wizard's ad types and questions for every new campaign.
+PREFETCH_WIZARD = os.getenv("PREFETCH_WIZARD", "true").lower() == "true"
+# When a near-duplicate business (same industry and location) already has a
+# strategy, a cheaper model adapts it instead of writing one from scratch.
+SIMILARITY_ADAPT_MODEL = os.getenv("SIMILARITY_ADAPT_MODEL", "sonar")
+
+STRATEGY_FORMAT = perplexity_service.response_format(StrategyRecommendation.model_json_schema())
+PLATFORM_CONTENT_FORMAT = perplexity_service.response_format(PlatformContent.model_json_schema())
 
 def sanitize_text(text):
     return text.encode('utf-8', 'surrogatepass').decode('utf-8', 'ignore')
 
-class RecommendationRequest(BaseModel):
-    businessName: str
-    businessDescription: str
-    businessGoals: List[str]
-    demographics: List[str]
-    interests: List[str]
-    location: str
-    industry: str
-
-@router.post("/generate-recommendation")
-def generate_recommendation(data: RecommendationRequest):
-    api_key = os.getenv("PERPLEXITY_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="Missing Perplexity API Key")
+class RecommendationRequest(CampaignProfile):
+    pass
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
 
-    goals = ", ".join(data.businessGoals)
-    demographics = ", ".join(data.demographics)
-    interests = ", ".join(data.interests)
+def business_info(data: CampaignProfile) -> str:
+    return f"""Business Info:
+- Name: {prompt_service.clip(data.businessName, "short")}
+- Description: {prompt_service.clip(data.businessDescription, "description")}
+- Goals: {prompt_service.listing(data.businessGoals)}
+- Demographics: {prompt_service.listing(data.demographics)}
+- Interests: {prompt_service.listing(data.interests)}
+- Location: {prompt_service.clip(data.location, "short")}
+- Industry: {prompt_service.clip(data.industry, "short")}"""
 
-    prompt = f"""
+
+def build_strategy_prompt(data: RecommendationRequest) -> str:
+    return prompt_service.finalize("strategy", f"""
 You are a digital advertising strategist and campaign planner with access to real-time weather and event data.
 
 Your goal is to recommend 3–5 personalized ad platforms that are highly relevant for the business below, and also list 2–3 ad platforms that are not suitable. Base your recommendations on:
@@ -57,6 +73,8 @@ Each not recommended platform must include:
 - matchScore (0–100)
 - rationale
 
+For each competitor, "domain" is its website's domain (e.g. "example.com"), or null if it has none.
+
 Your JSON must include:
 
 "recommendedPlatforms": [{{ name, matchScore, rationale, campaignTypes }}],
@@ -65,104 +83,58 @@ Your JSON must include:
    "globalKeywords": ["..."],
    "localKeywords": ["..."]
 }},
-"competitors": [{{ name, description, estimatedMonthlyTraffic, marketingChannels, strength, weakness }}],
+"competitors": [{{ name, domain, description, estimatedMonthlyTraffic, marketingChannels, strength, weakness }}],
 "strategyTips": ["...", "...", "..."],
 "localContext": {{
    "weatherSummary": "...",
    "eventsSummary": [{{ name, date, location, relevance }}]
 }}
 
-Business Info:
-- Name: {data.businessName}
-- Description: {data.businessDescription}
-- Goals: {goals}
-- Demographics: {demographics}
-- Interests: {interests}
-- Location: {data.location}
-- Industry: {data.industry}
+{business_info(data)}
 
 Return valid JSON only.
-"""
+""")
 
-    try:
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json={
-                "model": "sonar-pro",
-                "messages": [{"role": "user", "content": sanitize_text(prompt)}]
-            }
-        )
-
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Perplexity Error: {response.text}")
-
-        raw_text = response.json()["choices"][0]["message"]["content"]
-        print("\n📦 Perplexity raw response:\n", raw_text)
-
-        if raw_text.strip().startswith("```json"):
-            raw_text = raw_text.strip()[7:-3].strip()
-        elif raw_text.strip().startswith("```"):
-            raw_text = raw_text.strip()[3:-3].strip()
-
-        match = re.search(r"\{.*\}", raw_text, re.DOTALL)
-        if not match:
-            raise HTTPException(status_code=500, detail="No valid JSON found.")
-        json_block = match.group(0)
-
-        json_block = re.sub(r"\[\d+\]", "", json_block)
-        json_block = json_block.replace("‘", "'").replace("’", "'").replace("“", "\"").replace("”", "\"")
-        json_block = re.sub(r'([{,]\s*)([a-zA-Z_][a-zA-Z0-9_]*)(\s*):', r'\1"\2"\3:', json_block)
-        json_block = re.sub(r",\s*(\}|\])", r"\1", json_block)
-
-        print("\n✅ Cleaned JSON block:\n", json_block)
 
-        try:
-            parsed = json.loads(json_block)
-        except json.JSONDecodeError:
-            try:
-                parsed = ast.literal_eval(json_block)
-            except Exception as e:
-                with open("broken_llm_output.json", "w") as f:
-                    f.write(raw_text)
-                raise HTTPException(status_code=500, detail=f"Perplexity returned invalid JSON: {str(e)}")
-
-        for k in ["recommendedPlatforms", "notRecommendedPlatforms", "keywords", "competitors", "strategyTips", "localContext"]:
-            if k not in parsed:
-                raise HTTPException(status_code=500, detail=f"Missing key: {k}")
-
-        if not isinstance(parsed["keywords"], dict):
-            raise HTTPException(status_code=500, detail="Invalid keywords")
-
-        local_ctx = parsed["localContext"]
-        if "weatherSummary" not in local_ctx or "eventsSummary" not in local_ctx:
-            raise HTTPException(status_code=500, detail="Missing weatherSummary/eventsSummary")
-
-        if not isinstance(local_ctx["eventsSummary"], list):
-            raise HTTPException(status_code=500, detail="eventsSummary should be a list")
-
-        for event in local_ctx["eventsSummary"]:
-            if isinstance(event, dict):
-                loc = event.get("location")
-                if isinstance(loc, str):
-                    city = loc.split(",")[0].strip() if "," in loc else loc.strip()
-                    state = loc.split(",")[1].strip() if "," in loc else ""
-                    event["location"] = {
-                        "street": "",
-                        "city": city,
-                        "state": state,
-                        "zip": "",
-                    }
-                loc = event["location"]
-                if isinstance(loc, dict) and "mapsLink" not in loc:
-                    address = f"{loc.get('street', '')}, {loc.get('city', '')}, {loc.get('state', '')} {loc.get('zip', '')}"
-                    maps_url = f"https://www.google.com/maps/dir/?api=1&destination={requests.utils.quote(address)}"
-                    loc["mapsLink"] = maps_url
-                    event["location"] = loc
-
-        print("\n📌 Parsed eventsSummary:\n", local_ctx["eventsSummary"])
-
-        content_prompt = f"""
+def build_adapt_prompt(data: RecommendationRequest, seed: dict) -> str:
+    # localContext is dated; it is always written fresh.
+    reference = {key: seed[key] for key in STRATEGY_SECTIONS if key in seed and key != "localContext"}
+    return prompt_service.finalize("strategy_adapt", f"""
+You are a digital advertising strategist and campaign planner with access to real-time weather and event data.
+
+Below is a strategy written for a very similar business in the same industry and location. Adapt it to the business below: keep what still fits, and change platforms, match scores, rationales, keywords, competitors and tips wherever this business differs.
+
+Write "localContext" from scratch from the current weather forecast in that location and only relevant local events — NOT general ones.
+
+For each competitor, "domain" is its website's domain (e.g. "example.com"), or null if it has none.
+
+Your JSON must include "recommendedPlatforms", "notRecommendedPlatforms", "keywords", "competitors" and "strategyTips" in the same shape as the reference, plus:
+
+"localContext": {{
+   "weatherSummary": "...",
+   "eventsSummary": [{{ name, date, location, relevance }}]
+}}
+
+Reference strategy:
+{json.dumps(reference, ensure_ascii=False, separators=(",", ":"))}
+
+{business_info(data)}
+
+Return valid JSON only.
+""")
+
+
+def strategy_similarity_key(data: RecommendationRequest):
+    """(partition, features) for the "recommendation" similarity namespace."""
+    partition = similarity_service.partition_key(data.industry, data.location)
+    features = similarity_service.features(
+        data.businessDescription, goal=data.businessGoals, demographic=data.demographics, interest=data.interests
+    )
+    return partition, features
+
+
+def build_content_prompt(description: str, platform_names: List[str]) -> str:
+    return prompt_service.finalize("content_recommendation", f"""
 You are an AI content strategist.
 
 For each of the following ad platforms, generate 3 individual content recommendation sets.
@@ -189,55 +161,413 @@ Output JSON format:
 ]
 
 Business Description:
-{data.businessDescription}
+{prompt_service.clip(description, "description")}
 
 Recommended Platforms:
-{[p['name'] for p in parsed['recommendedPlatforms']]}
-"""
+{prompt_service.listing(platform_names, item_field="short")}
+""")
+
+
+def build_platform_content_prompt(description: str, platform_name: str) -> str:
+    platform_name = prompt_service.clip(platform_name, "short")
+    return prompt_service.finalize("platform_content", f"""
+You are an AI content strategist.
+
+Generate 3 individual content recommendation sets for the ad platform {platform_name}.
+
+Each set should include:
+- a caption
+- an explanation of why it works for the business
+- relevant hashtags (as an array)
+
+Output JSON format:
+{{
+  "platform": "{platform_name}",
+  "recommendations": [
+    {{
+      "caption": "...",
+      "explanation": "...",
+      "hashtags": ["...", "..."]
+    }},
+    ...
+  ]
+}}
+
+Business Description:
+{prompt_service.clip(description, "description")}
+""")
+
+
+def build_section_repair_prompt(data: RecommendationRequest, section: str) -> str:
+    return prompt_service.finalize("section_repair", f"""
+You are a digital advertising strategist and campaign planner with access to real-time weather and event data.
+
+An earlier answer for the business below was missing or had an invalid "{section}" section.
+Return ONLY a JSON object with a single key "{section}" that matches the provided schema.
+
+{business_info(data)}
+
+Return valid JSON only.
+""")
+
+
+def parse_strategy(raw_text: str) -> dict:
+    try:
+        return llm_json_service.parse_llm_object(raw_text)
+    except llm_json_service.LLMJSONError as e:
+        log_service.log_failed_output(logger, "strategy", raw_text, e)
+        raise HTTPException(status_code=500, detail=f"Perplexity returned invalid JSON: {str(e)}")
+
+
+def normalize_local_context(local_ctx):
+    if not isinstance(local_ctx, dict) or not isinstance(local_ctx.get("eventsSummary"), list):
+        return
+
+    for event in local_ctx["eventsSummary"]:
+        if isinstance(event, dict):
+            loc = event.get("location")
+            if isinstance(loc, str):
+                city = loc.split(",")[0].strip() if "," in loc else loc.strip()
+                state = loc.split(",")[1].strip() if "," in loc else ""
+                event["location"] = {
+                    "street": "",
+                    "city": city,
+                    "state": state,
+                    "zip": "",
+                }
+            loc = event.get("location")
+            if isinstance(loc, dict) and "mapsLink" not in loc:
+                address = f"{loc.get('street', '')}, {loc.get('city', '')}, {loc.get('state', '')} {loc.get('zip', '')}"
+                maps_url = f"https://www.google.com/maps/dir/?api=1&destination={requests.utils.quote(address)}"
+                loc["mapsLink"] = maps_url
+                event["location"] = loc
+
+
+def section_is_valid(section: str, value) -> bool:
+    if value is None:
+        return False
+    try:
+        SECTION_ADAPTERS[section].validate_python(value)
+        return True
+    except ValidationError:
+        return False
+
+
+async def repair_section(data: RecommendationRequest, section: str):
+    """Re-request a single strategy section instead of re-running the whole prompt."""
+    prompt = sanitize_text(build_section_repair_prompt(data, section))
+    schema = {
+        "type": "object",
+        "properties": {section: SECTION_ADAPTERS[section].json_schema()},
+        "required": [section],
+    }
+    params = perplexity_service.response_format(schema)
+    try:
+        raw_text = await perplexity_service.chat_content(prompt, cache_namespace="recommendation", **params)
+        value = llm_json_service.parse_llm_object(raw_text).get(section)
+        if section == "localContext":
+            normalize_local_context(value)
+        SECTION_ADAPTERS[section].validate_python(value)
+        return value
+    except Exception as e:
+        await perplexity_service.evict(prompt, **params)
+        detail = e.text if isinstance(e, perplexity_service.PerplexityError) else str(e)
+        raise HTTPException(status_code=500, detail=f"Could not repair {section}: {detail}")
+
+
+async def ensure_strategy(data: RecommendationRequest, parsed: dict) -> dict:
+    """Validate every section against the schema, repairing only the broken ones."""
+    normalize_local_context(parsed.get("localContext"))
+    broken = [section for section in STRATEGY_SECTIONS if not section_is_valid(section, parsed.get(section))]
+    if broken:
+        logger.info("Repairing strategy sections", extra={"fields": {"sections": broken}})
+        metrics_service.LLM_REPAIRS.labels("strategy_section").inc(len(broken))
+        repaired = await asyncio.gather(*[repair_section(data, section) for section in broken])
+        parsed.update(zip(broken, repaired))
+    return StrategyRecommendation.model_validate(parsed).model_dump()
+
+
+def parse_content_recommendation(content_text: str):
+    return llm_json_service.parse_llm_json(content_text)
+
+
+async def _generate_platform_content(description: str, platform_name: str, semaphore: asyncio.Semaphore) -> dict:
+    content_prompt = sanitize_text(build_platform_content_prompt(description, platform_name))
+    async with semaphore:
+        try:
+            with metrics_service.stage("content.platform_llm"):
+                content_text = await perplexity_service.chat_content(
+                    content_prompt, cache_namespace="content_recommendation", **PLATFORM_CONTENT_FORMAT
+                )
+            parsed = parse_content_recommendation(content_text)
+            if isinstance(parsed, list):
+                parsed = parsed[0] if parsed else {}
+            return PlatformContent.model_validate({
+                "platform": platform_name,
+                "recommendations": parsed.get("recommendations", [])
+            }).model_dump(exclude_none=True)
+        except Exception as e:
+            # One slow or broken platform should not sink the others.
+            detail = e.text if isinstance(e, perplexity_service.PerplexityError) else str(e)
+            await perplexity_service.evict(content_prompt, **PLATFORM_CONTENT_FORMAT)
+            logger.warning(f"Content recommendation failed for {platform_name}: {detail}")
+            return {"platform": platform_name, "recommendations": [], "error": detail}
+
+
+async def generate_content_recommendation(description: str, platform_names: List[str], mode: Optional[str] = None):
+    semaphore = asyncio.Semaphore(CONTENT_FANOUT_CONCURRENCY)
+    if (mode or CONTENT_MODE) == "per_platform":
+        return list(await asyncio.gather(
+            *[_generate_platform_content(description, name, semaphore) for name in platform_names]
+        ))
+
+    content_prompt = sanitize_text(build_content_prompt(description, platform_names))
+    try:
+        with metrics_service.stage("content.llm"):
+            content_text = await perplexity_service.chat_content(content_prompt, cache_namespace="content_recommendation")
+    except perplexity_service.PerplexityError as pe:
+        raise HTTPException(status_code=500, detail=f"Content Generation Error: {pe.text}")
+    log_service.log_payload(logger, "Content recommendation response", content_text)
+
+    try:
+        items = parse_content_recommendation(content_text)
+    except llm_json_service.LLMJSONError as e:
+        log_service.log_failed_output(logger, "content_recommendation", content_text, e)
+        items = []
+    if not isinstance(items, list):
+        items = [items]
+
+    valid = []
+    for item in items:
+        try:
+            valid.append(PlatformContent.model_validate(item).model_dump(exclude_none=True))
+        except ValidationError:
+            continue
+
+    # Regenerate only the platforms that came back missing or malformed.
+    covered = {item["platform"].lower() for item in valid}
+    missing = [name for name in platform_names if name.lower() not in covered]
+    if missing:
+        if not valid:
+            await perplexity_service.evict(content_prompt)
+        logger.info("Repairing content recommendations", extra={"fields": {"platforms": missing}})
+        metrics_service.LLM_REPAIRS.labels("content_platform").inc(len(missing))
+        valid.extend(await asyncio.gather(
+            *[_generate_platform_content(description, name, semaphore) for name in missing]
+        ))
+    return valid
+
+
+async def save_campaign(data: RecommendationRequest, strategy: dict, content: Optional[list],
+                        prefetch: bool = PREFETCH_WIZARD) -> str:
+    campaign_id = await campaign_store_service.get_store().create(data.model_dump(), strategy, content)
+    if prefetch:
+        try:
+            await job_service.get_queue().submit("wizard_prefetch", {"campaignId": campaign_id}, key="wizard_prefetch")
+        except Exception as e:
+            logger.warning(f"Could not queue wizard prefetch: {e}")
+    return campaign_id
 
-        content_response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json={
-                "model": "sonar-pro",
-                "messages": [{"role": "user", "content": sanitize_text(content_prompt)}]
-            }
-        )
 
-        if content_response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Content Generation Error: {content_response.text}")
+@router.post("/generate-recommendation", response_model=RecommendationResponse)
+async def generate_recommendation(data: RecommendationRequest, contentMode: Optional[str] = None):
+    api_key = os.getenv("PERPLEXITY_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Missing Perplexity API Key")
 
-        content_text = content_response.json()["choices"][0]["message"]["content"]
-        print("\n🧠 Content Recommendation Raw Response:\n", content_text)
+    return await recommend(data, contentMode)
 
-        if content_text.strip().startswith("```json"):
-            content_text = content_text.strip()[7:-3].strip()
-        elif content_text.strip().startswith("```"):
-            content_text = content_text.strip()[3:-3].strip()
 
-        content_text = re.sub(r'([{,]\s*)([a-zA-Z_][a-zA-Z0-9_]*)(\s*):', r'\1"\2"\3:', content_text)
-        content_text = re.sub(r",\s*(\}|\])", r"\1", content_text)
+async def recommend(data: RecommendationRequest, content_mode: Optional[str] = None,
+                    prefetch: bool = PREFETCH_WIZARD) -> dict:
+    """Strategy, competitors and content for one business, saved as a new campaign."""
+    partition, features = strategy_similarity_key(data)
+    seed = await similarity_service.find("recommendation", partition, features)
+    if seed:
+        prompt, model = sanitize_text(build_adapt_prompt(data, seed["output"])), SIMILARITY_ADAPT_MODEL
+    else:
+        prompt, model = sanitize_text(build_strategy_prompt(data)), perplexity_service.DEFAULT_MODEL
 
+    try:
+        started = time.perf_counter()
+        with metrics_service.stage("recommendation.strategy_llm"):
+            raw_text = await perplexity_service.chat_content(
+                prompt, model=model, cache_namespace="recommendation", **STRATEGY_FORMAT
+            )
+        log_service.log_payload(logger, "Strategy response", raw_text)
+
+        with metrics_service.stage("recommendation.strategy_parse"):
+            parsed = parse_strategy(raw_text)
+        with metrics_service.stage("recommendation.strategy_repair"):
+            parsed = await ensure_strategy(data, parsed)
+        elapsed = time.perf_counter() - started
+        if seed:
+            similarity_service.record_saving("recommendation", seed["generationSeconds"] - elapsed)
+        else:
+            await similarity_service.add(
+                "recommendation", partition, features, {key: parsed[key] for key in STRATEGY_SECTIONS}, elapsed
+            )
+
+        # Traffic lookups run while the content is generated.
+        competitors = asyncio.create_task(competitor_service.enrich_competitors(parsed["competitors"]))
         try:
-            content_recommendation = json.loads(content_text)
-        except:
-            content_recommendation = ast.literal_eval(content_text)
+            with metrics_service.stage("recommendation.content"):
+                content_recommendation = await generate_content_recommendation(
+                    data.businessDescription,
+                    [p['name'] for p in parsed['recommendedPlatforms']],
+                    content_mode
+                )
+        except BaseException:
+            competitors.cancel()
+            raise
+        with metrics_service.stage("recommendation.competitors"):
+            parsed["competitors"] = await competitors
+
+        strategy = {key: parsed[key] for key in STRATEGY_SECTIONS}
+        with metrics_service.stage("recommendation.save"):
+            campaign_id = await save_campaign(data, strategy, content_recommendation, prefetch)
 
         return {
-            "recommendedPlatforms": parsed["recommendedPlatforms"],
-            "notRecommendedPlatforms": parsed["notRecommendedPlatforms"],
-            "keywords": parsed["keywords"],
-            "competitors": parsed["competitors"],
-            "strategyTips": parsed["strategyTips"],
-            "localContext": parsed["localContext"],
-            "contentRecommendation": content_recommendation
+            **strategy,
+            "contentRecommendation": content_recommendation,
+            "campaignId": campaign_id
         }
 
-    except json.JSONDecodeError as jde:
-        print("❌ JSON Decode Error:", jde)
-        with open("broken_llm_output.json", "w") as f:
-            f.write(raw_text)
+    except llm_json_service.LLMJSONError as jde:
+        log_service.log_failed_output(logger, "strategy", raw_text, jde)
+        await perplexity_service.evict(prompt, model=model, **STRATEGY_FORMAT)
         raise HTTPException(status_code=500, detail=f"Perplexity returned invalid JSON: {str(jde)}")
 
     except Exception as e:
+        await perplexity_service.evict(prompt, model=model, **STRATEGY_FORMAT)
         raise HTTPException(status_code=500, detail=f"Perplexity Error: {str(e)}")
+
+
+def _ndjson(section: str, data=None) -> str:
+    line = {"section": section}
+    if data is not None:
+        line["data"] = data
+    return json.dumps(line) + "\n"
+
+
+async def _stream_recommendation(data: RecommendationRequest, content_mode: Optional[str]):
+    queue = asyncio.Queue()
+    content_tasks = []
+    repair_tasks = []
+    competitor_tasks = []
+    sections = {}
+    # Competitors as the LLM wrote them; the similarity index stores those, as recommend() does.
+    llm_competitors = []
+
+    async def content_stage(platform_names):
+        try:
+            content = await generate_content_recommendation(data.businessDescription, platform_names, content_mode)
+            sections["contentRecommendation"] = content
+            await queue.put(_ndjson("contentRecommendation", content))
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            await queue.put(_ndjson("error", {"section": "contentRecommendation", "detail": detail}))
+
+    async def emit_competitors(value):
+        try:
+            sections["competitors"] = await competitor_service.enrich_competitors(value)
+        except Exception as e:
+            # The LLM's competitors are still worth showing (and saving) without traffic.
+            logger.warning(f"Competitor enrichment failed: {e}")
+            sections["competitors"] = value
+            await queue.put(_ndjson("error", {"section": "competitors", "detail": str(e)}))
+        await queue.put(_ndjson("competitors", sections["competitors"]))
+
+    async def emit_section(key, value):
+        if key == "competitors":
+            llm_competitors[:] = value
+            # Traffic lookups shouldn't hold up the sections behind it.
+            competitor_tasks.append(asyncio.create_task(emit_competitors(value)))
+            return
+        sections[key] = value
+        await queue.put(_ndjson(key, value))
+        if key == "recommendedPlatforms":
+            content_tasks.append(asyncio.create_task(content_stage([p["name"] for p in value])))
+
+    async def repair_stage(key):
+        try:
+            await emit_section(key, await repair_section(data, key))
+        except HTTPException as e:
+            await queue.put(_ndjson("error", {"section": key, "detail": e.detail}))
+
+    async def settle(tasks):
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f"Recommendation stream stage failed: {result!r}")
+
+    async def strategy_stage():
+        started = time.perf_counter()
+        prompt = sanitize_text(build_strategy_prompt(data))
+        parser = llm_json_service.StreamingParser(openers="{")
+        handled = set()
+        try:
+            async for delta in perplexity_service.stream_chat_content(prompt, cache_namespace="recommendation", **STRATEGY_FORMAT):
+                for key, value in parser.feed(delta):
+                    if key not in SECTION_ADAPTERS or key in handled:
+                        continue
+                    handled.add(key)
+                    if key == "localContext":
+                        normalize_local_context(value)
+                    if section_is_valid(key, value):
+                        await emit_section(key, value)
+                    else:
+                        repair_tasks.append(asyncio.create_task(repair_stage(key)))
+
+            log_service.log_payload(logger, "Strategy response", parser.buffer)
+            for key in STRATEGY_SECTIONS:
+                if key not in handled:
+                    repair_tasks.append(asyncio.create_task(repair_stage(key)))
+        except Exception as e:
+            await perplexity_service.evict(prompt, **STRATEGY_FORMAT)
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            await queue.put(_ndjson("error", {"section": "strategy", "detail": detail}))
+
+        try:
+            await settle(repair_tasks)
+            elapsed = time.perf_counter() - started
+            await settle(content_tasks)
+            await settle(competitor_tasks)
+
+            # Only complete strategies are worth referencing from downstream calls.
+            if all(key in sections for key in STRATEGY_SECTIONS):
+                strategy = {key: sections[key] for key in STRATEGY_SECTIONS}
+                campaign_id = await save_campaign(data, strategy, sections.get("contentRecommendation"))
+                await queue.put(_ndjson("campaignId", campaign_id))
+                partition, features = strategy_similarity_key(data)
+                await similarity_service.add(
+                    "recommendation", partition, features, {**strategy, "competitors": llm_competitors}, elapsed
+                )
+        except Exception as e:
+            logger.error(f"Recommendation stream failed: {e}")
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            await queue.put(_ndjson("error", {"section": "campaign", "detail": detail}))
+        finally:
+            # The response generator ends on None; it must always arrive.
+            queue.put_nowait(None)
+
+    strategy_task = asyncio.create_task(strategy_stage())
+    try:
+        while True:
+            line = await queue.get()
+            if line is None:
+                break
+            yield line
+        yield _ndjson("done")
+    finally:
+        for task in [strategy_task, *repair_tasks, *content_tasks, *competitor_tasks]:
+            task.cancel()
+
+
+@router.post("/generate-recommendation/stream")
+async def generate_recommendation_stream(data: RecommendationRequest, contentMode: Optional[str] = None):
+    """NDJSON variant: one `{"section": ..., "data": ...}` line per section as soon as it is ready."""
+    api_key = os.getenv("PERPLEXITY_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Missing Perplexity API Key")
+
+    return StreamingResponse(_stream_recommendation(data, contentMode), media_type="application/x-ndjson")
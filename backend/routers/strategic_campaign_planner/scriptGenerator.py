@@ -1,177 +1,320 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import Dict, Any, List, Optional
-import requests
 import os
 import json
+import asyncio
 from dotenv import load_dotenv
+from services import perplexity_service, llm_json_service, campaign_store_service, job_service, scheduler_service, metrics_service, log_service, prompt_service, similarity_service
+from routers.strategic_campaign_planner.campaigns import campaign_profile, platform_content
 
 load_dotenv()
 router = APIRouter()
+logger = log_service.get_logger("script")
+
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))
 
 class ScriptGenRequest(BaseModel):
     platform: str
     adType: str
     answers: Dict[str, str]
-    campaignData: Dict[str, Any]
-
-@router.post("/generate-script")
-def generate_ad_script(payload: ScriptGenRequest):
-    api_key = os.getenv("PERPLEXITY_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="Missing Perplexity API Key")
+    campaignId: Optional[str] = None
+    campaignData: Optional[Dict[str, Any]] = None
 
-    business = payload.campaignData
-    biz_name = business.get("businessName", "the business")
+def build_script_prompt(payload: ScriptGenRequest, business: Dict[str, Any]) -> str:
+    biz_name = prompt_service.clip(business.get("businessName", "the business"), "short")
     location = business.get("location", "")
     city_state = location if isinstance(location, str) else f"{location.get('city', '')}, {location.get('state', '')}"
 
-    formatted_answers = "\n".join([f"{k.strip()}: {v.strip()}" for k, v in payload.answers.items()])
-
-    prompt = f"""
+    return prompt_service.finalize("script", f"""
 You are a senior digital copywriter.
 
 Use the following business info and user answers to generate a high-performing marketing script for the selected platform.
 
 Business Name: {biz_name}
-Location: {city_state}
-Platform: {payload.platform}
-Ad Type: {payload.adType}
-Business Description: {business.get("businessDescription", "")}
-Business Goals: {business.get("businessGoals", [])}
-Demographics: {business.get("demographics", [])}
+Location: {prompt_service.clip(city_state, "short")}
+Platform: {prompt_service.clip(payload.platform, "short")}
+Ad Type: {prompt_service.clip(payload.adType, "short")}
+Business Description: {prompt_service.clip(business.get("businessDescription", ""), "description")}
+Business Goals: {prompt_service.listing(business.get("businessGoals", []))}
+Demographics: {prompt_service.listing(business.get("demographics", []))}
 
 User Answers:
-{formatted_answers}
+{prompt_service.answers(payload.answers)}
 
-Generate a compelling {payload.adType.lower()} for the platform. Make sure it suits the style and audience of the platform.
+Generate a compelling {prompt_service.clip(payload.adType, "short").lower()} for the platform. Make sure it suits the style and audience of the platform.
 
 Return only the final script.
-"""
+""")
+
+
+async def save_script(payload: ScriptGenRequest, script: str):
+    if payload.campaignId:
+        await campaign_store_service.get_store().save_script(payload.campaignId, payload.platform, payload.adType, script)
+
+
+@router.post("/generate-script")
+async def generate_ad_script(payload: ScriptGenRequest):
+    # The user is waiting on this step of the wizard.
+    scheduler_service.set_priority(scheduler_service.INTERACTIVE)
+    api_key = os.getenv("PERPLEXITY_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Missing Perplexity API Key")
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    business = await campaign_profile(payload.campaignId, payload.campaignData)
+    prompt = build_script_prompt(payload, business)
 
     try:
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json={
-                "model": "sonar-pro",
-                "messages": [{"role": "user", "content": prompt}]
-            }
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"Perplexity Error: {response.text}")
-        result = response.json()
-        final_script = result["choices"][0]["message"]["content"]
-        return {"script": final_script.strip()}
+        with metrics_service.stage("script.llm"):
+            final_script = (await perplexity_service.chat_content(prompt, cache_namespace="script")).strip()
     except Exception as e:
+        await perplexity_service.evict(prompt)
         raise HTTPException(status_code=500, detail=str(e))
+    await save_script(payload, final_script)
+    return {"script": final_script}
 
 
-@router.post("/ask-questions")
-def get_available_ad_types(payload: Dict[str, Any]):
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/generate-script/stream")
+async def generate_ad_script_stream(payload: ScriptGenRequest):
+    """Server-Sent Events: a `token` event per delta, then `done` with the full script (or `error`).
+
+    The upstream completion runs in its own task, which is cancelled as soon as the
+    response ends, so a client that goes away stops the Perplexity stream too.
+    """
+    scheduler_service.set_priority(scheduler_service.INTERACTIVE)
     api_key = os.getenv("PERPLEXITY_API_KEY")
     if not api_key:
         raise HTTPException(status_code=500, detail="Missing Perplexity API Key")
 
-    platform = payload.get("platform", "")
-    business = payload.get("campaignData", {})
-    description = business.get("businessDescription", "")
-    goals = business.get("businessGoals", [])
-    content_data = business.get("contentRecommendation", [])
-    captions = []
-    hashtags = []
-
-    for item in content_data:
-        if item.get("platform") == platform:
-            for rec in item.get("recommendations", []):
-                captions.append(rec.get("caption"))
-                hashtags.extend(rec.get("hashtags", []))
-
-    prompt = f"""
+    business = await campaign_profile(payload.campaignId, payload.campaignData)
+    prompt = build_script_prompt(payload, business)
+    queue = asyncio.Queue()
+
+    async def produce():
+        parts = []
+        try:
+            async for delta in perplexity_service.stream_chat_content(prompt, cache_namespace="script"):
+                parts.append(delta)
+                await queue.put(_sse("token", delta))
+            script = "".join(parts).strip()
+            await save_script(payload, script)
+            await queue.put(_sse("done", {"script": script}))
+        except Exception as e:
+            await perplexity_service.evict(prompt)
+            await queue.put(_sse("error", {"detail": str(e)}))
+        await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+
+    async def events():
+        while True:
+            event = await queue.get()
+            if event is None:
+                return
+            yield event
+
+    def cancel_upstream():
+        # Runs once the response is over, including after a client disconnect.
+        if not producer.done():
+            producer.cancel()
+            logger.info("Client disconnected, cancelled script stream")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(cancel_upstream),
+    )
+
+
+def build_ad_types_prompt(platform: str, description: str, goals, captions, hashtags) -> str:
+    captions = prompt_service.listing(captions, "captions", sep="\n", item_field="caption")
+    return prompt_service.finalize("ad_types", f"""
 You are an expert digital strategist.
 
-The user selected platform: {platform}
-Business Description: {description}
-Goals: {goals}
+The user selected platform: {prompt_service.clip(platform, "short")}
+Business Description: {prompt_service.clip(description, "description")}
+Goals: {prompt_service.listing(goals)}
 
 Past AI captions for this platform:
 {captions}
 
 Relevant Hashtags:
-{hashtags}
+{prompt_service.hashtags(hashtags)}
 
 Based on platform capabilities and business needs, recommend the top 1–3 ad types for this platform. Examples: "Video Ad", "Image Ad", "Text Post", "Event Page".
 
 Return JSON only:
 {{ "recommendedAdTypes": ["..."] }}
-"""
+""")
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
 
-    try:
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json={"model": "sonar-pro", "messages": [{"role": "user", "content": prompt}]}
-        )
-        content = response.json()["choices"][0]["message"]["content"]
-        if content.strip().startswith("```json"):
-            content = content.strip()[7:-3].strip()
-        elif content.strip().startswith("```"):
-            content = content.strip()[3:-3].strip()
-        return json.loads(content)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Perplexity Error: {str(e)}")
+def build_questions_prompt(ad_type: str, platform: str, description: str, goals) -> str:
+    ad_type = prompt_service.clip(ad_type, "short")
+    return prompt_service.finalize("questions", f"""
+You are a senior marketing content strategist.
 
+The user is creating a {ad_type} for {prompt_service.clip(platform, "short")}.
+Business Description: {prompt_service.clip(description, "description")}
+Goals: {prompt_service.listing(goals)}
 
-@router.post("/ask-questions/{ad_type}")
-def get_questions_for_ad_type(ad_type: str, payload: Dict[str, Any]):
+Generate 3 to 5 clear and helpful questions to ask the user before generating the ad script. Make sure questions are relevant for a {ad_type}.
+
+Return JSON only:
+{{ "questions": [{{"question": "..."}}, ...] }}
+""")
+
+
+def wizard_features(business: Dict[str, Any]):
+    return similarity_service.features(
+        business.get("businessDescription", ""), goal=business.get("businessGoals", []), industry=business.get("industry")
+    )
+
+
+async def recommend_ad_types(platform: str, business: Dict[str, Any], content: Dict[str, Any]) -> Dict[str, Any]:
+    captions = []
+    hashtags = []
+    for rec in content.get("recommendations", []):
+        captions.append(rec.get("caption"))
+        hashtags.extend(rec.get("hashtags", []))
+
+    prompt = build_ad_types_prompt(
+        platform, business.get("businessDescription", ""), business.get("businessGoals", []), captions, hashtags
+    )
+
+    async def generate():
+        try:
+            content = await perplexity_service.chat_content(prompt, cache_namespace="ad_types")
+            return llm_json_service.parse_llm_object(content)
+        except Exception:
+            await perplexity_service.evict(prompt)
+            raise
+
+    # Near-identical businesses on the same platform get the same ad types.
+    return await similarity_service.reuse_or_generate(
+        "ad_types", similarity_service.partition_key(platform), wizard_features(business), generate
+    )
+
+
+async def generate_questions(ad_type: str, platform: str, business: Dict[str, Any]) -> Dict[str, Any]:
+    prompt = build_questions_prompt(
+        ad_type, platform, business.get("businessDescription", ""), business.get("businessGoals", [])
+    )
+
+    async def generate():
+        try:
+            content = await perplexity_service.chat_content(prompt, cache_namespace="questions")
+            return llm_json_service.parse_llm_object(content)
+        except Exception:
+            await perplexity_service.evict(prompt)
+            raise
+
+    return await similarity_service.reuse_or_generate(
+        "questions", similarity_service.partition_key(platform, ad_type), wizard_features(business), generate
+    )
+
+
+async def prefetch_wizard(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job handler: precompute ad types, then the question set for each of them, for
+    every recommended platform of a campaign, so the wizard answers from the store."""
+    store = campaign_store_service.get_store()
+    campaign_id = payload["campaignId"]
+    campaign = await store.get(campaign_id)
+    if campaign is None:
+        raise ValueError(f"Campaign {campaign_id} not found")
+
+    business = campaign["profile"]
+    content_by_platform = {item["platform"]: item for item in campaign["contentRecommendation"]}
+    semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+    failures = []
+
+    async def limited(coro):
+        async with semaphore:
+            return await coro
+
+    async def questions_for(platform: str, ad_type: str):
+        try:
+            questions = await limited(generate_questions(ad_type, platform, business))
+            await store.save_wizard_answer(campaign_id, platform, "questions", questions, ad_type=ad_type)
+        except Exception as e:
+            failures.append(f"{platform}/{ad_type}: {e}")
+
+    async def platform_stage(platform: str):
+        content = content_by_platform.get(platform, {"platform": platform, "recommendations": []})
+        try:
+            ad_types = await limited(recommend_ad_types(platform, business, content))
+            await store.save_wizard_answer(campaign_id, platform, "ad_types", ad_types)
+        except Exception as e:
+            failures.append(f"{platform}: {e}")
+            return
+        await asyncio.gather(*(questions_for(platform, a) for a in ad_types.get("recommendedAdTypes", [])))
+
+    platforms = [p["name"] for p in campaign["recommendedPlatforms"]]
+    await asyncio.gather(*(platform_stage(p) for p in platforms))
+    if failures:
+        logger.warning("Wizard prefetch incomplete", extra={"fields": {"failures": failures}})
+    return {"platforms": platforms, "failures": failures}
+
+
+job_service.get_queue().register("wizard_prefetch", prefetch_wizard)
+
+
+@router.post("/ask-questions")
+async def get_available_ad_types(payload: Dict[str, Any]):
+    scheduler_service.set_priority(scheduler_service.INTERACTIVE)
     api_key = os.getenv("PERPLEXITY_API_KEY")
     if not api_key:
         raise HTTPException(status_code=500, detail="Missing Perplexity API Key")
 
-    business = payload.get("campaignData", {})
-    description = business.get("businessDescription", "")
-    goals = business.get("businessGoals", [])
     platform = payload.get("platform", "")
+    campaign_id = payload.get("campaignId")
+    if campaign_id:
+        prefetched = await campaign_store_service.get_store().get_wizard_answer(campaign_id, platform, "ad_types")
+        if prefetched:
+            return prefetched
 
-    prompt = f"""
-You are a senior marketing content strategist.
+    business = await campaign_profile(campaign_id, payload.get("campaignData", {}))
+    content = await platform_content(campaign_id, platform, payload.get("campaignData"))
 
-The user is creating a {ad_type} for {platform}.
-Business Description: {description}
-Goals: {goals}
+    try:
+        ad_types = await recommend_ad_types(platform, business, content)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Perplexity Error: {str(e)}")
+    if campaign_id:
+        await campaign_store_service.get_store().save_wizard_answer(campaign_id, platform, "ad_types", ad_types)
+    return ad_types
 
-Generate 3 to 5 clear and helpful questions to ask the user before generating the ad script. Make sure questions are relevant for a {ad_type}.
 
-Return JSON only:
-{{ "questions": [{{"question": "..."}}, ...] }}
-"""
+@router.post("/ask-questions/{ad_type}")
+async def get_questions_for_ad_type(ad_type: str, payload: Dict[str, Any]):
+    scheduler_service.set_priority(scheduler_service.INTERACTIVE)
+    api_key = os.getenv("PERPLEXITY_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Missing Perplexity API Key")
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    platform = payload.get("platform", "")
+    campaign_id = payload.get("campaignId")
+    if campaign_id:
+        prefetched = await campaign_store_service.get_store().get_wizard_answer(
+            campaign_id, platform, "questions", ad_type=ad_type
+        )
+        if prefetched:
+            return prefetched
+
+    business = await campaign_profile(campaign_id, payload.get("campaignData", {}))
 
     try:
-        response = requests.post(
-            "https://api.perplexity.ai/chat/completions",
-            headers=headers,
-            json={"model": "sonar-pro", "messages": [{"role": "user", "content": prompt}]}
-        )
-        content = response.json()["choices"][0]["message"]["content"]
-        if content.strip().startswith("```json"):
-            content = content.strip()[7:-3].strip()
-        elif content.strip().startswith("```"):
-            content = content.strip()[3:-3].strip()
-        return json.loads(content)
+        questions = await generate_questions(ad_type, platform, business)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Perplexity Error: {str(e)}")
+    if campaign_id:
+        await campaign_store_service.get_store().save_wizard_answer(
+            campaign_id, platform, "questions", questions, ad_type=ad_type
+        )
+    return questions
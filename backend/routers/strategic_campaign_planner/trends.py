@@ -1,92 +1,81 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import os
+from typing import Optional
 from dotenv import load_dotenv
-from typing import List
-import google.generativeai as genai
-import json
-import re
-import requests
-from requests.auth import HTTPBasicAuth
+from services import (
+    llm_json_service,
+    log_service,
+    prompt_service,
+    metrics_service,
+    gemini_service,
+    dataforseo_service,
+    keyword_metrics_service
+)
 
 load_dotenv()
 router = APIRouter()
+logger = log_service.get_logger("trends")
 
 class TrendRequest(BaseModel):
     businessName: str
     businessDescription: str
     industry: str
     location: str
+    # DataForSEO location/language; defaults to DATAFORSEO_LOCATION_CODE / DATAFORSEO_LANGUAGE_CODE.
+    locationCode: Optional[int] = None
+    languageCode: Optional[str] = None
 
 @router.post("/market-trends")
 async def get_trending_keywords(req: TrendRequest):
     try:
-        gemini_key = os.getenv("GEMINI_API_KEY")
-        dfseo_user = os.getenv("DFSEO_LOGIN")
-        dfseo_pass = os.getenv("DFSEO_PASSWORD")
-
-        if not gemini_key or not dfseo_user or not dfseo_pass:
+        model = gemini_service.get_model()
+        if model is None or not dataforseo_service.configured():
             raise HTTPException(status_code=500, detail="Missing API credentials")
 
-        genai.configure(api_key=gemini_key)
-        model = genai.GenerativeModel("gemini-1.5-flash")
-
-        prompt = f"""
+        prompt = prompt_service.finalize("keywords", f"""
         You are an AI marketing strategist. Based on the business information below, generate a list of top 20 trending and relevant marketing keywords.
 
-        - Business Name: {req.businessName}
-        - Description: {req.businessDescription}
-        - Industry: {req.industry}
-        - Location: {req.location}
+        - Business Name: {prompt_service.clip(req.businessName, "short")}
+        - Description: {prompt_service.clip(req.businessDescription, "description")}
+        - Industry: {prompt_service.clip(req.industry, "short")}
+        - Location: {prompt_service.clip(req.location, "short")}
 
         Return ONLY a valid JSON list like this:
         {{
           "keywords": ["keyword 1", "keyword 2", "keyword 3", ...]
         }}
-        """
+        """)
 
-        response = model.generate_content(prompt)
-        content = response.text.strip()
-        print("🔍 Gemini raw keyword response:\n", content)
+        with metrics_service.stage("trends.keywords_llm"):
+            content = (await model.generate_content(prompt)).strip()
+        log_service.log_payload(logger, "Gemini keyword response", content)
 
-        match = re.search(r'\{.*\}', content, re.DOTALL)
-        if not match:
+        try:
+            result = llm_json_service.parse_llm_object(content)
+        except llm_json_service.LLMJSONError as e:
+            log_service.log_failed_output(logger, "keywords", content, e)
             raise HTTPException(status_code=500, detail="Gemini Error: No valid JSON found")
 
-        keyword_block = match.group()
-        result = json.loads(keyword_block)
-
         if "keywords" not in result or not isinstance(result["keywords"], list):
             raise HTTPException(status_code=500, detail="Gemini Error: Malformed keyword list")
 
-        keywords = result["keywords"][:5]
-        print("✅ Parsed keywords:", keywords)
-
-        task_payload = {
-            "keywords": keywords,
-            "language_code": "en",
-            "location_code": 2840
-        }
-
-        dfseo_response = requests.post(
-            "https://api.dataforseo.com/v3/keywords_data/google/search_volume/live",
-            auth=HTTPBasicAuth(dfseo_user, dfseo_pass),
-            json=[task_payload]
-        )
-
-        if dfseo_response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"DataForSEO Error: {dfseo_response.text}")
-
-        dfseo_json = dfseo_response.json()
-        print("📦 DataForSEO raw response:\n", json.dumps(dfseo_json, indent=2))
+        keywords = [k for k in result["keywords"] if isinstance(k, str)]
+        logger.info("Parsed keywords", extra={"fields": {"keywords": keywords}})
 
-        items = dfseo_json.get("tasks", [])[0].get("result", [])[0].get("items", [])
+        # Stored metrics are reused across campaigns; misses from concurrent
+        # requests share one DataForSEO task.
+        with metrics_service.stage("trends.search_volume"):
+            items = await keyword_metrics_service.get_metrics(
+                keywords,
+                req.locationCode or dataforseo_service.LOCATION_CODE,
+                req.languageCode or dataforseo_service.LANGUAGE_CODE
+            )
 
         validated_keywords = []
         for item in items:
             validated_keywords.append({
                 "keyword": item.get("keyword"),
-                "volume": item.get("search_volume", 0),
+                "volume": item.get("volume") or 0,
                 "cpc": round(item.get("cpc", 0.0), 2) if item.get("cpc") else 0.0,
                 "competition": round(item.get("competition", 0.0), 2) if item.get("competition") else 0.0
             })
@@ -94,6 +83,8 @@ async def get_trending_keywords(req: TrendRequest):
         validated_keywords.sort(key=lambda x: x["volume"], reverse=True)
         return { "keywords": validated_keywords }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print("❌ Error in /market-trends:", str(e))
+        logger.error(f"Error in /market-trends: {e}")
         raise HTTPException(status_code=500, detail=f"Gemini/DataForSEO Error: {str(e)}")
@@ -0,0 +1,173 @@
+import os
+import re
+import asyncio
+import hashlib
+import tempfile
+from typing import AsyncIterator, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ASSET_STORE = os.getenv("ASSET_STORE", "local")
+ASSET_STORE_DIR = os.getenv("ASSET_STORE_DIR", "generated_assets")
+ASSET_PUBLIC_URL = os.getenv("ASSET_PUBLIC_URL", "").rstrip("/")
+ASSET_S3_BUCKET = os.getenv("ASSET_S3_BUCKET", "vega-digital-assets")
+ASSET_S3_ENDPOINT = os.getenv("ASSET_S3_ENDPOINT")
+ASSET_S3_PREFIX = os.getenv("ASSET_S3_PREFIX", "assets/")
+
+CHUNK_SIZE = 64 * 1024
+KEY_PATTERN = re.compile(r"^[0-9a-f]{64}\.(png|webp|jpeg|jpg)$")
+CONTENT_TYPES = {"png": "image/png", "webp": "image/webp", "jpeg": "image/jpeg", "jpg": "image/jpeg"}
+# S3 error codes meaning the object doesn't exist.
+S3_NOT_FOUND = ("404", "NoSuchKey", "NotFound")
+
+
+def content_type(key: str) -> str:
+    return CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+def asset_url(key: str) -> str:
+    return f"{ASSET_PUBLIC_URL}/assets/{key}"
+
+
+class LocalAssetStore:
+    """Content-addressed files under `root`, named `<sha256>.<ext>`."""
+
+    def __init__(self, root: str = ASSET_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def put_stream(self, chunks: AsyncIterator[bytes], ext: str) -> str:
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+            key = f"{digest.hexdigest()}.{ext}"
+            # Same content, same name: replacing an existing file is harmless.
+            os.replace(tmp_path, self._path(key))
+            return key
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def put_bytes(self, data: bytes, ext: str) -> str:
+        async def one_chunk():
+            yield data
+        return await self.put_stream(one_chunk(), ext)
+
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            return os.path.getsize(self._path(key))
+        except OSError:
+            return None
+
+    async def read(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._read_all, key)
+
+    def _read_all(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yield bytes `start`..`end` inclusive."""
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+class S3AssetStore:
+    """S3-compatible object store. `client` is a boto3-style S3 client; pass a
+    local stand-in (or point ASSET_S3_ENDPOINT at MinIO) to run without AWS."""
+
+    def __init__(self, client=None, bucket: str = ASSET_S3_BUCKET, prefix: str = ASSET_S3_PREFIX):
+        if client is None:
+            import boto3
+            client = boto3.client("s3", endpoint_url=ASSET_S3_ENDPOINT)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    async def put_stream(self, chunks: AsyncIterator[bytes], ext: str) -> str:
+        digest = hashlib.sha256()
+        # The key depends on the content, so spool (in memory up to 8 MB) before uploading.
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+            async for chunk in chunks:
+                digest.update(chunk)
+                spool.write(chunk)
+            spool.seek(0)
+            key = f"{digest.hexdigest()}.{ext}"
+            # upload_fileobj reads the spool in parts (multipart for large files)
+            # instead of loading it whole.
+            await asyncio.to_thread(
+                self.client.upload_fileobj,
+                spool, self.bucket, self.prefix + key, ExtraArgs={"ContentType": content_type(key)}
+            )
+        return key
+
+    async def put_bytes(self, data: bytes, ext: str) -> str:
+        async def one_chunk():
+            yield data
+        return await self.put_stream(one_chunk(), ext)
+
+    async def size(self, key: str) -> Optional[int]:
+        """None only when the object doesn't exist; other S3 errors (5xx, access denied) raise."""
+        from botocore.exceptions import ClientError
+        try:
+            head = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as e:
+            # HEAD responses have no body, so a missing key comes back as a bare "404".
+            if e.response.get("Error", {}).get("Code") in S3_NOT_FOUND:
+                return None
+            raise
+        return head["ContentLength"]
+
+    async def read(self, key: str) -> bytes:
+        obj = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=self.prefix + key)
+        return await asyncio.to_thread(obj["Body"].read)
+
+    async def iter_range(self, key: str, start: int, end: int) -> AsyncIterator[bytes]:
+        obj = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=self.prefix + key, Range=f"bytes={start}-{end}"
+        )
+        body = obj["Body"]
+        while True:
+            chunk = await asyncio.to_thread(body.read, CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _build_store(name: str):
+    if name == "local":
+        return LocalAssetStore()
+    if name == "s3":
+        return S3AssetStore()
+    raise ValueError(f"Unknown ASSET_STORE: {name}")
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = _build_store(ASSET_STORE)
+    return _store
+
+
+def set_store(store):
+    global _store
+    _store = store
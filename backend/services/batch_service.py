@@ -0,0 +1,282 @@
+import os
+import csv
+import io
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+from dotenv import load_dotenv
+from services import resilience_service, scheduler_service, log_service
+
+load_dotenv()
+logger = log_service.get_logger("batch")
+
+BATCH_SQLITE_PATH = os.getenv("BATCH_SQLITE_PATH", "batches.sqlite3")
+# Rows processed at once per batch stream; provider rate limits still apply on top.
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "1000"))
+# Each row gets a full request budget of its own.
+ROW_DEADLINE_SECONDS = resilience_service.REQUEST_DEADLINE_SECONDS
+# A row still "running" this long after it was claimed belongs to a process
+# that died; a resume may take it over.
+ROW_LEASE_SECONDS = float(os.getenv("BULK_ROW_LEASE_SECONDS", str(ROW_DEADLINE_SECONDS + 60)))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+INVALID = "invalid"
+STATUSES = (PENDING, RUNNING, DONE, FAILED, INVALID)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS batches (
+        id TEXT PRIMARY KEY,
+        created_at REAL NOT NULL,
+        options TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS batch_rows (
+        batch_id TEXT NOT NULL REFERENCES batches (id) ON DELETE CASCADE,
+        row INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        input TEXT,
+        campaign_id TEXT,
+        error TEXT,
+        PRIMARY KEY (batch_id, row)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS batch_rows_status ON batch_rows (batch_id, status)",
+]
+
+# Columns holding lists in CSV uploads: a JSON array or items separated by ";".
+LIST_COLUMNS = ("businessGoals", "demographics", "interests")
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse_upload(data: bytes, fmt: str) -> List[dict]:
+    """Rows of a CSV (header row first) or JSON-lines upload, as plain dicts."""
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise BatchError("Upload must be UTF-8")
+    if fmt == "csv":
+        rows = []
+        for record in csv.DictReader(io.StringIO(text)):
+            row = {k.strip(): (v or "").strip() for k, v in record.items() if k}
+            for column in LIST_COLUMNS:
+                value = row.get(column, "")
+                if value.startswith("["):
+                    try:
+                        row[column] = json.loads(value)
+                        continue
+                    except json.JSONDecodeError:
+                        pass
+                row[column] = [item.strip() for item in value.split(";") if item.strip()]
+            rows.append(row)
+    elif fmt == "jsonl":
+        rows = []
+        for number, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                # Keep the row (and its position) so it is reported as invalid.
+                rows.append({"_error": f"line {number}: {e}"})
+    else:
+        raise BatchError(f"Unsupported format: {fmt}")
+    if not rows:
+        raise BatchError("Upload has no rows")
+    if len(rows) > BULK_MAX_ROWS:
+        raise BatchError(f"Upload has {len(rows)} rows; the limit is {BULK_MAX_ROWS}")
+    return rows
+
+
+class BatchStore:
+    """Bulk uploads and the state of each row, so an interrupted batch can be
+    resumed without redoing the rows that already finished."""
+
+    def __init__(self, path: str = BATCH_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, sql: str, params=()):
+        return self._conn().execute(sql, params).fetchall()
+
+    def _write(self, statements) -> int:
+        with self._write_lock:
+            conn = self._conn()
+            changed = 0
+            with conn:
+                for sql, params in statements:
+                    changed += conn.execute(sql, params).rowcount
+            return changed
+
+    async def create(self, rows: List[Tuple[Optional[dict], Optional[str]]], options: dict) -> str:
+        """Store a batch of (input, validation error) rows; rows with an error are INVALID from the start."""
+        batch_id = uuid.uuid4().hex
+        now = time.time()
+        statements = [("INSERT INTO batches (id, created_at, options) VALUES (?, ?, ?)", (batch_id, now, json.dumps(options)))]
+        for row, (data, error) in enumerate(rows):
+            statements.append((
+                "INSERT INTO batch_rows (batch_id, row, status, updated_at, input, error) VALUES (?, ?, ?, ?, ?, ?)",
+                (batch_id, row, INVALID if error else PENDING, now, json.dumps(data) if data is not None else None, error)
+            ))
+        await asyncio.to_thread(self._write, statements)
+        return batch_id
+
+    async def get(self, batch_id: str) -> Optional[dict]:
+        def load():
+            batch = self._read("SELECT created_at, options FROM batches WHERE id = ?", (batch_id,))
+            if not batch:
+                return None
+            counts = dict(self._read(
+                "SELECT status, COUNT(*) FROM batch_rows WHERE batch_id = ? GROUP BY status", (batch_id,)
+            ))
+            return {
+                "batchId": batch_id,
+                "createdAt": batch[0][0],
+                "options": json.loads(batch[0][1]),
+                "total": sum(counts.values()),
+                "counts": {status: counts.get(status, 0) for status in STATUSES},
+            }
+        return await asyncio.to_thread(load)
+
+    async def rows(self, batch_id: str, statuses=STATUSES) -> List[dict]:
+        rows = await asyncio.to_thread(
+            self._read,
+            f"""SELECT row, status, input, campaign_id, error FROM batch_rows
+                WHERE batch_id = ? AND status IN ({", ".join("?" * len(statuses))}) ORDER BY row""",
+            (batch_id, *statuses)
+        )
+        return [
+            {"row": row, "status": status, "input": json.loads(data) if data else None,
+             "campaignId": campaign_id, "error": error}
+            for row, status, data, campaign_id, error in rows
+        ]
+
+    async def claim(self, batch_id: str, row: int) -> bool:
+        """Atomically mark a pending or failed row (or one whose lease ran out) as running."""
+        now = time.time()
+        changed = await asyncio.to_thread(self._write, [(
+            """UPDATE batch_rows SET status = ?, updated_at = ?
+               WHERE batch_id = ? AND row = ? AND (status IN (?, ?) OR (status = ? AND updated_at < ?))""",
+            (RUNNING, now, batch_id, row, PENDING, FAILED, RUNNING, now - ROW_LEASE_SECONDS)
+        )])
+        return changed == 1
+
+    async def finish(self, batch_id: str, row: int, status: str, campaign_id: Optional[str] = None,
+                     error: Optional[str] = None):
+        await asyncio.to_thread(self._write, [(
+            "UPDATE batch_rows SET status = ?, updated_at = ?, campaign_id = ?, error = ? WHERE batch_id = ? AND row = ?",
+            (status, time.time(), campaign_id, error, batch_id, row)
+        )])
+
+
+_store = None
+
+
+def get_store() -> BatchStore:
+    global _store
+    if _store is None:
+        _store = BatchStore()
+    return _store
+
+
+Processor = Callable[[Any], Awaitable[Tuple[str, dict]]]
+
+
+async def run(batch_id: str, process: Processor, concurrency: int = BULK_CONCURRENCY) -> AsyncIterator[dict]:
+    """Process the batch's unfinished rows and yield each outcome as it finishes.
+
+    `process(input)` returns (campaign id, result) or raises. At most
+    `concurrency` rows run at once, each under its own deadline, at background
+    priority so interactive requests sharing the provider quota go first. Rows
+    another process is working on are skipped. If the consumer goes away the
+    rows still running are put back to pending for a later resume.
+
+    A row whose state can't be read or written (e.g. a locked or full SQLite
+    file) is reported as failed and the other rows carry on; the store keeps
+    it running until its lease runs out, then a resume retries it.
+    """
+    store = get_store()
+    rows = await store.rows(batch_id, (PENDING, FAILED, RUNNING))
+    todo = iter(rows)
+    results = asyncio.Queue()
+
+    async def release(claim: asyncio.Future, row: int):
+        # A claim cancelled mid-write may still have landed; hand the row back if so.
+        try:
+            if await claim:
+                await store.finish(batch_id, row, PENDING)
+        except Exception as e:
+            logger.warning(f"Could not release batch row {row}: {e}")
+
+    async def run_row(item: dict) -> Optional[dict]:
+        row = item["row"]
+        claim = asyncio.ensure_future(store.claim(batch_id, row))
+        try:
+            if not await asyncio.shield(claim):
+                return None
+        except asyncio.CancelledError:
+            await asyncio.shield(release(claim, row))
+            raise
+        resilience_service.set_deadline(ROW_DEADLINE_SECONDS)
+        log_service.set_request_id(f"{batch_id}-{row}")
+        try:
+            campaign_id, result = await process(item["input"])
+        except asyncio.CancelledError:
+            await asyncio.shield(store.finish(batch_id, row, PENDING))
+            raise
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            logger.warning(f"Batch row {row} failed: {detail}")
+            await store.finish(batch_id, row, FAILED, error=detail)
+            return {"row": row, "status": FAILED, "error": detail}
+        await store.finish(batch_id, row, DONE, campaign_id=campaign_id)
+        return {"row": row, "status": DONE, "campaignId": campaign_id, "result": result}
+
+    async def worker():
+        scheduler_service.set_priority(scheduler_service.BACKGROUND)
+        for item in todo:
+            try:
+                outcome = await run_row(item)
+            except Exception as e:
+                logger.error(f"Batch row {item['row']} could not be recorded: {e}")
+                outcome = {"row": item["row"], "status": FAILED, "error": f"Batch store error: {e}"}
+            if outcome is not None:
+                await results.put(outcome)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(rows))))]
+    finished = asyncio.gather(*workers)
+    finished.add_done_callback(lambda _: results.put_nowait(None))
+    try:
+        while True:
+            outcome = await results.get()
+            if outcome is None:
+                break
+            yield outcome
+        await finished
+    finally:
+        # Cancels the workers still running.
+        finished.cancel()
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+from services import shared_state_service, metrics_service, log_service
+
+load_dotenv()
+logger = log_service.get_logger("cache")
+
+CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_SQLITE_PATH = os.getenv("LLM_CACHE_SQLITE_PATH", "llm_cache.sqlite3")
+CACHE_REDIS_URL = os.getenv("LLM_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Per-endpoint TTLs in seconds. Prompts that depend on live weather/events go
+# stale quickly; ad-type and question prompts only depend on the business.
+DEFAULT_TTLS = {
+    "recommendation": HOUR,
+    "content_recommendation": DAY,
+    "content": DAY,
+    "ad_types": 3 * DAY,
+    "questions": 7 * DAY,
+    "script": HOUR,
+    # Competitor traffic from the traffic provider, per domain; updated monthly upstream.
+    "traffic": 7 * DAY,
+}
+
+
+def ttl_for(namespace: str) -> float:
+    return float(os.getenv(f"LLM_CACHE_TTL_{namespace.upper()}", DEFAULT_TTLS.get(namespace, HOUR)))
+
+
+def make_key(model: str, prompt: str, params: dict) -> str:
+    """Content-addressed key: sha256 over a canonical encoding of (model, prompt, params)."""
+    canonical = json.dumps(
+        {"model": model, "prompt": prompt, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU bounded by the total size of keys and values in bytes."""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        cost = len(key) + len(value)
+        if cost > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (value, time.time() + ttl)
+        self.size += cost
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    async def delete(self, key: str):
+        self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(key) + len(entry[0])
+
+
+class SQLiteBackend:
+    """On-disk cache; queries run in a worker thread so the event loop never blocks on I/O."""
+
+    def __init__(self, path: str = CACHE_SQLITE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= time.time():
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return row[0]
+
+    def _set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl)
+            )
+            self._conn.commit()
+
+    def _delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+
+class RedisBackend:
+    """Wraps any client exposing async get/set(ex=)/delete, e.g. redis.asyncio.Redis or a local stand-in."""
+
+    def __init__(self, client, prefix: str = "llm_cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+
+class LLMCache:
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def get(self, namespace: str, key: str) -> Optional[dict]:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never take the endpoint down with it.
+            logger.warning(f"Cache read failed: {e}")
+            value = None
+        if value is None:
+            shared_state_service.incr(f"cache.misses.{namespace}")
+            metrics_service.CACHE_REQUESTS.labels(namespace, "miss").inc()
+            return None
+        shared_state_service.incr(f"cache.hits.{namespace}")
+        metrics_service.CACHE_REQUESTS.labels(namespace, "hit").inc()
+        return json.loads(value)
+
+    async def set(self, namespace: str, key: str, value: dict):
+        try:
+            await self.backend.set(key, json.dumps(value).encode("utf-8"), ttl_for(namespace))
+        except Exception as e:
+            logger.warning(f"Cache write failed: {e}")
+
+    async def delete(self, key: str):
+        try:
+            await self.backend.delete(key)
+        except Exception as e:
+            logger.warning(f"Cache delete failed: {e}")
+
+
+def build_backend(name: str):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "sqlite":
+        return SQLiteBackend()
+    if name == "redis":
+        import redis.asyncio as redis
+        return RedisBackend(redis.from_url(CACHE_REDIS_URL))
+    raise ValueError(f"Unknown LLM_CACHE_BACKEND: {name}")
+
+
+_cache = None
+
+
+def get_cache() -> Optional[LLMCache]:
+    """Return the process-wide cache, or None when LLM_CACHE_BACKEND=none."""
+    global _cache
+    if CACHE_BACKEND == "none":
+        return None
+    if _cache is None:
+        _cache = LLMCache(build_backend(CACHE_BACKEND))
+    return _cache
+
+
+def set_backend(backend):
+    """Swap the backend, e.g. for a local Redis stand-in."""
+    global _cache
+    _cache = LLMCache(backend)
+
+
+async def stats() -> dict:
+    """Hit/miss counts per namespace, summed over every worker process."""
+    hits = await shared_state_service.counters("cache.hits.")
+    misses = await shared_state_service.counters("cache.misses.")
+    result = {}
+    for ns in sorted(set(hits) | set(misses)):
+        h = int(hits.get(ns, 0))
+        m = int(misses.get(ns, 0))
+        result[ns] = {"hits": h, "misses": m, "hitRatio": round(h / (h + m), 4)}
+    return result
@@ -0,0 +1,174 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from typing import List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CAMPAIGN_SQLITE_PATH = os.getenv("CAMPAIGN_SQLITE_PATH", "campaigns.sqlite3")
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS campaigns (
+        id TEXT PRIMARY KEY,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        profile TEXT NOT NULL,
+        strategy TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS platform_content (
+        campaign_id TEXT NOT NULL REFERENCES campaigns (id) ON DELETE CASCADE,
+        platform TEXT NOT NULL,
+        body TEXT NOT NULL,
+        PRIMARY KEY (campaign_id, platform)
+    )""",
+    """CREATE TABLE IF NOT EXISTS wizard_answers (
+        campaign_id TEXT NOT NULL REFERENCES campaigns (id) ON DELETE CASCADE,
+        platform TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        ad_type TEXT NOT NULL DEFAULT '',
+        body TEXT NOT NULL,
+        PRIMARY KEY (campaign_id, platform, kind, ad_type)
+    )""",
+    """CREATE TABLE IF NOT EXISTS scripts (
+        campaign_id TEXT NOT NULL REFERENCES campaigns (id) ON DELETE CASCADE,
+        platform TEXT NOT NULL,
+        ad_type TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        script TEXT NOT NULL
+    )""",
+]
+
+
+class CampaignStore:
+    """Generated campaigns, keyed by id, so downstream calls send an id instead of the whole result.
+
+    The business profile, the strategy sections and each platform's captions are
+    stored separately, so a prompt only loads what it uses. WAL mode lets the
+    per-thread read connections run alongside the single writer.
+    """
+
+    def __init__(self, path: str = CAMPAIGN_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, sql: str, params=()):
+        return self._conn().execute(sql, params).fetchall()
+
+    def _write(self, statements):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                for sql, params in statements:
+                    conn.execute(sql, params)
+
+    async def create(self, profile: dict, strategy: dict, content: Optional[List[dict]] = None) -> str:
+        campaign_id = uuid.uuid4().hex
+        now = time.time()
+        statements = [(
+            "INSERT INTO campaigns (id, created_at, updated_at, profile, strategy) VALUES (?, ?, ?, ?, ?)",
+            (campaign_id, now, now, json.dumps(profile), json.dumps(strategy))
+        )]
+        statements += self._content_statements(campaign_id, content or [])
+        await asyncio.to_thread(self._write, statements)
+        return campaign_id
+
+    def _content_statements(self, campaign_id: str, content: List[dict]):
+        return [(
+            "INSERT OR REPLACE INTO platform_content (campaign_id, platform, body) VALUES (?, ?, ?)",
+            (campaign_id, item["platform"], json.dumps(item))
+        ) for item in content]
+
+    async def save_content(self, campaign_id: str, content: List[dict]):
+        statements = self._content_statements(campaign_id, content)
+        statements.append(("UPDATE campaigns SET updated_at = ? WHERE id = ?", (time.time(), campaign_id)))
+        await asyncio.to_thread(self._write, statements)
+
+    async def get_profile(self, campaign_id: str) -> Optional[dict]:
+        rows = await asyncio.to_thread(self._read, "SELECT profile FROM campaigns WHERE id = ?", (campaign_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    async def get_platform_content(self, campaign_id: str, platform: str) -> Optional[dict]:
+        rows = await asyncio.to_thread(
+            self._read, "SELECT body FROM platform_content WHERE campaign_id = ? AND platform = ?", (campaign_id, platform)
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    async def save_wizard_answer(self, campaign_id: str, platform: str, kind: str, body: dict, ad_type: str = ""):
+        """Store a precomputed script-wizard response (`kind` is "ad_types" or "questions")."""
+        await asyncio.to_thread(self._write, [(
+            "INSERT OR REPLACE INTO wizard_answers (campaign_id, platform, kind, ad_type, body) VALUES (?, ?, ?, ?, ?)",
+            (campaign_id, platform, kind, ad_type, json.dumps(body))
+        )])
+
+    async def get_wizard_answer(self, campaign_id: str, platform: str, kind: str, ad_type: str = "") -> Optional[dict]:
+        rows = await asyncio.to_thread(
+            self._read,
+            "SELECT body FROM wizard_answers WHERE campaign_id = ? AND platform = ? AND kind = ? AND ad_type = ?",
+            (campaign_id, platform, kind, ad_type)
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    async def save_script(self, campaign_id: str, platform: str, ad_type: str, script: str):
+        await asyncio.to_thread(self._write, [(
+            "INSERT INTO scripts (campaign_id, platform, ad_type, created_at, script) VALUES (?, ?, ?, ?, ?)",
+            (campaign_id, platform, ad_type, time.time(), script)
+        )])
+
+    async def get(self, campaign_id: str) -> Optional[dict]:
+        """The full campaign: profile, strategy sections, every platform's content and generated scripts."""
+        def load():
+            rows = self._read("SELECT profile, strategy FROM campaigns WHERE id = ?", (campaign_id,))
+            if not rows:
+                return None
+            content = self._read(
+                "SELECT body FROM platform_content WHERE campaign_id = ? ORDER BY rowid", (campaign_id,)
+            )
+            scripts = self._read(
+                "SELECT platform, ad_type, created_at, script FROM scripts WHERE campaign_id = ? ORDER BY created_at",
+                (campaign_id,)
+            )
+            return {
+                "campaignId": campaign_id,
+                "profile": json.loads(rows[0][0]),
+                **json.loads(rows[0][1]),
+                "contentRecommendation": [json.loads(row[0]) for row in content],
+                "scripts": [
+                    {"platform": row[0], "adType": row[1], "createdAt": row[2], "script": row[3]} for row in scripts
+                ],
+            }
+        return await asyncio.to_thread(load)
+
+
+_store = None
+
+
+def get_store() -> CampaignStore:
+    global _store
+    if _store is None:
+        _store = CampaignStore()
+    return _store
+
+
+def set_store(store: CampaignStore):
+    global _store
+    _store = store
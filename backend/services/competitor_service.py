@@ -0,0 +1,154 @@
+import abc
+import os
+import time
+import asyncio
+import hashlib
+import re
+from typing import List, Optional
+from dotenv import load_dotenv
+from services import cache_service, singleflight_service, similarweb_service, metrics_service, log_service
+
+load_dotenv()
+logger = log_service.get_logger("competitor")
+
+# "similarweb", "stub" (made-up but stable numbers, for local development) or
+# "none". Defaults to similarweb when SIMILARWEB_API_KEY is set.
+TRAFFIC_PROVIDER = os.getenv("TRAFFIC_PROVIDER", "similarweb" if similarweb_service.configured() else "none")
+# Domains looked up at once per request.
+ENRICH_CONCURRENCY = int(os.getenv("COMPETITOR_ENRICH_CONCURRENCY", "5"))
+# "memory", "sqlite" or "redis". Defaults to the LLM cache's backend, and to
+# memory when that is "none": every miss is a paid provider call.
+TRAFFIC_CACHE_BACKEND = os.getenv(
+    "TRAFFIC_CACHE_BACKEND",
+    cache_service.CACHE_BACKEND if cache_service.CACHE_BACKEND != "none" else "memory",
+)
+
+DOMAIN = re.compile(r"^(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}$")
+
+
+class TrafficProvider(abc.ABC):
+    """Source of traffic estimates for a domain.
+
+    `fetch` returns a dict with at least `monthlyVisits`, or None when the
+    provider has no data for the domain; errors are raised.
+    """
+
+    name = "none"
+
+    @abc.abstractmethod
+    async def fetch(self, domain: str) -> Optional[dict]:
+        ...
+
+
+class SimilarwebProvider(TrafficProvider):
+    name = "similarweb"
+
+    async def fetch(self, domain: str) -> Optional[dict]:
+        return await similarweb_service.fetch_traffic(domain)
+
+
+class StubTrafficProvider(TrafficProvider):
+    """Deterministic numbers derived from the domain, without network calls."""
+
+    name = "stub"
+
+    async def fetch(self, domain: str) -> Optional[dict]:
+        digest = hashlib.sha256(domain.encode()).digest()
+        visits = 1000 + int.from_bytes(digest[:3], "big") % 500000
+        return {
+            "monthlyVisits": visits,
+            "visitsByMonth": [],
+            "globalRank": 10000 + int.from_bytes(digest[3:6], "big"),
+        }
+
+
+PROVIDERS = {"similarweb": SimilarwebProvider, "stub": StubTrafficProvider}
+
+_provider = None
+
+
+def get_provider() -> Optional[TrafficProvider]:
+    global _provider
+    if _provider is None and TRAFFIC_PROVIDER in PROVIDERS:
+        _provider = PROVIDERS[TRAFFIC_PROVIDER]()
+    return _provider
+
+
+def set_provider(provider: Optional[TrafficProvider]):
+    """Swap the provider, e.g. for a local stand-in."""
+    global _provider
+    _provider = provider
+
+
+_cache = None
+
+
+def get_cache() -> cache_service.LLMCache:
+    """The traffic cache, separate from the LLM cache so it can't be turned off with it."""
+    global _cache
+    if _cache is None:
+        _cache = cache_service.LLMCache(cache_service.build_backend(TRAFFIC_CACHE_BACKEND))
+    return _cache
+
+
+def normalize_domain(value) -> Optional[str]:
+    """`example.com` from a URL or host name (scheme, path, port and `www.` dropped); None if it isn't one."""
+    if not isinstance(value, str):
+        return None
+    host = value.strip().lower()
+    host = re.sub(r"^[a-z][a-z0-9+.-]*://", "", host)
+    host = re.split(r"[/?#:]", host, maxsplit=1)[0].rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    return host if DOMAIN.match(host) else None
+
+
+async def get_traffic(domain: str) -> Optional[dict]:
+    """Traffic for a normalized domain, from the traffic cache (namespace
+    "traffic") when fresh. Domains the provider doesn't know are cached as well."""
+    provider = get_provider()
+    if provider is None:
+        return None
+    key = cache_service.make_key(provider.name, domain, {"kind": "traffic"})
+    cache = get_cache()
+    cached = await cache.get("traffic", key)
+    if cached is not None:
+        return cached.get("traffic")
+
+    async def fetch():
+        with metrics_service.stage("competitor.traffic"):
+            traffic = await provider.fetch(domain)
+        if traffic is not None:
+            traffic = {**traffic, "source": provider.name, "fetchedAt": round(time.time())}
+        await cache.set("traffic", key, {"traffic": traffic})
+        return traffic
+
+    return await singleflight_service.get_group().do(key, fetch, namespace="traffic")
+
+
+async def enrich_competitors(competitors: List[dict]) -> List[dict]:
+    """Copies of `competitors` with provider traffic for those that name a domain.
+
+    Lookups run concurrently (at most ENRICH_CONCURRENCY at a time). Where the
+    provider has data, `traffic` is added and `estimatedMonthlyTraffic`
+    replaces the LLM's guess; failed lookups leave the competitor as it was.
+    """
+    if get_provider() is None or not competitors:
+        return competitors
+    semaphore = asyncio.Semaphore(ENRICH_CONCURRENCY)
+
+    async def enrich(competitor: dict) -> dict:
+        domain = normalize_domain(competitor.get("domain"))
+        if domain is None:
+            return competitor
+        try:
+            async with semaphore:
+                traffic = await get_traffic(domain)
+        except Exception as e:
+            logger.warning(f"Traffic lookup failed for {domain}: {e}")
+            return competitor
+        if traffic is None:
+            return {**competitor, "domain": domain}
+        return {**competitor, "domain": domain, "estimatedMonthlyTraffic": traffic["monthlyVisits"], "traffic": traffic}
+
+    return list(await asyncio.gather(*(enrich(c) for c in competitors)))
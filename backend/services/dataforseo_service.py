@@ -0,0 +1,81 @@
+import os
+import httpx
+from typing import List
+from dotenv import load_dotenv
+from services import resilience_service, log_service
+
+load_dotenv()
+logger = log_service.get_logger("dataforseo")
+
+DATAFORSEO_URL = os.getenv("DATAFORSEO_API_URL", "https://api.dataforseo.com/v3/keywords_data/google/search_volume/live")
+LANGUAGE_CODE = os.getenv("DATAFORSEO_LANGUAGE_CODE", "en")
+LOCATION_CODE = int(os.getenv("DATAFORSEO_LOCATION_CODE", "2840"))  # United States
+# search_volume accepts up to 1000 keywords per task, each at most 80
+# characters and 10 words; the task is billed the same for 1 or 1000.
+MAX_KEYWORDS_PER_TASK = 1000
+MAX_KEYWORD_CHARS = 80
+MAX_KEYWORD_WORDS = 10
+
+# Per-call timeouts and retries come from the "dataforseo" policy in resilience_service.
+MAX_CONNECTIONS = int(os.getenv("DATAFORSEO_MAX_CONNECTIONS", "20"))
+
+_client = None
+
+
+class DataForSEOError(Exception):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(text)
+        self.status_code = status_code
+        self.text = text
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(None),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def configured() -> bool:
+    return bool(os.getenv("DFSEO_LOGIN") and os.getenv("DFSEO_PASSWORD"))
+
+
+def valid_keyword(keyword: str) -> bool:
+    return 0 < len(keyword) <= MAX_KEYWORD_CHARS and len(keyword.split()) <= MAX_KEYWORD_WORDS
+
+
+async def search_volume(keywords: List[str], location_code: int = LOCATION_CODE,
+                        language_code: str = LANGUAGE_CODE) -> List[dict]:
+    """Google Ads search volume, CPC and competition for up to
+    MAX_KEYWORDS_PER_TASK `keywords` (one `search_volume/live` task).
+    Returns DataForSEO's per-keyword results."""
+    auth = httpx.BasicAuth(os.getenv("DFSEO_LOGIN", ""), os.getenv("DFSEO_PASSWORD", ""))
+    tasks = [{"keywords": keywords, "language_code": language_code, "location_code": location_code}]
+
+    client = get_client()
+    async with resilience_service.track("dataforseo"):
+        response = await resilience_service.request(
+            "dataforseo",
+            lambda timeout: client.post(DATAFORSEO_URL, auth=auth, json=tasks, timeout=timeout)
+        )
+    if response.status_code != 200:
+        raise DataForSEOError(response.status_code, response.text)
+
+    body = response.json()
+    log_service.log_payload(logger, "DataForSEO response", body)
+    task = (body.get("tasks") or [{}])[0]
+    # 20000 is DataForSEO's "Ok."; errors still come back as HTTP 200.
+    if task.get("status_code") != 20000:
+        raise DataForSEOError(task.get("status_code") or body.get("status_code") or 500,
+                              task.get("status_message") or body.get("status_message", "No task returned"))
+    return task.get("result") or []
@@ -0,0 +1,111 @@
+import os
+import httpx
+from typing import Optional
+from dotenv import load_dotenv
+from services import resilience_service, scheduler_service, metrics_service, log_service
+
+load_dotenv()
+logger = log_service.get_logger("gemini")
+
+GEMINI_API_URL = os.getenv("GEMINI_API_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+DEFAULT_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+
+# Per-call timeouts and retries come from the "gemini" policy in resilience_service.
+MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", "50"))
+EXPECTED_COMPLETION_TOKENS = int(os.getenv("GEMINI_EXPECTED_COMPLETION_TOKENS", "500"))
+
+_client = None
+_model = None
+
+
+class GeminiError(Exception):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(text)
+        self.status_code = status_code
+        self.text = text
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(None),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+        )
+    return _client
+
+
+class GenerativeModel:
+    """A Gemini model called over the REST `generateContent` endpoint.
+
+    Replaces the google-generativeai SDK (no longer a dependency): same shape
+    as its `GenerativeModel`, but async on the shared httpx client and behind
+    the "gemini" rate limit, retry and circuit-breaker policy like every other
+    provider. Blocked prompts, blocked or empty candidates and non-200
+    responses raise GeminiError.
+    """
+
+    def __init__(self, name: str, api_key: str, generation_config: Optional[dict] = None):
+        self.name = name
+        self.url = f"{GEMINI_API_URL}/models/{name}:generateContent"
+        self.headers = {"x-goog-api-key": api_key, "Content-Type": "application/json"}
+        self.generation_config = generation_config or {}
+
+    async def generate_content(self, prompt: str, **generation_config) -> str:
+        """Text of the first candidate for a single-turn `prompt`."""
+        config = {**self.generation_config, **generation_config}
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if config:
+            body["generationConfig"] = config
+        estimated = scheduler_service.estimate_tokens(prompt, config.get("maxOutputTokens", EXPECTED_COMPLETION_TOKENS))
+
+        client = get_client()
+        async with resilience_service.track("gemini"):
+            response = await resilience_service.request(
+                "gemini",
+                lambda timeout: client.post(self.url, headers=self.headers, json=body, timeout=timeout),
+                tokens=estimated
+            )
+        if response.status_code != 200:
+            raise GeminiError(response.status_code, response.text)
+
+        result = response.json()
+        usage = result.get("usageMetadata") or {}
+        metrics_service.record_usage("gemini", self.name, {
+            "prompt_tokens": usage.get("promptTokenCount"),
+            "completion_tokens": usage.get("candidatesTokenCount"),
+        })
+        if usage.get("totalTokenCount"):
+            await scheduler_service.get_scheduler("gemini").settle(estimated, usage["totalTokenCount"])
+
+        candidates = result.get("candidates") or []
+        parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+        if not parts:
+            if candidates:
+                reason = candidates[0].get("finishReason") or "empty candidate"
+            else:
+                reason = (result.get("promptFeedback") or {}).get("blockReason") or "no candidates"
+            raise GeminiError(200, f"No content returned ({reason})")
+        return "".join(part.get("text", "") for part in parts)
+
+
+def init_model(name: str = DEFAULT_MODEL):
+    """Build the process-wide model at startup; left unset without GEMINI_API_KEY."""
+    global _model
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        logger.warning("GEMINI_API_KEY is not set; /market-trends is unavailable")
+        return None
+    _model = GenerativeModel(name, api_key, {"responseMimeType": "application/json"})
+    return _model
+
+
+def get_model() -> Optional[GenerativeModel]:
+    return _model
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,52 @@
+import io
+from typing import Optional, Tuple
+from PIL import Image
+
+# Encoder settings per output format; webp/jpeg quality is a size/quality trade-off for ads.
+SAVE_OPTIONS = {
+    "png": {"format": "PNG", "optimize": True},
+    "webp": {"format": "WEBP", "quality": 90, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 90, "optimize": True, "progressive": True},
+}
+
+
+def parse_ratio(aspect_ratio: str) -> Tuple[int, int]:
+    width, height = aspect_ratio.split(":")
+    return int(width), int(height)
+
+
+def center_crop(image: Image.Image, aspect_ratio: str) -> Image.Image:
+    """Largest centered crop of `image` with the given aspect ratio."""
+    ratio_w, ratio_h = parse_ratio(aspect_ratio)
+    width, height = image.size
+    if width * ratio_h > height * ratio_w:
+        new_width, new_height = height * ratio_w // ratio_h, height
+    else:
+        new_width, new_height = width, width * ratio_h // ratio_w
+    left = (width - new_width) // 2
+    top = (height - new_height) // 2
+    return image.crop((left, top, left + new_width, top + new_height))
+
+
+def derive(master: bytes, aspect_ratio: str, output_format: str, width: Optional[int] = None) -> Tuple[bytes, int, int]:
+    """Crop/resize/re-encode a master render. Returns (data, width, height).
+
+    CPU-bound; call it through asyncio.to_thread.
+    """
+    with Image.open(io.BytesIO(master)) as image:
+        image.load()
+        result = center_crop(image, aspect_ratio)
+        if width and width < result.width:
+            # Only ever downscale: upscaling a render adds bytes, not detail.
+            result = result.resize((width, round(result.height * width / result.width)), Image.LANCZOS)
+        if output_format == "jpeg" and result.mode not in ("RGB", "L"):
+            result = result.convert("RGB")
+
+        out = io.BytesIO()
+        result.save(out, **SAVE_OPTIONS[output_format])
+        return out.getvalue(), result.width, result.height
+
+
+def dimensions(data: bytes) -> Tuple[int, int]:
+    with Image.open(io.BytesIO(data)) as image:
+        return image.size
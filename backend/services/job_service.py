@@ -0,0 +1,344 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import socket
+import sqlite3
+import threading
+import collections
+from typing import Optional
+from dotenv import load_dotenv
+from services import resilience_service, scheduler_service, log_service
+
+load_dotenv()
+logger = log_service.get_logger("jobs")
+
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")
+JOB_SQLITE_PATH = os.getenv("JOB_SQLITE_PATH", "jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_PER_KEY_CONCURRENCY = int(os.getenv("JOB_PER_KEY_CONCURRENCY", "2"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(24 * 60 * 60)))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+# Identifies the process running a job, so a restarting worker only recovers
+# jobs whose owner is gone, not ones a sibling worker is still running.
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    if not owner or owner == OWNER:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        # Can't check another host; SQLite job stores are single-host anyway.
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+class MemoryJobBackend:
+    def __init__(self):
+        self._jobs = {}
+
+    async def save(self, job: dict):
+        self._jobs[job["id"]] = dict(job)
+
+    async def load(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def unfinished(self) -> list:
+        return [dict(job) for job in self._jobs.values() if job["status"] not in FINISHED]
+
+    async def claim(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] != QUEUED:
+            return False
+        job["status"] = RUNNING
+        return True
+
+    async def prune(self, before: float):
+        for job_id in [j["id"] for j in self._jobs.values() if j["status"] in FINISHED and j["updatedAt"] < before]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobBackend:
+    """Persists jobs so queued and interrupted work is picked up again after a restart."""
+
+    def __init__(self, path: str = JOB_SQLITE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, updated_at REAL NOT NULL, body TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at)")
+        self._conn.commit()
+
+    def _execute(self, sql: str, params=()):
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+            self._conn.commit()
+            return rows
+
+    async def save(self, job: dict):
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO jobs (id, status, updated_at, body) VALUES (?, ?, ?, ?)",
+            (job["id"], job["status"], job["updatedAt"], json.dumps(job))
+        )
+
+    async def load(self, job_id: str) -> Optional[dict]:
+        rows = await asyncio.to_thread(self._execute, "SELECT body FROM jobs WHERE id = ?", (job_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def _claim(self, job_id: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED)
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    async def claim(self, job_id: str) -> bool:
+        """Atomically move a queued job to running; False if another worker got there first."""
+        return await asyncio.to_thread(self._claim, job_id)
+
+    async def unfinished(self) -> list:
+        rows = await asyncio.to_thread(
+            self._execute, "SELECT body FROM jobs WHERE status NOT IN (?, ?) ORDER BY updated_at", FINISHED
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    async def prune(self, before: float):
+        await asyncio.to_thread(
+            self._execute, "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (*FINISHED, before)
+        )
+
+
+class JobQueue:
+    """Bounded worker pool for slow upstream work (e.g. image generation).
+
+    Submitting returns immediately with a job id; at most `workers` jobs run at
+    once, and at most `per_key_limit` of them share the same key (e.g. one
+    provider API key). Jobs whose key is at its limit are parked rather than
+    holding a worker, so a burst for one key can't starve the others.
+    """
+
+    def __init__(self, backend, workers: int = JOB_WORKERS, per_key_limit: int = JOB_PER_KEY_CONCURRENCY):
+        self.backend = backend
+        self.workers = workers
+        self.per_key_limit = per_key_limit
+        self._handlers = {}
+        self._queue = None
+        self._tasks = []
+        self._key_running = {}
+        self._parked = {}
+        self._events = {}
+        self._running = 0
+        self._draining = False
+
+    def register(self, kind: str, handler):
+        """`handler(payload) -> result` is awaited by a worker for every job of `kind`."""
+        self._handlers[kind] = handler
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._draining = False
+        for job in await self.backend.unfinished():
+            if job["status"] == RUNNING:
+                if _owner_alive(job.get("owner")):
+                    continue
+                # Its process stopped mid-run; retry it.
+                job["status"] = QUEUED
+                await self.backend.save(job)
+            self._queue.put_nowait(job["id"])
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def drain(self, timeout: float):
+        """Stop starting new jobs and give running ones up to `timeout` seconds to finish.
+
+        Jobs still queued (or cut off) stay in the backend; with the SQLite
+        backend the next process to start picks them up.
+        """
+        self._draining = True
+        deadline = time.monotonic() + timeout
+        while self._running and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._running:
+            logger.warning(f"Stopping with {self._running} job(s) still running")
+        await self.stop()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, kind: str, payload: dict, key: str = "default") -> dict:
+        if kind not in self._handlers:
+            raise ValueError(f"No job handler registered for {kind}")
+        await self.start()
+
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "key": key,
+            "status": QUEUED,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "createdAt": now,
+            "updatedAt": now,
+        }
+        await self.backend.save(job)
+        await self.backend.prune(now - JOB_RETENTION_SECONDS)
+        self._queue.put_nowait(job["id"])
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.backend.load(job_id)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """Wait until the job finishes (or `timeout` passes) and return its latest state."""
+        job = await self.backend.load(job_id)
+        if job is None or job["status"] in FINISHED:
+            return job
+        event = self._events.setdefault(job_id, asyncio.Event())
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            # Wake up every second to re-read the backend: with several worker
+            # processes the job may be running in another one.
+            step = 1.0 if deadline is None else min(1.0, max(0.0, deadline - time.monotonic()))
+            try:
+                await asyncio.wait_for(event.wait(), step)
+            except asyncio.TimeoutError:
+                pass
+            job = await self.backend.load(job_id)
+            if job is None or job["status"] in FINISHED or (deadline is not None and time.monotonic() >= deadline):
+                return job
+
+    async def _worker(self):
+        # Workers may be started from inside a request; jobs must not inherit its
+        # deadline, and their upstream calls yield to interactive ones.
+        resilience_service.set_deadline(None)
+        scheduler_service.set_priority(scheduler_service.BACKGROUND)
+        while True:
+            job_id = await self._queue.get()
+            # Log lines (and failed outputs) from the job carry its id.
+            log_service.set_request_id(job_id)
+            try:
+                if self._draining:
+                    continue
+                job = await self.backend.load(job_id)
+                if job is None or job["status"] in FINISHED:
+                    continue
+                key = job["key"]
+                if self._key_running.get(key, 0) >= self.per_key_limit or self._parked.get(key):
+                    # A worker finishing one of this key's jobs runs it next.
+                    self._parked.setdefault(key, collections.deque()).append(job_id)
+                    continue
+                await self._run_key(key, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker error for {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_key(self, key: str, job: dict):
+        """Run `job`, then the jobs parked for its key, while holding one of the key's slots."""
+        self._key_running[key] = self._key_running.get(key, 0) + 1
+        try:
+            while job is not None:
+                log_service.set_request_id(job["id"])
+                await self._run(job)
+                job = None
+                while job is None and self._parked.get(key) and not self._draining:
+                    job = await self.backend.load(self._parked[key].popleft())
+                    if job is not None and job["status"] in FINISHED:
+                        job = None
+        finally:
+            self._key_running[key] -= 1
+            if not self._key_running[key]:
+                del self._key_running[key]
+                # Nobody is left to pick up the parked jobs (e.g. after an error); queue them again.
+                for job_id in self._parked.pop(key, ()):
+                    self._queue.put_nowait(job_id)
+            if not self._parked.get(key):
+                self._parked.pop(key, None)
+
+    async def _run(self, job: dict):
+        if not await self.backend.claim(job["id"]):
+            return
+        job["status"] = RUNNING
+        job["owner"] = OWNER
+        job["updatedAt"] = time.time()
+        await self.backend.save(job)
+        self._running += 1
+        try:
+            job["result"] = await self._handlers[job["kind"]](job["payload"])
+            job["status"] = SUCCEEDED
+        except Exception as e:
+            job["error"] = getattr(e, "detail", None) or str(e)
+            job["status"] = FAILED
+        finally:
+            self._running -= 1
+        job["updatedAt"] = time.time()
+        await self.backend.save(job)
+
+        event = self._events.pop(job["id"], None)
+        if event:
+            event.set()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "parked": sum(len(parked) for parked in self._parked.values()),
+            "running": self._running,
+            "workers": len(self._tasks),
+        }
+
+
+def public_view(job: dict) -> dict:
+    """What clients get to see of a job: no payload, no internal key."""
+    return {
+        "jobId": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"],
+        "createdAt": job["createdAt"],
+        "updatedAt": job["updatedAt"],
+    }
+
+
+def _build_backend(name: str):
+    if name == "memory":
+        return MemoryJobBackend()
+    if name == "sqlite":
+        return SQLiteJobBackend()
+    raise ValueError(f"Unknown JOB_BACKEND: {name}")
+
+
+_queue = None
+
+
+def get_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(_build_backend(JOB_BACKEND))
+    return _queue
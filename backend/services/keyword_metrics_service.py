@@ -0,0 +1,244 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from services import dataforseo_service, resilience_service, metrics_service, log_service, prompt_service
+
+load_dotenv()
+logger = log_service.get_logger("keyword_metrics")
+
+KEYWORD_METRICS_SQLITE_PATH = os.getenv("KEYWORD_METRICS_SQLITE_PATH", "keyword_metrics.sqlite3")
+# Google Ads volumes, CPC and competition are refreshed monthly upstream.
+KEYWORD_METRICS_TTL_DAYS = float(os.getenv("KEYWORD_METRICS_TTL_DAYS", "30"))
+# How long the first miss waits for other requests' misses to join its DataForSEO task.
+BATCH_WINDOW_SECONDS = float(os.getenv("KEYWORD_BATCH_WINDOW_MS", "50")) / 1000
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS keyword_metrics (
+        keyword TEXT NOT NULL,
+        location_code INTEGER NOT NULL,
+        language_code TEXT NOT NULL,
+        fetched_at REAL NOT NULL,
+        search_volume INTEGER,
+        cpc REAL,
+        competition REAL,
+        PRIMARY KEY (keyword, location_code, language_code)
+    ) WITHOUT ROWID""",
+]
+
+# SQLite's default limit on bound parameters is 999 on older builds.
+READ_CHUNK = 500
+
+Locale = Tuple[int, str]
+
+
+def normalize(keyword: str) -> str:
+    """DataForSEO answers in lower case with single spaces, so store keys the same way."""
+    return " ".join(str(keyword).split()).lower()
+
+
+def _metrics(keyword: str, item: Optional[dict]) -> dict:
+    item = item or {}
+    competition = item.get("competition_index")
+    if competition is not None:
+        competition = competition / 100
+    elif isinstance(item.get("competition"), (int, float)):
+        competition = item["competition"]
+    return {
+        "keyword": keyword,
+        "volume": item.get("search_volume"),
+        "cpc": item.get("cpc"),
+        "competition": competition,
+    }
+
+
+class KeywordMetricsStore:
+    """Search volume, CPC and competition per (keyword, location, language).
+
+    Keywords DataForSEO had no data for are stored too (with NULL metrics), so
+    they aren't asked for again until they expire.
+    """
+
+    def __init__(self, path: str = KEYWORD_METRICS_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get_many(self, keywords: List[str], locale: Locale, fresh_after: float) -> Dict[str, dict]:
+        found = {}
+        for i in range(0, len(keywords), READ_CHUNK):
+            chunk = keywords[i:i + READ_CHUNK]
+            rows = self._conn().execute(
+                f"""SELECT keyword, search_volume, cpc, competition FROM keyword_metrics
+                    WHERE location_code = ? AND language_code = ? AND fetched_at >= ?
+                    AND keyword IN ({", ".join("?" * len(chunk))})""",
+                (*locale, fresh_after, *chunk)
+            ).fetchall()
+            for keyword, volume, cpc, competition in rows:
+                found[keyword] = {"keyword": keyword, "volume": volume, "cpc": cpc, "competition": competition}
+        return found
+
+    def _put_many(self, metrics: List[dict], locale: Locale):
+        now = time.time()
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.executemany(
+                    """INSERT OR REPLACE INTO keyword_metrics
+                       (keyword, location_code, language_code, fetched_at, search_volume, cpc, competition)
+                       VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                    [(m["keyword"], *locale, now, m["volume"], m["cpc"], m["competition"]) for m in metrics]
+                )
+
+    async def get_many(self, keywords: List[str], locale: Locale) -> Dict[str, dict]:
+        """Fresh metrics for whichever of `keywords` are stored."""
+        fresh_after = time.time() - KEYWORD_METRICS_TTL_DAYS * 86400
+        return await asyncio.to_thread(self._get_many, keywords, locale, fresh_after)
+
+    async def put_many(self, metrics: List[dict], locale: Locale):
+        await asyncio.to_thread(self._put_many, metrics, locale)
+
+
+class KeywordBatcher:
+    """Coalesces keyword misses from concurrent requests into shared DataForSEO tasks.
+
+    The first miss for a locale opens a batch that is sent after
+    BATCH_WINDOW_SECONDS, or as soon as it holds MAX_KEYWORDS_PER_TASK
+    keywords. A keyword already waiting in a batch or in flight is not
+    requested again; its callers share the one result.
+    """
+
+    def __init__(self, fetch, window: float = BATCH_WINDOW_SECONDS):
+        self.fetch = fetch
+        self.window = window
+        self._pending: Dict[Locale, Dict[str, asyncio.Future]] = {}
+        self._timers: Dict[Locale, asyncio.TimerHandle] = {}
+        self._inflight: Dict[Tuple[Locale, str], asyncio.Future] = {}
+        self._tasks = set()
+        self.batches = 0
+
+    async def lookup(self, keywords: List[str], locale: Locale) -> Dict[str, dict]:
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for keyword in keywords:
+            future = self._inflight.get((locale, keyword))
+            if future is None:
+                batch = self._pending.get(locale)
+                if batch is None:
+                    batch = self._pending[locale] = {}
+                    self._timers[locale] = loop.call_later(self.window, self._flush, locale)
+                future = batch[keyword] = loop.create_future()
+                self._inflight[(locale, keyword)] = future
+                if len(batch) >= dataforseo_service.MAX_KEYWORDS_PER_TASK:
+                    self._flush(locale)
+            futures[keyword] = future
+
+        # Shielded: one caller giving up must not cancel the lookup for the others.
+        results = await asyncio.gather(*(asyncio.shield(f) for f in futures.values()), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return dict(zip(futures, results))
+
+    def _flush(self, locale: Locale):
+        timer = self._timers.pop(locale, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(locale, None)
+        if batch:
+            task = asyncio.create_task(self._run(locale, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, locale: Locale, batch: Dict[str, asyncio.Future]):
+        # The batch serves many requests, so it isn't bound by the deadline of
+        # whichever one happened to open it.
+        resilience_service.set_deadline(None)
+        self.batches += 1
+        metrics_service.KEYWORD_BATCH_SIZE.observe(len(batch))
+        try:
+            results = await self.fetch(list(batch), locale)
+        except Exception as e:
+            logger.warning(f"Keyword metrics batch of {len(batch)} failed: {e}")
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for keyword, future in batch.items():
+                if not future.done():
+                    future.set_result(results[keyword])
+        finally:
+            for keyword, future in batch.items():
+                self._inflight.pop((locale, keyword), None)
+                # Nobody may be left to see the error; don't warn about it.
+                if future.done() and not future.cancelled():
+                    future.exception()
+
+    def stats(self) -> dict:
+        return {
+            "pendingKeywords": sum(len(batch) for batch in self._pending.values()),
+            "inFlightKeywords": len(self._inflight),
+            "batches": self.batches,
+        }
+
+
+_store = None
+_batcher = None
+
+
+def get_store() -> KeywordMetricsStore:
+    global _store
+    if _store is None:
+        _store = KeywordMetricsStore()
+    return _store
+
+
+async def _fetch_and_store(keywords: List[str], locale: Locale) -> Dict[str, dict]:
+    items = await dataforseo_service.search_volume(keywords, *locale)
+    by_keyword = {normalize(item.get("keyword", "")): item for item in items}
+    metrics = {keyword: _metrics(keyword, by_keyword.get(keyword)) for keyword in keywords}
+    await get_store().put_many(list(metrics.values()), locale)
+    return metrics
+
+
+def get_batcher() -> KeywordBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = KeywordBatcher(_fetch_and_store)
+    return _batcher
+
+
+async def get_metrics(keywords: List[str], location_code: int = dataforseo_service.LOCATION_CODE,
+                      language_code: str = dataforseo_service.LANGUAGE_CODE) -> List[dict]:
+    """Metrics for each distinct, valid keyword, in order: from the store when
+    fresh, otherwise from a batched DataForSEO lookup. Metrics are None where
+    DataForSEO has no data."""
+    locale = (location_code, language_code)
+    keywords = [k for k in prompt_service.dedupe(normalize(k) for k in keywords) if dataforseo_service.valid_keyword(k)]
+    found = await get_store().get_many(keywords, locale)
+    missing = [k for k in keywords if k not in found]
+    metrics_service.KEYWORD_METRICS_LOOKUPS.labels("hit").inc(len(found))
+    metrics_service.KEYWORD_METRICS_LOOKUPS.labels("miss").inc(len(missing))
+    if missing:
+        found.update(await get_batcher().lookup(missing, locale))
+    return [found[k] for k in keywords]
+
+
+def stats() -> dict:
+    return get_batcher().stats()
@@ -0,0 +1,392 @@
+"""Tolerant, single-pass JSON parsing for LLM output.
+
+LLMs wrap JSON in markdown fences and prose, sprinkle Perplexity citation markers
+(`[1]`) between tokens, use single or smart quotes, leave keys unquoted, emit
+Python literals and trailing commas. Instead of a chain of whole-string regex
+rewrites (which also mangle legitimate values such as "Top [3] tips" or
+"Doors open 10:30"), this module walks the text once and only applies a repair
+where the input stops being valid JSON.
+
+Cost: valid JSON (fenced or not) goes straight to the C decoder, so it parses
+as fast as `json.loads`. Damaged replies only fall back to the Python walk for
+the subtrees that fail to decode, but on those the walk is still 2-3x slower
+than the old regex chain on the inputs that chain could parse at all (about
+0.1-0.2 ms for a full strategy; see bench/json_parser_bench.py). That is the
+price of not corrupting values, and it is small next to the LLM call.
+"""
+import re
+import json
+import time
+from services import metrics_service
+
+WHITESPACE = " \t\r\n"
+# Opening quote -> quotes accepted as its closer.
+QUOTES = {'"': '"”', "“": '”"', "'": "'’", "‘": "’'", "’": "’'"}
+ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "'": "'"}
+LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+BARE_TERMINATORS = ",:{}[]\n"
+
+# Next character that ends an unquoted key or value.
+BARE_KEY_END = re.compile(r"[:,{}\[\]\n]")
+BARE_END = re.compile("[" + re.escape(BARE_TERMINATORS) + "]")
+# What the tolerant walk skips between tokens, one C-level match each: before
+# a member (whitespace and stray commas), between key and value, and after a
+# value (whitespace and citation markers).
+MEMBER_GAP = re.compile(r"[ \t\r\n,]*")
+KEY_GAP = re.compile(r"[ \t\r\n]*[:=]?[ \t\r\n]*")
+VALUE_TRAILER = re.compile(r"[ \t\r\n]*(?:\[\d+\][ \t\r\n]*)*")
+
+# Next character that can end (or escape inside) a string opened by each quote.
+STRING_STOPS = {q: re.compile("[\\\\" + re.escape(closers) + "]") for q, closers in QUOTES.items()}
+# Next character the streaming scanner has to look at.
+STRUCTURAL = re.compile("[" + re.escape("".join(QUOTES) + "{}[],") + "]")
+
+CITATION = re.compile(r"\[\d+\]")
+# Citation markers glued to the preceding word inside a string ("popular[1][2].").
+ATTACHED_CITATIONS = re.compile(r"(?<=\S)(?:\[\d+\])+")
+
+
+class LLMJSONError(ValueError):
+    pass
+
+
+def _string_end(text: str, start: int, final: bool = True):
+    """Index of the quote closing the string opened at `start`.
+
+    A closing quote only counts when the next significant character is
+    structural, so unescaped inner quotes and apostrophes ("Joe's") survive.
+    Returns None when more input is needed to decide (streaming only).
+    """
+    stops = STRING_STOPS[text[start]]
+    n = len(text)
+    i = start + 1
+    while i < n:
+        match = stops.search(text, i)
+        if not match:
+            break
+        i = match.start()
+        if text[i] == "\\":
+            i += 2
+            continue
+        j = i + 1
+        newline = False
+        while j < n and text[j] in WHITESPACE:
+            newline = newline or text[j] == "\n"
+            j += 1
+        if j == n:
+            return i if final else None
+        nxt = text[j]
+        if nxt in ",:}]" or (nxt == "[" and CITATION.match(text, j)):
+            return i
+        if newline and (nxt in QUOTES or nxt.isalpha() or nxt == "_"):
+            # Missing comma between members on separate lines.
+            return i
+        if nxt in QUOTES and j > i + 1:
+            # Missing comma between values on one line: "a" "b".
+            return i
+        if nxt == "[" and not final and "]" not in text[j:j + 8]:
+            return None
+        i += 1
+    if final:
+        return n
+    return None
+
+
+def _decode_string(raw: str) -> str:
+    if "\\" in raw:
+        out = []
+        i = 0
+        n = len(raw)
+        while i < n:
+            ch = raw[i]
+            if ch != "\\" or i + 1 >= n:
+                out.append(ch)
+                i += 1
+                continue
+            esc = raw[i + 1]
+            if esc == "u" and i + 6 <= n:
+                try:
+                    code = int(raw[i + 2:i + 6], 16)
+                except ValueError:
+                    out.append(esc)
+                    i += 2
+                    continue
+                i += 6
+                if 0xD800 <= code < 0xDC00 and raw[i:i + 2] == "\\u":
+                    try:
+                        low = int(raw[i + 2:i + 6], 16)
+                    except ValueError:
+                        low = 0
+                    if 0xDC00 <= low < 0xE000:
+                        code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                        i += 6
+                out.append(chr(code))
+                continue
+            out.append(ESCAPES.get(esc, esc))
+            i += 2
+        raw = "".join(out)
+    if "[" in raw:
+        raw = ATTACHED_CITATIONS.sub("", raw)
+    return raw
+
+
+def _bare_value(token: str):
+    token = token.strip()
+    if token in LITERALS:
+        return LITERALS[token]
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+_decoder = json.JSONDecoder()
+
+
+def _strip_citations(value):
+    if isinstance(value, str):
+        return ATTACHED_CITATIONS.sub("", value) if "[" in value else value
+    if isinstance(value, dict):
+        return {k: _strip_citations(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_strip_citations(v) for v in value]
+    return value
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.text = text
+        self.n = len(text)
+        self.pos = 0
+
+    def skip_ws(self):
+        text, n, pos = self.text, self.n, self.pos
+        while pos < n and text[pos] in WHITESPACE:
+            pos += 1
+        self.pos = pos
+
+    def skip_after_value(self):
+        # Whitespace and citation markers that trail a value.
+        self.pos = VALUE_TRAILER.match(self.text, self.pos).end()
+
+    def find_root(self, openers: str = "{[") -> bool:
+        text, n, pos = self.text, self.n, self.pos
+        while pos < n:
+            ch = text[pos]
+            if ch == "{" and "{" in openers:
+                self.pos = pos
+                return True
+            if ch == "[" and "[" in openers:
+                match = CITATION.match(text, pos)
+                if not match:
+                    self.pos = pos
+                    return True
+                pos = match.end()
+                continue
+            pos += 1
+        return False
+
+    def value(self):
+        self.skip_ws()
+        if self.pos >= self.n:
+            return None
+        ch = self.text[self.pos]
+        if ch in "{[":
+            # Well-formed subtrees take the C decoder; only the damaged parts
+            # of a document pay for the tolerant walk.
+            start = self.pos
+            try:
+                value, self.pos = _decoder.raw_decode(self.text, start)
+            except ValueError:
+                return self.object() if ch == "{" else self.array()
+            if CITATION.search(self.text, start, self.pos):
+                value = _strip_citations(value)
+            return value
+        if ch in QUOTES:
+            return self.string()
+        return self.bare()
+
+    def object(self) -> dict:
+        text = self.text
+        result = {}
+        self.pos += 1
+        while True:
+            self.pos = MEMBER_GAP.match(text, self.pos).end()
+            if self.pos >= self.n:
+                return result
+            if text[self.pos] == "}":
+                self.pos += 1
+                return result
+            if text[self.pos] == "]":
+                # Mismatched closer: treat it as the end of this object.
+                self.pos += 1
+                return result
+            key = self.string() if text[self.pos] in QUOTES else self.bare_key()
+            self.pos = KEY_GAP.match(text, self.pos).end()
+            if self.pos < self.n and text[self.pos] not in ",}":
+                result[key] = self.value()
+            else:
+                result[key] = None
+            self.skip_after_value()
+
+    def array(self) -> list:
+        text = self.text
+        result = []
+        self.pos += 1
+        while True:
+            self.pos = MEMBER_GAP.match(text, self.pos).end()
+            if self.pos >= self.n:
+                return result
+            if text[self.pos] in "]}":
+                self.pos += 1
+                return result
+            result.append(self.value())
+            self.skip_after_value()
+
+    def string(self) -> str:
+        start = self.pos
+        end = _string_end(self.text, start)
+        self.pos = end + 1
+        return _decode_string(self.text[start + 1:end])
+
+    def _scan(self, stop) -> str:
+        # Up to (not including) the next `stop` character, or the end of the text.
+        start = self.pos
+        match = stop.search(self.text, start)
+        self.pos = match.start() if match else self.n
+        return self.text[start:self.pos]
+
+    def bare_key(self) -> str:
+        return self._scan(BARE_KEY_END).strip()
+
+    def bare(self):
+        text, n = self.text, self.n
+        token = self._scan(BARE_END)
+        if self.pos < n and text[self.pos] == ":":
+            # Stray colon inside an unquoted value ("10:30"); keep reading.
+            self.pos += 1
+            return _bare_value(token + ":" + str(self.bare()))
+        return _bare_value(token)
+
+
+def parse_llm_json(text: str, openers: str = "{["):
+    """Parse the first JSON value in `text` opened by one of `openers`, repairing common LLM damage."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        parser = _Parser(text)
+        if not parser.find_root(openers):
+            raise LLMJSONError("No valid JSON found.")
+        value = parser.value()
+        outcome = "ok"
+        return value
+    finally:
+        metrics_service.JSON_PARSE_LATENCY.labels(outcome).observe(time.perf_counter() - started)
+
+
+def parse_llm_object(text: str) -> dict:
+    return parse_llm_json(text, openers="{")
+
+
+class StreamingParser:
+    """Incremental variant of `parse_llm_json` for streamed completions.
+
+    `feed()` returns the top-level members completed by the new chunk, as
+    `(key, value)` pairs for an object root or `(index, value)` for an array
+    root. Each character is scanned once; each member is parsed once when its
+    terminating comma or closing bracket arrives.
+    """
+
+    def __init__(self, openers: str = "{["):
+        self.openers = openers
+        self.buffer = ""
+        self.root = None
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._member_start = 0
+        self._index = 0
+        self._members = []
+
+    def feed(self, chunk: str) -> list:
+        self.buffer += chunk
+        completed = []
+        text = self.buffer
+        n = len(text)
+        i = self._pos
+        while i < n and not self.done:
+            if self.root is not None:
+                match = STRUCTURAL.search(text, i)
+                if not match:
+                    i = n
+                    break
+                i = match.start()
+            ch = text[i]
+            if self.root is None:
+                if ch == "[" and "[" in self.openers:
+                    match = CITATION.match(text, i)
+                    if match:
+                        i = match.end()
+                        continue
+                    rest = text[i + 1:]
+                    if not rest or rest.isdigit():
+                        # Could still be the start of a citation marker.
+                        break
+                if ch in self.openers:
+                    self.root = ch
+                    self._depth = 1
+                    self._member_start = i + 1
+                i += 1
+                continue
+            if ch in QUOTES:
+                end = _string_end(text, i, final=False)
+                if end is None:
+                    break
+                i = end + 1
+                continue
+            if ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._flush(self._member_start, i, completed)
+                    self.done = True
+                    i += 1
+                    break
+            elif ch == "," and self._depth == 1:
+                self._flush(self._member_start, i, completed)
+                self._member_start = i + 1
+            i += 1
+        self._pos = i
+        return completed
+
+    def _flush(self, start: int, end: int, completed: list):
+        segment = self.buffer[start:end]
+        if not segment.strip():
+            return
+        if self.root == "{":
+            parsed = _Parser("{" + segment + "}").value()
+            for key, value in parsed.items():
+                member = (key, value)
+                self._members.append(member)
+                completed.append(member)
+        else:
+            member = (self._index, _Parser(segment).value())
+            self._index += 1
+            self._members.append(member)
+            completed.append(member)
+
+    def close(self):
+        """Return the full parsed document, salvaging a truncated final member."""
+        if self.root is None:
+            raise LLMJSONError("No valid JSON found.")
+        if not self.done:
+            self._flush(self._member_start, len(self.buffer), [])
+            self.done = True
+        if self.root == "{":
+            return dict(self._members)
+        return [value for _, value in self._members]
@@ -0,0 +1,260 @@
+import os
+import re
+import json
+import time
+import uuid
+import queue
+import random
+import zlib
+import logging
+import logging.handlers
+import contextvars
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, "text" for something readable in a terminal.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Share of requests whose LLM/provider payloads are logged, and how much of each.
+PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "4000"))
+# LLM outputs that failed to parse, one file each, oldest deleted past the limits.
+FAILED_OUTPUT_DIR = os.getenv("FAILED_OUTPUT_DIR", "failed_llm_outputs")
+FAILED_OUTPUT_MAX_FILES = int(os.getenv("FAILED_OUTPUT_MAX_FILES", "200"))
+FAILED_OUTPUT_MAX_BYTES = int(os.getenv("FAILED_OUTPUT_MAX_BYTES", str(20 * 1024 * 1024)))
+
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+
+def set_request_id(request_id: Optional[str]):
+    return _request_id.set(request_id)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"vega.{name}")
+
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the request id while still on the caller's task."""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["requestId"] = request_id
+        entry.update(getattr(record, "fields", None) or {})
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            entry["payload"] = _truncate(payload)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = f"{record.levelname:<7} {record.name} {record.getMessage()}"
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            line += f" [{request_id}]"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            line += "\n" + _truncate(payload)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def _truncate(payload) -> str:
+    text = payload if isinstance(payload, str) else json.dumps(payload, default=str, ensure_ascii=False)
+    if len(text) > PAYLOAD_MAX_CHARS:
+        text = text[:PAYLOAD_MAX_CHARS] + f"... [{len(text) - PAYLOAD_MAX_CHARS} more chars]"
+    return text
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread untouched; formatting (and payload
+    serialisation) happens there. When the queue is full the record is
+    dropped and counted rather than making the caller wait."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+class FailedOutputHandler(logging.Handler):
+    """Writes records carrying `failed_output` to FAILED_OUTPUT_DIR as
+    `<utc time>-<request id>-<kind>.json`, then trims the directory to
+    FAILED_OUTPUT_MAX_FILES / FAILED_OUTPUT_MAX_BYTES, oldest first."""
+
+    def __init__(self, directory: str = FAILED_OUTPUT_DIR):
+        super().__init__()
+        self.directory = directory
+
+    def emit(self, record):
+        output = getattr(record, "failed_output", None)
+        if output is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fields = getattr(record, "fields", None) or {}
+            request_id = getattr(record, "request_id", None)
+            kind = str(fields.get("kind", "llm"))
+            stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(record.created)) + f"{record.created % 1:.6f}"[1:]
+            name = f"{stamp}-{request_id or 'none'}-{kind}.json"
+            with open(os.path.join(self.directory, name), "w", encoding="utf-8") as f:
+                json.dump({
+                    "requestId": request_id,
+                    "ts": record.created,
+                    "error": record.getMessage(),
+                    **fields,
+                    "output": output,
+                }, f, ensure_ascii=False, default=str)
+            self._trim()
+        except Exception:
+            self.handleError(record)
+
+    def _trim(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        total = sum(size for _, _, size in entries)
+        while entries and (len(entries) > FAILED_OUTPUT_MAX_FILES or total > FAILED_OUTPUT_MAX_BYTES):
+            _, name, size = entries.pop(0)
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+
+def payload_sampled() -> bool:
+    """Whether this request's payloads are logged. Decided per request id, so a
+    sampled request is logged end to end instead of a random subset of lines."""
+    if PAYLOAD_SAMPLE_RATE >= 1:
+        return True
+    if PAYLOAD_SAMPLE_RATE <= 0:
+        return False
+    request_id = _request_id.get()
+    if request_id is None:
+        return random.random() < PAYLOAD_SAMPLE_RATE
+    return zlib.crc32(request_id.encode()) % 10000 < PAYLOAD_SAMPLE_RATE * 10000
+
+
+def log_payload(logger: logging.Logger, msg: str, payload, **fields):
+    """Log an LLM/provider payload for sampled requests.
+
+    `payload` is serialised and truncated on the logging thread, so pass the
+    object itself and don't mutate it afterwards.
+    """
+    if payload_sampled():
+        logger.info(msg, extra={"fields": fields, "payload": payload})
+
+
+def log_failed_output(logger: logging.Logger, kind: str, output: str, error, **fields):
+    """Log a parse failure and keep the full `output` in the failed-output store."""
+    logger.warning(f"Unparseable LLM output: {error}", extra={
+        "fields": {"kind": kind, "chars": len(output), **fields},
+        "failed_output": output,
+    })
+
+
+_listener = None
+
+
+def configure():
+    """Route every `vega.*` logger through a queue to one background thread. Idempotent."""
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler()
+    stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JSONFormatter())
+    _listener = logging.handlers.QueueListener(
+        queue.Queue(LOG_QUEUE_SIZE), stream, FailedOutputHandler(), respect_handler_level=True
+    )
+    handler = NonBlockingQueueHandler(_listener.queue)
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger("vega")
+    root.setLevel(LOG_LEVEL)
+    root.handlers[:] = [handler]
+    root.propagate = False
+    _listener.start()
+
+
+def stats() -> dict:
+    return {
+        "queued": _listener.queue.qsize() if _listener else 0,
+        "dropped": NonBlockingQueueHandler.dropped,
+    }
+
+
+def shutdown():
+    """Flush queued records; call last on shutdown."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware giving each request an id (the caller's X-Request-ID if
+    sent) for log lines and failed outputs, echoed back in X-Request-ID."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not REQUEST_ID_PATTERN.match(request_id):
+            # Ends up in file names, so only accept plain ids.
+            request_id = uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        token = _request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
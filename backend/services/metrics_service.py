@@ -0,0 +1,159 @@
+import os
+import time
+import contextlib
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+
+# With several workers set PROMETHEUS_MULTIPROC_DIR to an empty directory
+# (wiped before start); every worker writes its samples there and /metrics
+# aggregates them, whichever worker answers the scrape.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# LLM calls take seconds, not milliseconds.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 180)
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Inbound request latency (streams until their last byte).",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Inbound requests being handled.", ["route"], multiprocess_mode="livesum",
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds",
+    "Latency of each upstream attempt until response headers; status is the HTTP status or the exception name.",
+    ["provider", "status"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "upstream_requests_in_flight", "Upstream calls in flight, including reading streamed bodies.",
+    ["provider"], multiprocess_mode="livesum",
+)
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "scheduler_queue_depth", "Upstream calls waiting for a rate-limit slot.",
+    ["provider", "priority"], multiprocess_mode="livesum",
+)
+SCHEDULER_WAIT = Histogram(
+    "scheduler_wait_seconds", "Time queued calls waited for a rate-limit slot (granted or given up).",
+    ["provider", "priority"], buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the provider's usage field.", ["provider", "model", "kind"])
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds", "Time spent in a named stage of request handling.",
+    ["stage", "outcome"], buckets=LATENCY_BUCKETS,
+)
+JSON_PARSE_LATENCY = Histogram(
+    "llm_json_parse_duration_seconds", "Time to parse (and repair) LLM JSON output.", ["outcome"], buckets=PARSE_BUCKETS,
+)
+LLM_REPAIRS = Counter("llm_repairs_total", "Follow-up LLM calls made to replace missing or invalid output.", ["kind"])
+PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens", "Estimated tokens per prompt as sent.", ["prompt"],
+    buckets=(100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000),
+)
+CACHE_REQUESTS = Counter("llm_cache_requests_total", "LLM cache lookups; hit ratio is hit / all.", ["namespace", "result"])
+KEYWORD_METRICS_LOOKUPS = Counter(
+    "keyword_metrics_lookups_total", "Keywords answered from the keyword-metrics store (hit) or DataForSEO (miss).",
+    ["result"],
+)
+KEYWORD_BATCH_SIZE = Histogram(
+    "dataforseo_batch_keywords", "Keywords per batched DataForSEO search_volume task.",
+    buckets=(1, 5, 10, 20, 50, 100, 250, 500, 1000),
+)
+SIMILARITY_LOOKUPS = Counter(
+    "similarity_lookups_total", "Near-duplicate index lookups; a hit reuses or adapts a prior generation.",
+    ["namespace", "result"],
+)
+SIMILARITY_SAVED_SECONDS = Counter(
+    "similarity_saved_seconds_total", "Generation time avoided by reusing near-duplicate generations.", ["namespace"],
+)
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """Time the wrapped block as stage_duration_seconds{stage=name}.
+
+    A plain context manager, so it works the same inside async code:
+
+        with metrics_service.stage("recommendation.strategy_llm"):
+            raw = await perplexity_service.chat_content(...)
+    """
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        STAGE_LATENCY.labels(name, outcome).observe(time.perf_counter() - started)
+
+
+def record_usage(provider: str, model: str, usage: dict):
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.labels(provider, model, kind.split("_")[0]).inc(usage[kind])
+
+
+def route_label(scope) -> str:
+    """The matched route template ("/campaigns/{campaign_id}"), so labels don't grow with ids."""
+    app = scope.get("app")
+    partial = None
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unknown")
+        if match == Match.PARTIAL and partial is None:
+            # Path matches but the method doesn't (the app answers 405).
+            partial = getattr(route, "path", "unknown")
+    return partial or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording http_request_duration_seconds and http_requests_in_flight."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        route = route_label(scope)
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            HTTP_LATENCY.labels(scope["method"], route, status).observe(time.perf_counter() - started)
+
+
+def render() -> bytes:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead():
+    """Drop this worker's live gauges from the multiprocess files on shutdown."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
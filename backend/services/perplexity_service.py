@@ -0,0 +1,188 @@
+import os
+import json
+import httpx
+from typing import Optional
+from dotenv import load_dotenv
+from services import cache_service, singleflight_service, resilience_service, scheduler_service, metrics_service
+
+load_dotenv()
+
+PERPLEXITY_URL = os.getenv("PERPLEXITY_API_URL", "https://api.perplexity.ai/chat/completions")
+DEFAULT_MODEL = os.getenv("PERPLEXITY_MODEL", "sonar-pro")
+
+# Pool settings. Per-call connect/read timeouts and retries come from the
+# "perplexity" policy in resilience_service; waiting for a free pooled
+# connection should fail fast.
+POOL_TIMEOUT = float(os.getenv("PERPLEXITY_POOL_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("PERPLEXITY_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("PERPLEXITY_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("PERPLEXITY_KEEPALIVE_EXPIRY", "60"))
+HTTP2 = os.getenv("PERPLEXITY_HTTP2", "1") == "1"
+STRUCTURED_OUTPUT = os.getenv("PERPLEXITY_STRUCTURED_OUTPUT", "1") == "1"
+# Completion size assumed when reserving tokens/min quota; corrected from `usage` afterwards.
+EXPECTED_COMPLETION_TOKENS = int(os.getenv("PERPLEXITY_EXPECTED_COMPLETION_TOKENS", "1500"))
+
+_client = None
+
+
+class PerplexityError(Exception):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(text)
+        self.status_code = status_code
+        self.text = text
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2,
+            timeout=httpx.Timeout(None, pool=POOL_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def response_format(schema: dict) -> dict:
+    """Completion params asking for structured output matching `schema` (empty when disabled)."""
+    if not STRUCTURED_OUTPUT:
+        return {}
+    return {"response_format": {"type": "json_schema", "json_schema": {"schema": schema}}}
+
+
+def _estimate_tokens(prompt: str, params: dict) -> int:
+    return scheduler_service.estimate_tokens(prompt, params.get("max_tokens", EXPECTED_COMPLETION_TOKENS))
+
+
+async def _settle_usage(model: str, estimated: int, usage: Optional[dict]):
+    if usage:
+        metrics_service.record_usage("perplexity", model, usage)
+    if usage and usage.get("total_tokens"):
+        await scheduler_service.get_scheduler("perplexity").settle(estimated, usage["total_tokens"])
+
+
+def _headers() -> dict:
+    return {
+        "Authorization": f"Bearer {os.getenv('PERPLEXITY_API_KEY')}",
+        "Content-Type": "application/json"
+    }
+
+
+async def chat_completion(prompt: str, model: str = DEFAULT_MODEL, cache_namespace: Optional[str] = None, **params) -> dict:
+    """Send a single-message chat completion and return the decoded response body.
+
+    When `cache_namespace` is given, identical (model, prompt, params) calls are
+    answered from the LLM cache using that namespace's TTL. Identical calls that
+    are still in flight are always collapsed onto one upstream request.
+    """
+    key = cache_service.make_key(model, prompt, params)
+    cache = cache_service.get_cache() if cache_namespace else None
+    if cache:
+        cached = await cache.get(cache_namespace, key)
+        if cached is not None:
+            return cached
+
+    async def call_upstream():
+        body = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            **params
+        }
+        estimated = _estimate_tokens(prompt, params)
+        async with resilience_service.track("perplexity"):
+            response = await resilience_service.request(
+                "perplexity",
+                lambda timeout: get_client().post(PERPLEXITY_URL, headers=_headers(), json=body, timeout=timeout),
+                tokens=estimated
+            )
+        if response.status_code != 200:
+            raise PerplexityError(response.status_code, response.text)
+        result = response.json()
+        await _settle_usage(model, estimated, result.get("usage"))
+
+        if cache:
+            await cache.set(cache_namespace, key, result)
+        return result
+
+    return await singleflight_service.get_group().do(key, call_upstream, namespace=cache_namespace or "uncached")
+
+
+async def chat_content(prompt: str, model: str = DEFAULT_MODEL, cache_namespace: Optional[str] = None, **params) -> str:
+    result = await chat_completion(prompt, model=model, cache_namespace=cache_namespace, **params)
+    return result["choices"][0]["message"]["content"]
+
+
+async def evict(prompt: str, model: str = DEFAULT_MODEL, **params):
+    """Drop a cached completion, e.g. after it turned out to be unparseable."""
+    cache = cache_service.get_cache()
+    if cache:
+        await cache.delete(cache_service.make_key(model, prompt, params))
+
+
+async def stream_chat_content(prompt: str, model: str = DEFAULT_MODEL, cache_namespace: Optional[str] = None, **params):
+    """Yield content deltas from a `stream: true` completion as they arrive.
+
+    Streamed and non-streamed calls share cache entries, so a cached completion
+    is replayed as a single delta.
+    """
+    cache = cache_service.get_cache() if cache_namespace else None
+    key = cache_service.make_key(model, prompt, params) if cache else None
+    if cache:
+        cached = await cache.get(cache_namespace, key)
+        if cached is not None:
+            yield cached["choices"][0]["message"]["content"]
+            return
+
+    body = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": True,
+        **params
+    }
+    parts = []
+    usage = None
+    client = get_client()
+    estimated = _estimate_tokens(prompt, params)
+    async with resilience_service.track("perplexity"):
+        response = await resilience_service.request(
+            "perplexity",
+            lambda timeout: client.send(
+                client.build_request("POST", PERPLEXITY_URL, headers=_headers(), json=body, timeout=timeout), stream=True
+            ),
+            tokens=estimated
+        )
+        try:
+            if response.status_code != 200:
+                text = (await response.aread()).decode("utf-8", "replace")
+                raise PerplexityError(response.status_code, text)
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                usage = chunk.get("usage") or usage
+                choices = chunk.get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            await response.aclose()
+            await _settle_usage(model, estimated, usage)
+
+    if cache:
+        await cache.set(cache_namespace, key, {"choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]})
@@ -0,0 +1,151 @@
+"""Prompt assembly under per-field token budgets.
+
+Routers still write their prompt templates as f-strings, but every value that
+comes from the client or from earlier LLM output goes through one of the
+helpers below first, and the finished prompt goes through `finalize()`, which
+records its size. Compaction is deterministic (same input, same prompt), so
+LLM cache keys stay stable.
+"""
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from services import log_service, metrics_service
+
+load_dotenv()
+logger = log_service.get_logger("prompt")
+
+# Token budgets per kind of field; override with PROMPT_BUDGET_<FIELD>=<tokens>.
+DEFAULT_BUDGETS = {
+    "short": 30,          # names, location, industry, platform, ad type
+    "description": 300,   # business description
+    "list": 80,           # goals, demographics, interests
+    "captions": 300,      # past captions, all together
+    "caption": 60,        # one past caption
+    "hashtags": 60,
+    "answers": 500,       # wizard answers, all together
+    "answer": 120,        # one wizard answer
+    "script": 300,        # a generated script quoted in another prompt
+}
+
+# Words cost about one token per 6 letters, digits are grouped by three and
+# every other symbol is its own token. Close enough to BPE counts for English.
+TOKEN = re.compile(r"[^\W\d_]+|\d{1,3}|\S")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+WHITESPACE = re.compile(r"\s+")
+ELLIPSIS = " …"
+
+
+def budget(field: str) -> int:
+    return int(os.getenv(f"PROMPT_BUDGET_{field.upper()}", DEFAULT_BUDGETS[field]))
+
+
+def count_tokens(text: str) -> int:
+    tokens = 0
+    for match in TOKEN.finditer(text):
+        tokens += 1 + (match.end() - match.start() - 1) // 6
+    return tokens
+
+
+def _cut(text: str, max_tokens: int) -> str:
+    """Longest prefix of `text` within `max_tokens`, ending at a sentence or word boundary."""
+    tokens = 0
+    end = len(text)
+    for match in TOKEN.finditer(text):
+        tokens += 1 + (match.end() - match.start() - 1) // 6
+        if tokens > max_tokens:
+            end = match.start()
+            break
+    else:
+        return text
+    prefix = text[:end].rstrip()
+    # Prefer a whole sentence unless that throws away more than half of what fits.
+    sentence = max(prefix.rfind(". "), prefix.rfind("! "), prefix.rfind("? "))
+    if sentence > len(prefix) // 2:
+        return prefix[:sentence + 1]
+    return prefix + ELLIPSIS
+
+
+def clip(value: Any, field: str) -> str:
+    """`value` as one line of text within the field's budget: whitespace
+    collapsed, repeated sentences dropped, then cut at a sentence or word
+    boundary."""
+    text = WHITESPACE.sub(" ", str(value or "")).strip()
+    max_tokens = budget(field)
+    if count_tokens(text) <= max_tokens:
+        return text
+    sentences = dedupe(SENTENCE_END.split(text))
+    return _cut(" ".join(sentences), max_tokens)
+
+
+def _norm(item: str) -> str:
+    return WHITESPACE.sub(" ", item).strip().lower()
+
+
+def dedupe(items: Iterable[Any], key=_norm) -> List[str]:
+    """Non-empty items as strings, first occurrence wins, compared case- and whitespace-insensitively."""
+    seen = set()
+    unique = []
+    for item in items:
+        if item is None:
+            continue
+        item = str(item).strip()
+        k = key(item)
+        if k and k not in seen:
+            seen.add(k)
+            unique.append(item)
+    return unique
+
+
+def _fit(items: List[str], max_tokens: int, sep: str) -> List[str]:
+    """Leading items whose joined length stays within `max_tokens`."""
+    kept = []
+    used = 0
+    sep_tokens = count_tokens(sep)
+    for item in items:
+        cost = count_tokens(item) + (sep_tokens if kept else 0)
+        if used + cost > max_tokens:
+            break
+        kept.append(item)
+        used += cost
+    return kept
+
+
+def listing(items: Any, field: str = "list", sep: str = ", ", item_field: Optional[str] = None) -> str:
+    """Join de-duplicated items within the field's budget, each item clipped
+    to `item_field` first if given. Accepts a plain string too."""
+    if isinstance(items, str):
+        return clip(items, field)
+    items = dedupe(items or [])
+    if item_field:
+        items = [clip(item, item_field) for item in items]
+    kept = _fit(items, budget(field), sep)
+    if len(kept) < len(items):
+        logger.debug(f"Dropped {len(items) - len(kept)} of {len(items)} {field} items to fit the budget")
+    return sep.join(kept)
+
+
+def hashtags(tags: Iterable[Any]) -> str:
+    """Hashtags de-duplicated regardless of case or a missing '#'."""
+    unique = dedupe(tags or [], key=lambda tag: tag.lstrip("#").lower())
+    tagged = ["#" + tag.lstrip("#") for tag in unique]
+    return " ".join(_fit(tagged, budget("hashtags"), " "))
+
+
+def answers(qa: Dict[str, Any]) -> str:
+    """`question: answer` lines, each answer clipped, empty answers skipped, all within the budget."""
+    lines = [
+        f"{clip(question, 'answer')}: {clip(answer, 'answer')}"
+        for question, answer in (qa or {}).items()
+        if str(answer or "").strip()
+    ]
+    return "\n".join(_fit(dedupe(lines), budget("answers"), "\n"))
+
+
+def finalize(name: str, prompt: str) -> str:
+    """Strip the finished prompt and record its size under `name`."""
+    prompt = prompt.strip()
+    tokens = count_tokens(prompt)
+    metrics_service.PROMPT_TOKENS.labels(name).observe(tokens)
+    logger.info(f"Built {name} prompt", extra={"fields": {"prompt": name, "tokens": tokens}})
+    return prompt
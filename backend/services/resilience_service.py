@@ -0,0 +1,303 @@
+import os
+import time
+import random
+import asyncio
+import contextlib
+import contextvars
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+import httpx
+from dotenv import load_dotenv
+from services import scheduler_service, metrics_service, log_service
+
+load_dotenv()
+logger = log_service.get_logger("resilience")
+
+# Whole-request budget for inbound API calls; upstream timeouts and retries are
+# clipped to whatever is left of it.
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "180"))
+
+# Statuses worth another attempt. 429 and 503 usually come with Retry-After.
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# Statuses that say the provider (not our request) is unhealthy.
+BREAKER_STATUSES = {500, 502, 503, 504}
+
+
+class ProviderPolicy:
+    """Timeouts, retry and circuit-breaker settings for one upstream provider.
+
+    Every setting can be overridden with RESILIENCE_<PROVIDER>_<SETTING>, e.g.
+    RESILIENCE_PERPLEXITY_MAX_ATTEMPTS=5.
+    """
+
+    def __init__(self, name: str, connect_timeout: float, read_timeout: float, max_attempts: int = 3,
+                 base_delay: float = 0.5, max_delay: float = 8.0, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        def setting(key, default, cast=float):
+            return cast(os.getenv(f"RESILIENCE_{name.upper()}_{key}", default))
+
+        self.name = name
+        self.connect_timeout = setting("CONNECT_TIMEOUT", connect_timeout)
+        self.read_timeout = setting("READ_TIMEOUT", read_timeout)
+        self.max_attempts = setting("MAX_ATTEMPTS", max_attempts, int)
+        self.base_delay = setting("BASE_DELAY", base_delay)
+        self.max_delay = setting("MAX_DELAY", max_delay)
+        self.failure_threshold = setting("FAILURE_THRESHOLD", failure_threshold, int)
+        self.reset_timeout = setting("RESET_TIMEOUT", reset_timeout)
+
+
+POLICIES = {
+    "perplexity": ProviderPolicy(
+        "perplexity",
+        connect_timeout=float(os.getenv("PERPLEXITY_CONNECT_TIMEOUT", "5")),
+        read_timeout=float(os.getenv("PERPLEXITY_READ_TIMEOUT", "90")),
+    ),
+    # Renders are billed per call, so be more careful about repeating them.
+    "stability": ProviderPolicy(
+        "stability",
+        connect_timeout=float(os.getenv("STABILITY_CONNECT_TIMEOUT", "5")),
+        read_timeout=float(os.getenv("STABILITY_READ_TIMEOUT", "60")),
+        max_attempts=2,
+    ),
+    "dataforseo": ProviderPolicy("dataforseo", connect_timeout=5, read_timeout=30),
+    "gemini": ProviderPolicy("gemini", connect_timeout=5, read_timeout=60),
+    "similarweb": ProviderPolicy("similarweb", connect_timeout=5, read_timeout=20),
+}
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"{provider} is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` one probe call is let through (half-open), and its outcome
+    closes or re-opens the circuit."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and self.retry_in() == 0:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def release(self):
+        """The call was abandoned (e.g. cancelled) without telling us anything about the provider."""
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+_breakers = {}
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    if provider not in _breakers:
+        policy = POLICIES[provider]
+        _breakers[provider] = CircuitBreaker(policy.failure_threshold, policy.reset_timeout)
+    return _breakers[provider]
+
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+def set_deadline(seconds: Optional[float]):
+    """Give the current task (and tasks it spawns) `seconds` to finish; None clears it."""
+    return _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+
+
+def remaining() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def timeout_for(policy: ProviderPolicy) -> httpx.Timeout:
+    read = policy.read_timeout
+    left = remaining()
+    if left is not None:
+        if left <= 0:
+            raise DeadlineExceeded(f"Request deadline exceeded before calling {policy.name}")
+        read = min(read, left)
+    return httpx.Timeout(read, connect=min(policy.connect_timeout, read))
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(policy: ProviderPolicy, attempt: int) -> float:
+    # "Full jitter": spreads retries from many callers instead of synchronising them.
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * 2 ** attempt))
+
+
+async def request(provider: str, send: Callable[[httpx.Timeout], Awaitable[httpx.Response]], tokens: float = 0) -> httpx.Response:
+    """Run `send(timeout)` under the provider's rate limit, retry, backoff and circuit-breaker policy.
+
+    `send` must issue a fresh request each time it is called. Every attempt
+    first waits for a slot from scheduler_service (`tokens` is the estimated
+    token cost). The last response is returned even if its status is an error
+    (callers map it to their own exception); transport errors are re-raised
+    after the final attempt. For streamed responses, only failures before the
+    body is read are retried.
+    """
+    policy = POLICIES[provider]
+    breaker = get_breaker(provider)
+    scheduler = scheduler_service.get_scheduler(provider)
+
+    for attempt in range(policy.max_attempts):
+        # Checked first so a rejected call doesn't spend a rate-limit token.
+        if not breaker.allow():
+            raise CircuitOpenError(provider, breaker.retry_in())
+        try:
+            try:
+                await scheduler.acquire(tokens, scheduler_service.current_priority(), timeout=remaining())
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"Request deadline exceeded waiting for a {provider} rate-limit slot")
+            timeout = timeout_for(policy)
+        except BaseException:
+            # Nothing was sent; if this was the half-open probe, let another call probe.
+            breaker.release()
+            raise
+        last_attempt = attempt == policy.max_attempts - 1
+
+        started = time.perf_counter()
+        try:
+            response = await send(timeout)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            metrics_service.UPSTREAM_LATENCY.labels(provider, type(e).__name__).observe(time.perf_counter() - started)
+            if not isinstance(e, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)):
+                # Not a sign of provider health either way (e.g. a bug in `send`).
+                breaker.release()
+                raise
+            breaker.record_failure()
+            logger.warning(f"{provider} attempt {attempt + 1}/{policy.max_attempts} failed: {type(e).__name__}")
+            if last_attempt:
+                raise
+            delay = backoff_delay(policy, attempt)
+        else:
+            metrics_service.UPSTREAM_LATENCY.labels(provider, str(response.status_code)).observe(time.perf_counter() - started)
+            if response.status_code not in RETRY_STATUSES:
+                breaker.record_success()
+                return response
+            if response.status_code in BREAKER_STATUSES:
+                breaker.record_failure()
+            else:
+                # Rate limited: the provider is up, just busy.
+                breaker.record_success()
+            logger.warning(f"{provider} attempt {attempt + 1}/{policy.max_attempts} returned {response.status_code}")
+            if last_attempt:
+                return response
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = backoff_delay(policy, attempt)
+            if response.status_code == 429:
+                # Everyone sharing the key backs off, not just this caller.
+                await scheduler.pause(delay)
+            await response.aclose()
+
+        left = remaining()
+        if left is not None and delay >= left:
+            raise DeadlineExceeded(f"Request deadline exceeded while retrying {provider}")
+        await asyncio.sleep(delay)
+
+
+_in_flight = 0
+
+
+@contextlib.asynccontextmanager
+async def track(provider: str):
+    """Mark an upstream call (including reading its streamed body) as in flight, for drain()."""
+    global _in_flight
+    _in_flight += 1
+    gauge = metrics_service.UPSTREAM_IN_FLIGHT.labels(provider)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        _in_flight -= 1
+        gauge.dec()
+
+
+async def drain(timeout: float) -> int:
+    """Wait up to `timeout` seconds for in-flight upstream calls; returns how many are left."""
+    deadline = time.monotonic() + timeout
+    while _in_flight and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    return _in_flight
+
+
+class DeadlineMiddleware:
+    """ASGI middleware giving every HTTP request a REQUEST_DEADLINE_SECONDS budget.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed responses keep running
+    in the same context (and under the same deadline).
+    """
+
+    def __init__(self, app, seconds: float = REQUEST_DEADLINE_SECONDS):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = set_deadline(self.seconds)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+
+
+def stats() -> dict:
+    return {
+        name: {"state": breaker.state, "failures": breaker.failures, "retryIn": round(breaker.retry_in(), 1)}
+        for name, breaker in _breakers.items()
+    }
@@ -0,0 +1,206 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import contextvars
+from typing import Optional
+from dotenv import load_dotenv
+from services import shared_state_service, prompt_service, metrics_service
+
+load_dotenv()
+
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BACKGROUND: "background"}
+
+# Quotas per provider key. RATE_LIMIT_<PROVIDER>_RPM / _TPM; 0 means unlimited.
+DEFAULT_LIMITS = {
+    "perplexity": {"rpm": 50, "tpm": 0},
+    "stability": {"rpm": 150, "tpm": 0},
+    "dataforseo": {"rpm": 2000, "tpm": 0},
+    "gemini": {"rpm": 1000, "tpm": 0},
+    "similarweb": {"rpm": 600, "tpm": 0},
+}
+
+
+class Bucket:
+    """`per_minute` units per minute with bursts of at most `burst`, kept in the
+    shared state backend so every worker process draws from the same quota.
+
+    The refill rate is `per_minute - burst`, so no 60-second window can see more
+    than `per_minute` units even if it starts with a full bucket.
+    """
+
+    def __init__(self, key: str, per_minute: float, burst: float):
+        self.key = key
+        self.capacity = burst
+        self.rate = max(per_minute - burst, 1) / 60.0
+
+    async def take(self, amount: float) -> float:
+        """Take `amount` and return 0, or return the seconds until it is available."""
+        return await shared_state_service.get_state().bucket(
+            self.key, self.capacity, self.rate, shared_state_service.TAKE, min(amount, self.capacity)
+        )
+
+    async def adjust(self, amount: float):
+        await shared_state_service.get_state().bucket(self.key, self.capacity, self.rate, shared_state_service.ADJUST, amount)
+
+    async def hold(self, seconds: float):
+        await shared_state_service.get_state().bucket(self.key, self.capacity, self.rate, shared_state_service.HOLD, seconds)
+
+
+class ProviderScheduler:
+    """Admits outbound calls for one provider key within its request and token quotas.
+
+    Calls that can't go out yet wait in a priority queue, FIFO within a priority,
+    so interactive calls overtake background ones but nobody is reordered
+    within a class.
+    """
+
+    def __init__(self, name: str, rpm: float, tpm: float = 0):
+        self.name = name
+        self.requests = Bucket(f"{name}:requests", rpm, max(1, rpm // 10)) if rpm else None
+        self.tokens = Bucket(f"{name}:tokens", tpm, max(1, tpm // 10)) if tpm else None
+        self.paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self._dispatcher = None
+        self.waited = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def _try_take(self, tokens: float) -> float:
+        """Take a slot for a call costing `tokens` and return 0, or return how long to wait."""
+        wait = self.paused_until - time.monotonic()
+        if wait > 0:
+            return wait
+        if self.requests:
+            wait = await self.requests.take(1)
+            if wait:
+                return wait
+        if self.tokens and tokens:
+            wait = await self.tokens.take(tokens)
+            if wait:
+                if self.requests:
+                    await self.requests.adjust(-1)
+                return wait
+        return 0.0
+
+    async def _give_back(self, tokens: float):
+        if self.requests:
+            await self.requests.adjust(-1)
+        if self.tokens and tokens:
+            await self.tokens.adjust(-min(tokens, self.tokens.capacity))
+
+    async def acquire(self, tokens: float = 0, priority: int = NORMAL, timeout: Optional[float] = None):
+        """Wait for a slot. Raises asyncio.TimeoutError if none frees up within `timeout`."""
+        if not self._waiters and await self._try_take(tokens) == 0:
+            return
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), tokens, future))
+        depth = metrics_service.SCHEDULER_QUEUE_DEPTH.labels(self.name, PRIORITY_NAMES[priority])
+        depth.inc()
+        self._changed.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        finally:
+            # Granted or given up: either way the call no longer waits in the queue.
+            depth.dec()
+            waited = time.monotonic() - started
+            metrics_service.SCHEDULER_WAIT.labels(self.name, PRIORITY_NAMES[priority]).observe(waited)
+            self.waited += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    async def _dispatch(self):
+        while self._waiters:
+            priority, seq, tokens, future = self._waiters[0]
+            if future.done():
+                # The caller gave up (timeout or cancellation).
+                heapq.heappop(self._waiters)
+                continue
+            wait = await self._try_take(tokens)
+            if wait == 0:
+                heapq.heappop(self._waiters)
+                if future.done():
+                    # Gave up while we were taking the slot for it.
+                    await self._give_back(tokens)
+                else:
+                    future.set_result(None)
+                continue
+            # Sleep until the head can go, or until a new (maybe higher priority) waiter arrives.
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def settle(self, estimated_tokens: float, actual_tokens: float):
+        if self.tokens:
+            await self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    async def pause(self, seconds: float):
+        """Hold every call back for `seconds`, e.g. after the provider answered 429 with Retry-After.
+
+        With a request quota the shared bucket is emptied, which pauses every worker.
+        """
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        if self.requests:
+            await self.requests.hold(seconds)
+
+    def stats(self) -> dict:
+        queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                queued[PRIORITY_NAMES[priority]] += 1
+        return {
+            "queued": queued,
+            "waited": self.waited,
+            "waitSeconds": round(self.wait_seconds, 3),
+            "maxWaitSeconds": round(self.max_wait_seconds, 3),
+            "pausedFor": round(max(0.0, self.paused_until - time.monotonic()), 1),
+        }
+
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("call_priority", default=NORMAL)
+
+
+def set_priority(priority: int):
+    """Priority for outbound calls made by the current task and the tasks it spawns."""
+    return _priority.set(priority)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+_schedulers = {}
+
+
+def get_scheduler(provider: str) -> ProviderScheduler:
+    if provider not in _schedulers:
+        limits = DEFAULT_LIMITS.get(provider, {"rpm": 0, "tpm": 0})
+        rpm = float(os.getenv(f"RATE_LIMIT_{provider.upper()}_RPM", limits["rpm"]))
+        tpm = float(os.getenv(f"RATE_LIMIT_{provider.upper()}_TPM", limits["tpm"]))
+        _schedulers[provider] = ProviderScheduler(provider, rpm, tpm)
+    return _schedulers[provider]
+
+
+async def acquire(provider: str, tokens: float = 0, timeout: Optional[float] = None):
+    await get_scheduler(provider).acquire(tokens, current_priority(), timeout)
+
+
+def estimate_tokens(text: str, expected_completion: int = 0) -> int:
+    return prompt_service.count_tokens(text) + expected_completion
+
+
+def stats() -> dict:
+    return {name: scheduler.stats() for name, scheduler in _schedulers.items()}
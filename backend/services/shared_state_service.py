@@ -0,0 +1,233 @@
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+from services import log_service
+
+load_dotenv()
+logger = log_service.get_logger("shared_state")
+
+# "local" keeps state in this process (single worker / development). With
+# several workers use "sqlite" (same host) or "redis" (several hosts) so rate
+# limits and counters are shared instead of multiplied by the worker count.
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "local")
+SHARED_STATE_SQLITE_PATH = os.getenv("SHARED_STATE_SQLITE_PATH", "shared_state.sqlite3")
+SHARED_STATE_REDIS_URL = os.getenv("SHARED_STATE_REDIS_URL", "redis://localhost:6379/1")
+FLUSH_SECONDS = float(os.getenv("SHARED_STATE_FLUSH_SECONDS", "2"))
+
+TAKE = "take"
+ADJUST = "adjust"
+HOLD = "hold"
+
+
+def bucket_step(level: Optional[float], updated: Optional[float], now: float, capacity: float, rate: float,
+                op: str, amount: float) -> Tuple[float, float]:
+    """One token-bucket operation. Returns (new level, seconds to wait).
+
+    take:   remove `amount` if available, otherwise report how long until it is
+    adjust: remove `amount` unconditionally (negative refunds), may go below zero
+    hold:   empty the bucket so nothing is available for `amount` seconds
+    """
+    if level is None:
+        level = capacity
+    else:
+        level = min(capacity, level + max(0.0, now - updated) * rate)
+
+    wait = 0.0
+    if op == TAKE:
+        if level >= amount:
+            level -= amount
+        else:
+            wait = (amount - level) / rate
+    elif op == ADJUST:
+        level = min(capacity, level - amount)
+    elif op == HOLD:
+        level = min(level, -amount * rate)
+    return level, wait
+
+
+class LocalState:
+    def __init__(self):
+        self._buckets = {}
+        self._counters = {}
+
+    async def bucket(self, key: str, capacity: float, rate: float, op: str, amount: float) -> float:
+        level, updated = self._buckets.get(key, (None, None))
+        now = time.time()
+        level, wait = bucket_step(level, updated, now, capacity, rate, op, amount)
+        self._buckets[key] = (level, now)
+        return wait
+
+    async def add_counters(self, deltas: dict):
+        for name, amount in deltas.items():
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    async def counters(self) -> dict:
+        return dict(self._counters)
+
+
+class SQLiteState:
+    """State shared by every worker process on one host through a SQLite file.
+
+    Bucket updates run in BEGIN IMMEDIATE transactions, so read-modify-write is
+    atomic across processes.
+    """
+
+    def __init__(self, path: str = SHARED_STATE_SQLITE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def _bucket(self, key, capacity, rate, op, amount) -> float:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT level, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                now = time.time()
+                level, wait = bucket_step(row[0] if row else None, row[1] if row else None, now, capacity, rate, op, amount)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, level, updated) VALUES (?, ?, ?)", (key, level, now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return wait
+
+    async def bucket(self, key: str, capacity: float, rate: float, op: str, amount: float) -> float:
+        return await asyncio.to_thread(self._bucket, key, capacity, rate, op, amount)
+
+    def _add_counters(self, deltas):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO counters (name, value) VALUES (?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    list(deltas.items())
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    async def add_counters(self, deltas: dict):
+        await asyncio.to_thread(self._add_counters, deltas)
+
+    def _counters(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+
+    async def counters(self) -> dict:
+        return await asyncio.to_thread(self._counters)
+
+
+# Same arithmetic as bucket_step, run atomically inside Redis.
+BUCKET_SCRIPT = """
+local capacity, rate, amount, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[4]), tonumber(ARGV[5])
+local op = ARGV[3]
+local state = redis.call('HMGET', KEYS[1], 'level', 'updated')
+local level = capacity
+if state[1] then
+  level = math.min(capacity, tonumber(state[1]) + math.max(0, now - tonumber(state[2])) * rate)
+end
+local wait = 0
+if op == 'take' then
+  if level >= amount then level = level - amount else wait = (amount - level) / rate end
+elseif op == 'adjust' then
+  level = math.min(capacity, level - amount)
+else
+  level = math.min(level, -amount * rate)
+end
+redis.call('HSET', KEYS[1], 'level', tostring(level), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+
+class RedisState:
+    """State shared across hosts. `client` is any async client with eval,
+    hincrbyfloat and hgetall (redis.asyncio, or a stand-in in development)."""
+
+    def __init__(self, client, prefix: str = "vega:state:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def bucket(self, key: str, capacity: float, rate: float, op: str, amount: float) -> float:
+        wait = await self.client.eval(BUCKET_SCRIPT, 1, self.prefix + "bucket:" + key, capacity, rate, op, amount, time.time())
+        return float(wait)
+
+    async def add_counters(self, deltas: dict):
+        for name, amount in deltas.items():
+            await self.client.hincrbyfloat(self.prefix + "counters", name, amount)
+
+    async def counters(self) -> dict:
+        raw = await self.client.hgetall(self.prefix + "counters")
+        return {(k.decode() if isinstance(k, bytes) else k): float(v) for k, v in raw.items()}
+
+
+def _build_state(name: str):
+    if name == "local":
+        return LocalState()
+    if name == "sqlite":
+        return SQLiteState()
+    if name == "redis":
+        import redis.asyncio as redis
+        return RedisState(redis.from_url(SHARED_STATE_REDIS_URL))
+    raise ValueError(f"Unknown SHARED_STATE_BACKEND: {name}")
+
+
+_state = None
+
+
+def get_state():
+    global _state
+    if _state is None:
+        _state = _build_state(SHARED_STATE_BACKEND)
+    return _state
+
+
+def set_state(state):
+    global _state
+    _state = state
+
+
+# Counters are buffered in-process and flushed in batches, so counting a cache
+# hit never costs a round trip to the shared backend.
+_pending = {}
+
+
+def incr(name: str, amount: float = 1):
+    _pending[name] = _pending.get(name, 0) + amount
+
+
+async def flush():
+    global _pending
+    if not _pending:
+        return
+    deltas, _pending = _pending, {}
+    try:
+        await get_state().add_counters(deltas)
+    except Exception as e:
+        logger.warning(f"Shared counter flush failed: {e}")
+        for name, amount in deltas.items():
+            incr(name, amount)
+
+
+async def counters(prefix: str = "") -> dict:
+    """Counters summed over every worker, with `prefix` stripped from the names."""
+    await flush()
+    values = await get_state().counters()
+    return {name[len(prefix):]: value for name, value in values.items() if name.startswith(prefix)}
+
+
+async def flush_periodically():
+    while True:
+        await asyncio.sleep(FLUSH_SECONDS)
+        await flush()
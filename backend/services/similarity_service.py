@@ -0,0 +1,262 @@
+"""Near-duplicate lookup over past generations (MinHash signatures + LSH banding).
+
+Inputs are reduced to a set of features (words and word pairs of the
+description plus one token per list item, so goal order doesn't matter), hashed into a MinHash
+signature, and stored with the generated output in SQLite. A lookup only
+compares signatures that share at least one LSH band with the query, then
+estimates Jaccard similarity from the signatures and returns the closest prior
+generation above the namespace's threshold.
+
+Entries are scoped by namespace (the kind of generation) and partition (inputs
+that must match exactly, e.g. platform or city); both are the caller's choice.
+"""
+import os
+import re
+import time
+import zlib
+import json
+import asyncio
+import sqlite3
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+import numpy as np
+from dotenv import load_dotenv
+from services import shared_state_service, metrics_service, log_service
+
+load_dotenv()
+logger = log_service.get_logger("similarity")
+
+SIMILARITY_ENABLED = os.getenv("SIMILARITY_ENABLED", "true").lower() == "true"
+SIMILARITY_SQLITE_PATH = os.getenv("SIMILARITY_SQLITE_PATH", "similarity.sqlite3")
+# Estimated Jaccard similarity a prior generation needs to be reused;
+# SIMILARITY_THRESHOLD_<NAMESPACE> overrides it per namespace.
+SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.8"))
+SIMILARITY_TTL_DAYS = float(os.getenv("SIMILARITY_TTL_DAYS", "30"))
+# 16 bands of 8 rows: pairs above ~0.7 similarity almost always share a band,
+# pairs below ~0.5 rarely do. Changing these invalidates stored signatures.
+BANDS = int(os.getenv("SIMILARITY_BANDS", "16"))
+ROWS = int(os.getenv("SIMILARITY_ROWS", "8"))
+NUM_PERM = BANDS * ROWS
+# Words and word pairs: business descriptions are short, so longer shingles
+# make a one-word edit look like a different business.
+SHINGLE_SIZES = (1, 2)
+# Most candidates compared per lookup (newest first).
+MAX_CANDIDATES = 200
+
+# Universal hashing (a * x + b) mod P over 32-bit feature hashes; with a < 2^31
+# every product fits in uint64. Fixed seed: signatures must agree across processes.
+PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, int(PRIME), NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, int(PRIME), NUM_PERM, dtype=np.uint64)
+
+WORD = re.compile(r"\w+")
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS similarity_entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        namespace TEXT NOT NULL,
+        partition TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        signature BLOB NOT NULL,
+        output TEXT NOT NULL,
+        generation_seconds REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS similarity_buckets (
+        namespace TEXT NOT NULL,
+        partition TEXT NOT NULL,
+        band INTEGER NOT NULL,
+        hash INTEGER NOT NULL,
+        entry_id INTEGER NOT NULL REFERENCES similarity_entries (id) ON DELETE CASCADE,
+        PRIMARY KEY (namespace, partition, band, hash, entry_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS similarity_entries_created ON similarity_entries (created_at)",
+    "CREATE INDEX IF NOT EXISTS similarity_buckets_entry ON similarity_buckets (entry_id)",
+]
+
+
+def threshold(namespace: str) -> float:
+    return float(os.getenv(f"SIMILARITY_THRESHOLD_{namespace.upper()}", SIMILARITY_THRESHOLD))
+
+
+def _words(text: Any) -> list:
+    return WORD.findall(str(text or "").lower())
+
+
+def features(text: Any = "", **fields: Any) -> Set[str]:
+    """Feature set for MinHash: word shingles of `text`, plus one `name:value`
+    token per field value (list fields contribute one token per item)."""
+    words = _words(text)
+    result = {" ".join(words[i:i + size]) for size in SHINGLE_SIZES for i in range(len(words) - size + 1)}
+    for name, value in fields.items():
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        for item in values:
+            item = " ".join(_words(item))
+            if item:
+                result.add(f"{name}:{item}")
+    return result
+
+
+def partition_key(*parts: Any) -> str:
+    return "|".join(" ".join(_words(part)) for part in parts)
+
+
+def signature(feature_set: Iterable[str]) -> np.ndarray:
+    hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feature_set), dtype=np.uint64)
+    if hashes.size == 0:
+        return np.full(NUM_PERM, int(PRIME), dtype=np.uint32)
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_hashes(sig: np.ndarray) -> list:
+    return [(band, zlib.crc32(sig[band * ROWS:(band + 1) * ROWS].tobytes())) for band in range(BANDS)]
+
+
+class SimilarityIndex:
+    """MinHash/LSH index in SQLite, shared by every worker on the host."""
+
+    def __init__(self, path: str = SIMILARITY_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._pruned_at = 0.0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _find(self, namespace: str, partition: str, sig: np.ndarray, min_similarity: float) -> Optional[dict]:
+        bands = band_hashes(sig)
+        conn = self._conn()
+        rows = conn.execute(
+            f"""SELECT e.id, e.signature, e.output, e.generation_seconds FROM similarity_entries e
+                WHERE e.created_at >= ? AND e.id IN (
+                    SELECT entry_id FROM similarity_buckets
+                    WHERE namespace = ? AND partition = ? AND (band, hash) IN (VALUES {", ".join(["(?, ?)"] * len(bands))})
+                )
+                ORDER BY e.id DESC LIMIT ?""",
+            (time.time() - SIMILARITY_TTL_DAYS * 86400, namespace, partition,
+             *[v for pair in bands for v in pair], MAX_CANDIDATES)
+        ).fetchall()
+        rows = [row for row in rows if len(row[1]) == NUM_PERM * 4]
+        if not rows:
+            return None
+        candidates = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.uint32).reshape(len(rows), NUM_PERM)
+        similarities = (candidates == sig).mean(axis=1)
+        best = int(similarities.argmax())
+        if similarities[best] < min_similarity:
+            return None
+        entry_id, _, output, seconds = rows[best]
+        return {"id": entry_id, "similarity": round(float(similarities[best]), 3),
+                "output": json.loads(output), "generationSeconds": seconds}
+
+    def _add(self, namespace: str, partition: str, sig: np.ndarray, output: Any, seconds: float):
+        now = time.time()
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                cursor = conn.execute(
+                    """INSERT INTO similarity_entries (namespace, partition, created_at, signature, output, generation_seconds)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (namespace, partition, now, sig.tobytes(), json.dumps(output), seconds)
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO similarity_buckets (namespace, partition, band, hash, entry_id) VALUES (?, ?, ?, ?, ?)",
+                    [(namespace, partition, band, value, cursor.lastrowid) for band, value in band_hashes(sig)]
+                )
+                if now - self._pruned_at > 3600:
+                    self._pruned_at = now
+                    conn.execute("DELETE FROM similarity_entries WHERE created_at < ?", (now - SIMILARITY_TTL_DAYS * 86400,))
+
+    async def find(self, namespace: str, partition: str, feature_set: Set[str]) -> Optional[dict]:
+        sig = signature(feature_set)
+        return await asyncio.to_thread(self._find, namespace, partition, sig, threshold(namespace))
+
+    async def add(self, namespace: str, partition: str, feature_set: Set[str], output: Any, seconds: float):
+        await asyncio.to_thread(self._add, namespace, partition, signature(feature_set), output, seconds)
+
+
+_index = None
+
+
+def get_index() -> Optional[SimilarityIndex]:
+    """The process-wide index, or None when SIMILARITY_ENABLED is false."""
+    global _index
+    if not SIMILARITY_ENABLED:
+        return None
+    if _index is None:
+        _index = SimilarityIndex()
+    return _index
+
+
+async def find(namespace: str, partition: str, feature_set: Set[str]) -> Optional[dict]:
+    """Closest prior generation above the namespace threshold, recorded as a hit or miss.
+    Lookup errors count as misses: the index must never fail a request."""
+    index = get_index()
+    if index is None:
+        return None
+    try:
+        match = await index.find(namespace, partition, feature_set)
+    except Exception as e:
+        logger.warning(f"Similarity lookup failed: {e}")
+        match = None
+    shared_state_service.incr(f"similarity.{'hits' if match else 'misses'}.{namespace}")
+    metrics_service.SIMILARITY_LOOKUPS.labels(namespace, "hit" if match else "miss").inc()
+    if match:
+        logger.info(f"Similar {namespace} generation found", extra={"fields": {
+            "entry": match["id"], "similarity": match["similarity"]}})
+    return match
+
+
+async def add(namespace: str, partition: str, feature_set: Set[str], output: Any, seconds: float):
+    index = get_index()
+    if index is None:
+        return
+    try:
+        await index.add(namespace, partition, feature_set, output, seconds)
+    except Exception as e:
+        logger.warning(f"Similarity index write failed: {e}")
+
+
+def record_saving(namespace: str, seconds: float):
+    """Generation time avoided (or, when negative, added) by reusing a match."""
+    shared_state_service.incr(f"similarity.saved_seconds.{namespace}", seconds)
+    metrics_service.SIMILARITY_SAVED_SECONDS.labels(namespace).inc(max(0.0, seconds))
+
+
+async def reuse_or_generate(namespace: str, partition: str, feature_set: Set[str],
+                            generate: Callable[[], Awaitable[Any]]) -> Any:
+    """The closest prior generation's output if there is one, else `generate()`'s,
+    which is then indexed for later lookups."""
+    match = await find(namespace, partition, feature_set)
+    if match:
+        record_saving(namespace, match["generationSeconds"])
+        return match["output"]
+    started = time.perf_counter()
+    output = await generate()
+    await add(namespace, partition, feature_set, output, time.perf_counter() - started)
+    return output
+
+
+async def stats() -> Dict[str, dict]:
+    """Hits, misses and seconds saved per namespace, summed over every worker process."""
+    hits = await shared_state_service.counters("similarity.hits.")
+    misses = await shared_state_service.counters("similarity.misses.")
+    saved = await shared_state_service.counters("similarity.saved_seconds.")
+    result = {}
+    for ns in sorted(set(hits) | set(misses)):
+        h = int(hits.get(ns, 0))
+        m = int(misses.get(ns, 0))
+        result[ns] = {"hits": h, "misses": m, "hitRatio": round(h / (h + m), 4) if h + m else 0.0,
+                      "savedSeconds": round(saved.get(ns, 0.0), 1)}
+    return result
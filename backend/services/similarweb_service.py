@@ -0,0 +1,107 @@
+import os
+import asyncio
+import datetime
+import httpx
+from typing import Optional
+from dotenv import load_dotenv
+from services import resilience_service, log_service
+
+load_dotenv()
+logger = log_service.get_logger("similarweb")
+
+SIMILARWEB_API_URL = os.getenv("SIMILARWEB_API_URL", "https://api.similarweb.com").rstrip("/")
+# Full months of visits to fetch; the latest one is reported as monthly traffic.
+MONTHS = int(os.getenv("SIMILARWEB_MONTHS", "3"))
+
+# Per-call timeouts and retries come from the "similarweb" policy in resilience_service.
+MAX_CONNECTIONS = int(os.getenv("SIMILARWEB_MAX_CONNECTIONS", "20"))
+
+_client = None
+
+
+class SimilarwebError(Exception):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(text)
+        self.status_code = status_code
+        self.text = text
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(None),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def configured() -> bool:
+    return bool(os.getenv("SIMILARWEB_API_KEY"))
+
+
+def _month_range(today: Optional[datetime.date] = None):
+    """First and last of the last MONTHS complete months, as YYYY-MM."""
+    today = today or datetime.date.today()
+    end = today.replace(day=1) - datetime.timedelta(days=1)
+    start_month = end.year * 12 + end.month - 1 - (MONTHS - 1)
+    return f"{start_month // 12}-{start_month % 12 + 1:02d}", f"{end.year}-{end.month:02d}"
+
+
+async def _get(path: str, params: dict) -> Optional[dict]:
+    """GET a v1 endpoint; None when Similarweb has no data for the domain."""
+    params = {**params, "api_key": os.getenv("SIMILARWEB_API_KEY", ""), "format": "json"}
+    client = get_client()
+    async with resilience_service.track("similarweb"):
+        response = await resilience_service.request(
+            "similarweb",
+            lambda timeout: client.get(f"{SIMILARWEB_API_URL}{path}", params=params, timeout=timeout)
+        )
+    # Unknown or too-small sites come back as 404, or 400 "Data not found";
+    # any other 4xx (bad key, quota, bad request) is an error.
+    if response.status_code == 404 or (response.status_code == 400 and "Data not found" in response.text):
+        return None
+    if response.status_code != 200:
+        raise SimilarwebError(response.status_code, response.text)
+    return response.json()
+
+
+async def fetch_traffic(domain: str) -> Optional[dict]:
+    """Monthly visits (worldwide, all subdomains) and global rank for `domain`,
+    or None if Similarweb doesn't track it. The rank is None when its call
+    fails; a failed visits call raises."""
+    start, end = _month_range()
+    visits, rank = await asyncio.gather(
+        _get(f"/v1/website/{domain}/total-traffic-and-engagement/visits", {
+            "start_date": start, "end_date": end, "country": "world",
+            "granularity": "monthly", "main_domain_only": "false",
+        }),
+        _get(f"/v1/similar-rank/{domain}/rank", {}),
+        return_exceptions=True,
+    )
+    if isinstance(visits, BaseException):
+        raise visits
+    if isinstance(rank, Exception):
+        logger.warning(f"Rank lookup failed for {domain}: {rank}")
+        rank = None
+    elif isinstance(rank, BaseException):
+        raise rank
+    months = [
+        {"month": entry["date"][:7], "visits": round(entry["visits"])}
+        for entry in (visits or {}).get("visits", [])
+        if entry.get("visits") is not None
+    ]
+    if not months:
+        return None
+    return {
+        "monthlyVisits": months[-1]["visits"],
+        "visitsByMonth": months,
+        "globalRank": ((rank or {}).get("similar_rank") or {}).get("rank"),
+    }
@@ -0,0 +1,43 @@
+import asyncio
+from services import shared_state_service
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key onto one in-flight upstream call.
+
+    Unlike the LLM cache this only de-duplicates work that is still running: once
+    the shared call finishes, the next caller with the same key starts a new one.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key: str, fn, namespace: str = "default"):
+        task = self._inflight.get(key)
+        if task is not None:
+            shared_state_service.incr(f"singleflight.deduplicated.{namespace}")
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller disconnecting does not cancel the call for everyone else.
+        return await asyncio.shield(task)
+
+    async def stats(self) -> dict:
+        deduplicated = await shared_state_service.counters("singleflight.deduplicated.")
+        return {
+            # In-flight calls are per process; the counts are summed over all workers.
+            "inFlight": len(self._inflight),
+            "deduplicated": {ns: int(count) for ns, count in deduplicated.items()},
+        }
+
+
+_group = SingleFlight()
+
+
+def get_group() -> SingleFlight:
+    return _group
+
+
+async def stats() -> dict:
+    return await _group.stats()
@@ -0,0 +1,73 @@
+import os
+import httpx
+from dotenv import load_dotenv
+from services import resilience_service
+
+load_dotenv()
+
+STABILITY_URL = os.getenv("STABILITY_API_URL", "https://api.stability.ai/v2beta/stable-image/generate/core")
+STABILITY_MODEL = os.getenv("STABILITY_MODEL", "stable-diffusion-xl-1024-v1-0")
+
+# Per-call timeouts and retries come from the "stability" policy in resilience_service.
+MAX_CONNECTIONS = int(os.getenv("STABILITY_MAX_CONNECTIONS", "20"))
+
+_client = None
+
+
+class StabilityError(Exception):
+    def __init__(self, status_code: int, text: str):
+        super().__init__(text)
+        self.status_code = status_code
+        self.text = text
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(None),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def stream_image(prompt: str, output_format: str = "png", aspect_ratio: str = "1:1"):
+    """Run a `generate/core` request and yield the raw image bytes as they arrive.
+
+    Asking for `image/*` instead of JSON skips the base64 round trip (about a
+    third smaller on the wire and never decoded in memory).
+    """
+    headers = {
+        "Authorization": f"Bearer {os.getenv('STABILITY_API_KEY')}",
+        "Accept": "image/*"
+    }
+    files = {
+        'prompt': (None, prompt.strip()),
+        'model': (None, STABILITY_MODEL),
+        'output_format': (None, output_format),
+        'aspect_ratio': (None, aspect_ratio)
+    }
+
+    client = get_client()
+    async with resilience_service.track("stability"):
+        response = await resilience_service.request(
+            "stability",
+            lambda timeout: client.send(
+                client.build_request("POST", STABILITY_URL, headers=headers, files=files, timeout=timeout), stream=True
+            )
+        )
+        try:
+            if response.status_code != 200:
+                text = (await response.aread()).decode("utf-8", "replace")
+                raise StabilityError(response.status_code, text)
+            async for chunk in response.aiter_bytes():
+                yield chunk
+        finally:
+            await response.aclose()
@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import sys
+import types
+
+import pytest
+
+from services import asset_store_service
+
+
+class FakeS3:
+    """Stand-in for the boto3 client methods S3AssetStore uses."""
+
+    def __init__(self):
+        self.objects = {}
+        self.read_sizes = []
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        parts = []
+        while True:
+            part = fileobj.read(1024 * 1024)
+            if not part:
+                break
+            self.read_sizes.append(len(part))
+            parts.append(part)
+        self.objects[(bucket, key)] = (b"".join(parts), (ExtraArgs or {}).get("ContentType"))
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[(Bucket, Key)][0])}
+
+
+class ClientError(Exception):
+    """Same shape as botocore.exceptions.ClientError."""
+
+    def __init__(self, error_response, operation_name):
+        super().__init__(f"{operation_name}: {error_response['Error']['Code']}")
+        self.response = error_response
+
+
+@pytest.fixture
+def botocore(monkeypatch):
+    """botocore.exceptions with the ClientError above, so these tests run without boto3."""
+    exceptions = types.ModuleType("botocore.exceptions")
+    exceptions.ClientError = ClientError
+    monkeypatch.setitem(sys.modules, "botocore", types.ModuleType("botocore"))
+    monkeypatch.setitem(sys.modules, "botocore.exceptions", exceptions)
+
+
+def test_s3_put_stream_uploads_the_spool_in_parts():
+    client = FakeS3()
+    store = asset_store_service.S3AssetStore(client=client, bucket="assets", prefix="p/")
+    data = bytes(range(256)) * (12 * 1024)  # 3 MB
+
+    async def chunks():
+        for start in range(0, len(data), 64 * 1024):
+            yield data[start:start + 64 * 1024]
+
+    key = asyncio.run(store.put_stream(chunks(), "png"))
+    assert key == f"{hashlib.sha256(data).hexdigest()}.png"
+    assert client.objects[("assets", f"p/{key}")] == (data, "image/png")
+    assert max(client.read_sizes) < len(data)
+
+
+def test_local_put_bytes_round_trip(tmp_path):
+    store = asset_store_service.LocalAssetStore(str(tmp_path))
+
+    async def run():
+        key = await store.put_bytes(b"0123456789", "webp")
+        return key, await store.read(key), b"".join([c async for c in store.iter_range(key, 2, 5)])
+
+    key, data, part = asyncio.run(run())
+    assert asset_store_service.KEY_PATTERN.match(key)
+    assert data == b"0123456789"
+    assert part == b"2345"
+
+
+def test_s3_size_is_none_only_for_missing_objects(botocore):
+    client = FakeS3()
+    store = asset_store_service.S3AssetStore(client=client, bucket="assets", prefix="p/")
+    key = asyncio.run(store.put_bytes(b"0123456789", "png"))
+    assert asyncio.run(store.size(key)) == 10
+    assert asyncio.run(store.size("0" * 64 + ".png")) is None
+
+
+@pytest.mark.parametrize("error", [
+    ClientError({"Error": {"Code": "503", "Message": "Slow Down"}}, "HeadObject"),
+    ClientError({"Error": {"Code": "403", "Message": "Forbidden"}}, "HeadObject"),
+    ConnectionError("connection reset"),
+])
+def test_s3_size_raises_other_errors(botocore, error):
+    client = FakeS3()
+
+    def head_object(Bucket, Key):
+        raise error
+
+    client.head_object = head_object
+    store = asset_store_service.S3AssetStore(client=client, bucket="assets")
+    with pytest.raises(type(error)):
+        asyncio.run(store.size("0" * 64 + ".png"))
@@ -0,0 +1,113 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from services import batch_service
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    store = batch_service.BatchStore(str(tmp_path / "batches.sqlite3"))
+    monkeypatch.setattr(batch_service, "_store", store)
+    return store
+
+
+def statuses(store, batch_id):
+    return [row["status"] for row in asyncio.run(store.rows(batch_id))]
+
+
+def collect(batch_id, process, concurrency=2):
+    async def run():
+        return [outcome async for outcome in batch_service.run(batch_id, process, concurrency)]
+    return asyncio.run(run())
+
+
+def test_resume_skips_done_rows_and_reclaims_pending_and_failed(store):
+    batch_id = asyncio.run(store.create([({"n": n}, None) for n in range(5)] + [(None, "bad row")], {}))
+    asyncio.run(store.finish(batch_id, 0, batch_service.DONE, campaign_id="c0"))
+    asyncio.run(store.finish(batch_id, 2, batch_service.FAILED, error="timeout"))
+    # Claimed moments ago by another worker: not ours to take.
+    assert asyncio.run(store.claim(batch_id, 4))
+    processed = []
+
+    async def process(data):
+        processed.append(data["n"])
+        return f"c{data['n']}", {"n": data["n"]}
+
+    outcomes = collect(batch_id, process)
+    assert sorted(processed) == [1, 2, 3]
+    assert sorted(o["row"] for o in outcomes) == [1, 2, 3]
+    assert all(o["status"] == batch_service.DONE and o["campaignId"] == f"c{o['row']}" for o in outcomes)
+    assert statuses(store, batch_id) == ["done", "done", "done", "done", "running", "invalid"]
+
+    # Nothing left to do: a second resume processes nothing.
+    processed.clear()
+    assert collect(batch_id, process) == []
+    assert processed == []
+
+
+def test_failed_rows_are_recorded_and_retried_on_resume(store):
+    batch_id = asyncio.run(store.create([({"n": n}, None) for n in range(3)], {}))
+    attempts = []
+
+    async def flaky(data):
+        attempts.append(data["n"])
+        if data["n"] == 1 and attempts.count(1) == 1:
+            raise RuntimeError("upstream 503")
+        return f"c{data['n']}", {}
+
+    first = {o["row"]: o for o in collect(batch_id, flaky)}
+    assert first[1] == {"row": 1, "status": "failed", "error": "upstream 503"}
+    assert statuses(store, batch_id) == ["done", "failed", "done"]
+
+    second = collect(batch_id, flaky)
+    assert [(o["row"], o["status"]) for o in second] == [(1, "done")]
+    assert statuses(store, batch_id) == ["done", "done", "done"]
+
+
+
+def test_abandoned_stream_puts_running_rows_back_to_pending(store):
+    batch_id = asyncio.run(store.create([({"n": n}, None) for n in range(4)], {}))
+
+    async def process(data):
+        await asyncio.sleep(0 if data["n"] == 0 else 10)
+        return f"c{data['n']}", {}
+
+    async def run():
+        stream = batch_service.run(batch_id, process, concurrency=2)
+        first = await stream.__anext__()
+        await stream.aclose()
+        # The cancelled workers put their rows back in the background.
+        await asyncio.sleep(0.2)
+        return first
+
+    assert asyncio.run(run())["row"] == 0
+    assert statuses(store, batch_id) == ["done", "pending", "pending", "pending"]
+
+
+def test_store_errors_fail_the_row_and_the_batch_carries_on(store, monkeypatch):
+    batch_id = asyncio.run(store.create([({"n": n}, None) for n in range(4)], {}))
+    claim, finish = store.claim, store.finish
+
+    async def flaky_claim(batch, row):
+        if row == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return await claim(batch, row)
+
+    async def flaky_finish(batch, row, status, **kwargs):
+        if row == 2 and status == batch_service.DONE:
+            raise sqlite3.OperationalError("disk I/O error")
+        return await finish(batch, row, status, **kwargs)
+
+    monkeypatch.setattr(store, "claim", flaky_claim)
+    monkeypatch.setattr(store, "finish", flaky_finish)
+
+    async def process(data):
+        return f"c{data['n']}", {}
+
+    outcomes = {o["row"]: o for o in collect(batch_id, process)}
+    assert sorted(outcomes) == [0, 1, 2, 3]
+    assert outcomes[1] == {"row": 1, "status": "failed", "error": "Batch store error: database is locked"}
+    assert outcomes[2]["status"] == "failed"
+    assert (outcomes[0]["status"], outcomes[3]["status"]) == ("done", "done")
@@ -0,0 +1,60 @@
+"""/recommendation/bulk streams NDJSON that always ends with a `done` line."""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import main
+from routers.strategic_campaign_planner import bulk
+from services import batch_service
+
+ROW = {
+    "businessName": "Lotus Flow Yoga", "businessDescription": "Yoga studio.", "businessGoals": ["Grow"],
+    "demographics": ["25-40"], "interests": ["Wellness"], "location": "Austin, TX", "industry": "Fitness",
+}
+
+
+@pytest.fixture
+def batch_store(monkeypatch, tmp_path):
+    monkeypatch.setenv("PERPLEXITY_API_KEY", "test")
+    store = batch_service.BatchStore(str(tmp_path / "batches.sqlite3"))
+    monkeypatch.setattr(batch_service, "_store", store)
+
+    async def recommend(data, content_mode=None, prefetch=False):
+        return {"campaignId": f"campaign-{data.businessName}"}
+
+    monkeypatch.setattr(bulk, "recommend", recommend)
+    return store
+
+
+def upload(rows) -> list:
+    body = "\n".join(json.dumps(row) for row in rows).encode()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            response = await client.post("/recommendation/bulk", files={"file": ("rows.jsonl", body, "application/x-ndjson")})
+            return [json.loads(line) for line in response.text.splitlines()]
+
+    return asyncio.run(run())
+
+
+def test_rows_then_done(batch_store):
+    lines = upload([ROW, {**ROW, "businessName": "Sun Yoga"}, {"businessName": "Missing fields"}])
+    assert [line["section"] for line in lines] == ["batch", "row", "row", "row", "done"]
+    assert lines[1]["data"]["status"] == "invalid"
+    assert sorted(line["data"]["status"] for line in lines[2:4]) == ["done", "done"]
+    assert lines[-1]["data"]["counts"]["done"] == 2
+
+
+def test_done_is_sent_when_the_batch_run_fails(batch_store, monkeypatch):
+    async def broken_run(batch_id, process, concurrency):
+        yield {"row": 0, "status": "done", "campaignId": "c0"}
+        raise RuntimeError("database disk image is malformed")
+
+    monkeypatch.setattr(batch_service, "run", broken_run)
+    lines = upload([ROW, ROW])
+    assert [line["section"] for line in lines] == ["batch", "row", "error", "done"]
+    assert lines[2]["data"]["detail"] == "database disk image is malformed"
+    assert lines[-1]["data"]["batchId"] == lines[0]["data"]["batchId"]
@@ -0,0 +1,50 @@
+import asyncio
+
+from services import cache_service
+
+
+def test_key_is_stable_and_canonical():
+    key = cache_service.make_key("sonar", "prompt", {"temperature": 0.2, "max_tokens": 100})
+    assert key == cache_service.make_key("sonar", "prompt", {"max_tokens": 100, "temperature": 0.2})
+    assert len(key) == 64
+    assert key != cache_service.make_key("sonar", "prompt", {"temperature": 0.3, "max_tokens": 100})
+    assert key != cache_service.make_key("sonar-pro", "prompt", {"temperature": 0.2, "max_tokens": 100})
+
+
+def test_ttl_is_per_namespace(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_TTL_RECOMMENDATION", "0.05")
+    assert cache_service.ttl_for("questions") == cache_service.DEFAULT_TTLS["questions"]
+    cache = cache_service.LLMCache(cache_service.MemoryBackend())
+
+    async def run():
+        await cache.set("recommendation", "r", {"v": 1})
+        await cache.set("questions", "q", {"v": 2})
+        fresh = await cache.get("recommendation", "r")
+        await asyncio.sleep(0.1)
+        return fresh, await cache.get("recommendation", "r"), await cache.get("questions", "q")
+
+    assert asyncio.run(run()) == ({"v": 1}, None, {"v": 2})
+
+
+def test_memory_backend_evicts_least_recently_used():
+    entry = len("a") + len(b"x" * 10)
+    backend = cache_service.MemoryBackend(max_bytes=3 * entry)
+
+    async def run():
+        for key in "abc":
+            await backend.set(key, b"x" * 10, ttl=60)
+        await backend.get("a")  # "b" is now the least recently used
+        await backend.set("d", b"x" * 10, ttl=60)
+        return {key: await backend.get(key) for key in "abcd"}
+
+    values = asyncio.run(run())
+    assert values["b"] is None
+    assert all(values[key] == b"x" * 10 for key in "acd")
+    assert backend.size == 3 * entry
+
+
+def test_memory_backend_skips_values_larger_than_the_budget():
+    backend = cache_service.MemoryBackend(max_bytes=8)
+    asyncio.run(backend.set("k", b"x" * 16, ttl=60))
+    assert backend.size == 0
+    assert asyncio.run(backend.get("k")) is None
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from services import campaign_store_service
+
+PROFILE = {"businessName": "Lotus Flow Yoga", "location": "Austin, TX"}
+STRATEGY = {"recommendedPlatforms": [{"name": "Instagram"}], "budgetAllocation": {"Instagram": 60}}
+CONTENT = [{"platform": "Instagram", "recommendations": [{"caption": "Sunrise flow"}]}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return campaign_store_service.CampaignStore(str(tmp_path / "campaigns.sqlite3"))
+
+
+def test_campaign_round_trip(store):
+    async def run():
+        campaign_id = await store.create(PROFILE, STRATEGY, CONTENT)
+        await store.save_content(campaign_id, [{"platform": "TikTok", "recommendations": []}])
+        await store.save_script(campaign_id, "Instagram", "Reel", "Scene 1")
+        return campaign_id, await store.get(campaign_id), await store.get_profile(campaign_id), \
+            await store.get_platform_content(campaign_id, "Instagram")
+
+    campaign_id, campaign, profile, content = asyncio.run(run())
+    assert campaign["campaignId"] == campaign_id
+    assert campaign["profile"] == profile == PROFILE
+    assert campaign["recommendedPlatforms"] == STRATEGY["recommendedPlatforms"]
+    assert campaign["budgetAllocation"] == STRATEGY["budgetAllocation"]
+    assert [c["platform"] for c in campaign["contentRecommendation"]] == ["Instagram", "TikTok"]
+    assert content == CONTENT[0]
+    assert [(s["platform"], s["adType"], s["script"]) for s in campaign["scripts"]] == [("Instagram", "Reel", "Scene 1")]
+
+
+def test_unknown_campaign(store):
+    async def run():
+        return await store.get("missing"), await store.get_profile("missing"), \
+            await store.get_platform_content("missing", "Instagram")
+
+    assert asyncio.run(run()) == (None, None, None)
+
+
+def test_wizard_answers_are_looked_up_by_ad_type(store):
+    async def run():
+        campaign_id = await store.create(PROFILE, STRATEGY)
+        await store.save_wizard_answer(campaign_id, "Instagram", "ad_types", {"adTypes": ["Reel", "Story"]})
+        await store.save_wizard_answer(campaign_id, "Instagram", "questions", {"q": ["reel?"]}, ad_type="Reel")
+        await store.save_wizard_answer(campaign_id, "Instagram", "questions", {"q": ["story?"]}, ad_type="Story")
+        # Saving again replaces the answer.
+        await store.save_wizard_answer(campaign_id, "Instagram", "questions", {"q": ["reel, again?"]}, ad_type="Reel")
+        get = store.get_wizard_answer
+        return (
+            await get(campaign_id, "Instagram", "ad_types"),
+            await get(campaign_id, "Instagram", "questions", ad_type="Reel"),
+            await get(campaign_id, "Instagram", "questions", ad_type="Story"),
+            await get(campaign_id, "Instagram", "questions", ad_type="Carousel"),
+            await get(campaign_id, "Instagram", "questions"),
+            await get(campaign_id, "TikTok", "ad_types"),
+        )
+
+    assert asyncio.run(run()) == (
+        {"adTypes": ["Reel", "Story"]}, {"q": ["reel, again?"]}, {"q": ["story?"]}, None, None, None,
+    )
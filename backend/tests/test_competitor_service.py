@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from services import cache_service, competitor_service
+
+
+def test_provider_without_fetch_cannot_be_created():
+    class Incomplete(competitor_service.TrafficProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("value, domain", [
+    ("https://www.Example.com/about?x=1", "example.com"),
+    ("shop.example.co.uk:8080", "shop.example.co.uk"),
+    ("example", None),
+    (None, None),
+])
+def test_normalize_domain(value, domain):
+    assert competitor_service.normalize_domain(value) == domain
+
+
+class CountingProvider(competitor_service.TrafficProvider):
+    name = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def fetch(self, domain):
+        self.calls += 1
+        return {"monthlyVisits": 1234, "visitsByMonth": [], "globalRank": None}
+
+
+def test_traffic_is_cached_with_the_llm_cache_turned_off(monkeypatch):
+    monkeypatch.setattr(cache_service, "CACHE_BACKEND", "none")
+    assert cache_service.get_cache() is None
+    provider = CountingProvider()
+    monkeypatch.setattr(competitor_service, "_provider", provider)
+    monkeypatch.setattr(competitor_service, "_cache", cache_service.LLMCache(cache_service.MemoryBackend()))
+
+    async def run():
+        return [await competitor_service.get_traffic("example.com") for _ in range(3)]
+
+    results = asyncio.run(run())
+    assert provider.calls == 1
+    assert [r["monthlyVisits"] for r in results] == [1234] * 3
+    assert results[0]["source"] == "counting"
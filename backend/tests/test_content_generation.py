@@ -0,0 +1,41 @@
+"""/content/generate-content renders its prompt, JSON example braces included."""
+import asyncio
+import json
+
+import httpx
+
+import main
+from services import perplexity_service
+
+REQUEST = {
+    "businessName": "Lotus Flow Yoga", "businessDescription": "Yoga studio with {curly} classes.",
+    "businessGoals": ["Grow memberships"], "demographics": ["25-40"], "interests": ["Wellness"],
+    "location": "Austin, TX", "industry": "Fitness",
+}
+ANSWER = {"recommendedPlatform": "Instagram", "captions": [{"text": "Flow", "rationale": "r", "hashtags": ["#yoga"]}]}
+
+
+def test_prompt_renders_literal_braces(monkeypatch):
+    prompts = []
+
+    async def chat_content(prompt, **kwargs):
+        prompts.append(prompt)
+        return "```json\n" + json.dumps(ANSWER) + "\n```"
+
+    monkeypatch.setenv("PERPLEXITY_API_KEY", "test")
+    monkeypatch.setattr(perplexity_service, "chat_content", chat_content)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            return await client.post("/content/generate-content", json=REQUEST)
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert response.json() == ANSWER
+
+    prompt = prompts[0]
+    assert '{\n  "recommendedPlatform": "Platform Name",' in prompt
+    assert '"hashtags": ["...", "..."]\n    },' in prompt
+    assert "{{" not in prompt and "}}" not in prompt
+    assert "- Description: Yoga studio with {curly} classes." in prompt
@@ -0,0 +1,70 @@
+"""gemini_service.GenerativeModel's mapping to and from the REST generateContent API."""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from services import gemini_service
+
+
+def generate(monkeypatch, respond, **config):
+    """generate_content("Hello") against `respond(request) -> httpx.Response`; returns (text, requests)."""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return respond(request)
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(gemini_service, "_client", client)
+        model = gemini_service.GenerativeModel("gemini-test", "secret", {"responseMimeType": "application/json"})
+        try:
+            return await model.generate_content("Hello", **config)
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run()), requests
+
+
+def reply(body: dict, status: int = 200):
+    return lambda request: httpx.Response(status, json=body)
+
+
+def test_request_and_text_mapping(monkeypatch):
+    text, requests = generate(monkeypatch, reply({
+        "candidates": [{"content": {"parts": [{"text": '{"keywords": '}, {"text": '["a"]}'}]}, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": 3, "candidatesTokenCount": 5, "totalTokenCount": 8},
+    }), temperature=0.2)
+    assert text == '{"keywords": ["a"]}'
+
+    request = requests[0]
+    assert request.url.path.endswith("/models/gemini-test:generateContent")
+    assert request.headers["x-goog-api-key"] == "secret"
+    assert json.loads(request.content) == {
+        "contents": [{"role": "user", "parts": [{"text": "Hello"}]}],
+        "generationConfig": {"responseMimeType": "application/json", "temperature": 0.2},
+    }
+
+
+def test_blocked_prompt_raises(monkeypatch):
+    with pytest.raises(gemini_service.GeminiError, match="SAFETY"):
+        generate(monkeypatch, reply({"promptFeedback": {"blockReason": "SAFETY"}}))
+
+
+def test_blocked_candidate_raises(monkeypatch):
+    with pytest.raises(gemini_service.GeminiError, match="SAFETY"):
+        generate(monkeypatch, reply({"candidates": [{"finishReason": "SAFETY", "safetyRatings": []}]}))
+
+
+def test_empty_candidates_raise(monkeypatch):
+    with pytest.raises(gemini_service.GeminiError, match="no candidates"):
+        generate(monkeypatch, reply({"candidates": []}))
+
+
+def test_non_200_raises_with_status_and_body(monkeypatch):
+    with pytest.raises(gemini_service.GeminiError) as error:
+        generate(monkeypatch, reply({"error": {"message": "API key not valid"}}, status=400))
+    assert error.value.status_code == 400
+    assert "API key not valid" in error.value.text
@@ -0,0 +1,52 @@
+"""/generate-image-variants renders as few upstream masters as the request allows."""
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from routers.strategic_campaign_planner import ImageGenerator
+from services import asset_store_service
+
+SIZES = {"1:1": (512, 512), "16:9": (768, 432), "9:16": (432, 768)}
+
+
+@pytest.fixture
+def renders(monkeypatch, tmp_path):
+    store = asset_store_service.LocalAssetStore(str(tmp_path))
+    monkeypatch.setattr(asset_store_service, "_store", store)
+    calls = []
+
+    async def render_image(prompt, output_format="png", aspect_ratio="1:1"):
+        calls.append(aspect_ratio)
+        buffer = io.BytesIO()
+        Image.new("RGB", SIZES[aspect_ratio], "teal").save(buffer, "PNG")
+        return await store.put_bytes(buffer.getvalue(), "png")
+
+    monkeypatch.setattr(ImageGenerator, "render_image", render_image)
+    return calls
+
+
+def request(**fields):
+    return ImageGenerator.ImageVariantBatchRequest(
+        campaignData={"businessName": "Lotus Flow Yoga"}, scriptQA={}, script="Sunrise flow.",
+        variants=[{"aspectRatio": "1:1"}, {"aspectRatio": "16:9", "format": "webp"}, {"aspectRatio": "9:16", "width": 216}],
+        **fields,
+    )
+
+
+def test_crops_every_ratio_from_one_master_by_default(renders):
+    result = asyncio.run(ImageGenerator.render_image_variants(request()))
+    assert renders == ["1:1"]
+    assert [m["aspectRatio"] for m in result["masters"]] == ["1:1"]
+    assert [(v["source"], v["width"], v["height"]) for v in result["variants"]] == [
+        ("upstream", 512, 512), ("derived", 512, 288), ("derived", 216, 384),
+    ]
+
+
+def test_renders_each_ratio_when_cropping_is_off(renders):
+    result = asyncio.run(ImageGenerator.render_image_variants(request(cropFromMaster=False)))
+    assert renders == ["1:1", "16:9", "9:16"]
+    assert [(v["source"], v["width"], v["height"]) for v in result["variants"]] == [
+        ("upstream", 512, 512), ("derived", 768, 432), ("derived", 216, 384),
+    ]
@@ -0,0 +1,38 @@
+import asyncio
+
+from services import job_service
+
+
+def test_busy_key_does_not_starve_other_keys():
+    async def run():
+        queue = job_service.JobQueue(job_service.MemoryJobBackend(), workers=2, per_key_limit=1)
+        release = asyncio.Event()
+        order = []
+
+        async def slow(payload):
+            await release.wait()
+            order.append(payload["n"])
+            return payload["n"]
+
+        async def fast(payload):
+            order.append(payload["n"])
+            return payload["n"]
+
+        queue.register("slow", slow)
+        queue.register("fast", fast)
+        burst = [await queue.submit("slow", {"n": n}, key="busy") for n in range(4)]
+        other = await queue.submit("fast", {"n": "other"}, key="other")
+
+        # One worker runs the busy key's first job; the rest of the burst is
+        # parked instead of holding the second worker.
+        done = await queue.wait(other["id"], timeout=2)
+        assert done["status"] == job_service.SUCCEEDED
+        assert queue.stats()["parked"] == 3
+
+        release.set()
+        for job in burst:
+            assert (await queue.wait(job["id"], timeout=2))["status"] == job_service.SUCCEEDED
+        await queue.stop()
+        return order
+
+    assert asyncio.run(run()) == ["other", 0, 1, 2, 3]
@@ -0,0 +1,72 @@
+import glob
+import os
+
+import pytest
+
+from services import llm_json_service
+
+CORPUS = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "bench", "corpus", "*.txt")))
+
+
+def read(path: str) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def stream(text: str, chunk_size: int):
+    parser = llm_json_service.StreamingParser()
+    members = []
+    for i in range(0, len(text), chunk_size):
+        members.extend(parser.feed(text[i:i + chunk_size]))
+    return members, parser.close()
+
+
+@pytest.mark.parametrize("path", CORPUS, ids=os.path.basename)
+def test_every_corpus_file_parses(path):
+    text = read(path)
+    value = llm_json_service.parse_llm_json(text)
+    assert isinstance(value, (dict, list)) and value
+    assert "[1]" not in repr(value)
+    for chunk_size in (1, 7, 64):
+        _, streamed = stream(text, chunk_size)
+        assert streamed == value
+
+
+def test_corpus_is_not_empty():
+    assert len(CORPUS) >= 5
+
+
+def test_repairs_keep_legitimate_values():
+    value = llm_json_service.parse_llm_object(
+        "Sure! ```json\n{title: 'Top [3] tips', “opens”: \"Doors open 10:30\", tags: ['a', 'b',],}[1]\n```"
+    )
+    assert value == {"title": "Top [3] tips", "opens": "Doors open 10:30", "tags": ["a", "b"]}
+
+
+def test_no_json_raises():
+    with pytest.raises(llm_json_service.LLMJSONError):
+        llm_json_service.parse_llm_object("Sorry, I can't help with that.")
+
+
+def test_streaming_parser_emits_each_top_level_member_once_complete():
+    parser = llm_json_service.StreamingParser(openers="{")
+    assert parser.feed('Here you go[1]: {"a": {"x": [1, 2') == []
+    # A comma nested inside the member, or inside a string, isn't a boundary.
+    assert parser.feed('], "y": "p, q"}, "b": "one, ') == [("a", {"x": [1, 2], "y": "p, q"})]
+    assert parser.feed('two}", "c"') == [("b", "one, two}")]
+    assert parser.feed(": [3]}") == [("c", [3])]
+    assert parser.done
+    assert parser.close() == {"a": {"x": [1, 2], "y": "p, q"}, "b": "one, two}", "c": [3]}
+
+
+def test_streaming_parser_array_root_and_truncated_tail():
+    parser = llm_json_service.StreamingParser()
+    assert parser.feed('[{"n": 1}, {"n": 2}, {"n": 3, "t": "cut') == [(0, {"n": 1}), (1, {"n": 2})]
+    assert parser.close() == [{"n": 1}, {"n": 2}, {"n": 3, "t": "cut"}]
+
+
+def test_streaming_parser_without_json_raises_on_close():
+    parser = llm_json_service.StreamingParser()
+    parser.feed("No JSON here.")
+    with pytest.raises(llm_json_service.LLMJSONError):
+        parser.close()
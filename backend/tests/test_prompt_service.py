@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import httpx
+
+import main
+from services import dataforseo_service, gemini_service, keyword_metrics_service, prompt_service
+
+
+def test_short_values_pass_through_with_whitespace_collapsed():
+    assert prompt_service.clip("  Lotus   Flow\nYoga ", "short") == "Lotus Flow Yoga"
+    assert prompt_service.clip(None, "short") == ""
+
+
+def test_clip_stays_within_budget_at_a_word_boundary(monkeypatch):
+    monkeypatch.setenv("PROMPT_BUDGET_DESCRIPTION", "20")
+    text = " ".join(f"word{i}" for i in range(100))
+    clipped = prompt_service.clip(text, "description")
+    assert prompt_service.count_tokens(clipped) <= 20 + prompt_service.count_tokens(prompt_service.ELLIPSIS)
+    assert clipped.endswith(prompt_service.ELLIPSIS)
+    assert text.startswith(clipped[:-len(prompt_service.ELLIPSIS)] + " ")
+
+
+def test_clip_drops_repeated_sentences_and_prefers_sentence_ends(monkeypatch):
+    monkeypatch.setenv("PROMPT_BUDGET_DESCRIPTION", "10")
+    text = "We teach yoga in Austin. We teach yoga in Austin. " * 5 + "Classes run daily at the rooftop studio downtown and online for everyone."
+    clipped = prompt_service.clip(text, "description")
+    assert clipped == "We teach yoga in Austin."
+    assert prompt_service.clip(text, "description") == clipped  # deterministic
+
+
+def test_listing_dedupes_and_keeps_leading_items_within_budget(monkeypatch):
+    monkeypatch.setenv("PROMPT_BUDGET_LIST", "6")
+    assert prompt_service.listing(["Wellness", "wellness ", "Yoga", "Running", "Cycling", "Hiking"]) == \
+        "Wellness, Yoga"
+    assert prompt_service.listing("Wellness, yoga") == "Wellness, yoga"
+
+
+def test_hashtags_and_answers():
+    assert prompt_service.hashtags(["#Yoga", "yoga", "Austin", "#austin", None]) == "#Yoga #Austin"
+    assert prompt_service.answers({"Tone?": "Calm", "Offer?": " ", "Length?": "30s"}) == "Tone?: Calm\nLength?: 30s"
+
+
+def test_budget_reads_overrides(monkeypatch):
+    assert prompt_service.budget("short") == prompt_service.DEFAULT_BUDGETS["short"]
+    monkeypatch.setenv("PROMPT_BUDGET_SHORT", "5")
+    assert prompt_service.budget("short") == 5
+
+
+def test_market_trends_prompt_is_clipped(monkeypatch, tmp_path):
+    prompts = []
+
+    class Model:
+        async def generate_content(self, prompt, **config):
+            prompts.append(prompt)
+            return json.dumps({"keywords": ["yoga austin"]})
+
+    async def search_volume(keywords, location_code, language_code):
+        return [{"keyword": k, "search_volume": 10, "cpc": 1.0, "competition": 0.1} for k in keywords]
+
+    monkeypatch.setattr(gemini_service, "_model", Model())
+    monkeypatch.setattr(dataforseo_service, "configured", lambda: True)
+    monkeypatch.setattr(dataforseo_service, "search_volume", search_volume)
+    monkeypatch.setattr(keyword_metrics_service, "_store",
+                        keyword_metrics_service.KeywordMetricsStore(str(tmp_path / "keywords.sqlite3")))
+    monkeypatch.setattr(keyword_metrics_service, "_batcher", None)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            return await client.post("/market-trends", json={
+                "businessName": "Lotus Flow Yoga " * 50, "businessDescription": "A calm yoga studio. " * 500,
+                "industry": "Fitness", "location": "Austin, TX",
+            })
+
+    assert asyncio.run(run()).status_code == 200
+    budgets = sum(prompt_service.budget(f) for f in ("short", "description", "short", "short"))
+    assert prompt_service.count_tokens(prompts[0]) < budgets + 150
+    assert prompts[0].count("A calm yoga studio.") == 1
@@ -0,0 +1,87 @@
+"""/recommendation/generate-recommendation/stream against stubbed Perplexity and traffic calls."""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import main
+from routers.strategic_campaign_planner import recommendation
+from services import campaign_store_service, competitor_service, perplexity_service, similarity_service
+
+REQUEST = {
+    "businessName": "Lotus Flow Yoga", "businessDescription": "Boutique yoga studio with sunrise rooftop classes.",
+    "businessGoals": ["Grow memberships"], "demographics": ["25-40"], "interests": ["Wellness"],
+    "location": "Austin, TX", "industry": "Fitness",
+}
+COMPETITORS = [{"name": "Sun Yoga", "domain": "sunyoga.com", "description": "Studio downtown.",
+                "estimatedMonthlyTraffic": "5K", "marketingChannels": ["Instagram"], "strength": "", "weakness": ""}]
+STRATEGY = {
+    "recommendedPlatforms": [{"name": "Instagram", "matchScore": 90, "rationale": "Visual.", "campaignTypes": ["Reels"]}],
+    "notRecommendedPlatforms": [{"name": "LinkedIn", "matchScore": 10, "rationale": "B2B."}],
+    "keywords": {"globalKeywords": ["yoga"], "localKeywords": ["yoga austin"]},
+    "competitors": COMPETITORS,
+    "strategyTips": ["Post daily."],
+    "localContext": {"weatherSummary": "Sunny.", "eventsSummary": []},
+}
+CONTENT = [{"platform": "Instagram", "recommendations": [{"caption": "Flow", "explanation": "", "hashtags": []}]}]
+
+
+@pytest.fixture
+def upstreams(monkeypatch, tmp_path):
+    async def stream_chat_content(prompt, **kwargs):
+        text = json.dumps(STRATEGY)
+        for i in range(0, len(text), 40):
+            yield text[i:i + 40]
+
+    async def generate_content_recommendation(description, platform_names, mode=None):
+        return CONTENT
+
+    monkeypatch.setenv("PERPLEXITY_API_KEY", "test")
+    monkeypatch.setattr(perplexity_service, "stream_chat_content", stream_chat_content)
+    monkeypatch.setattr(recommendation, "generate_content_recommendation", generate_content_recommendation)
+    store = campaign_store_service.CampaignStore(str(tmp_path / "campaigns.sqlite3"))
+    monkeypatch.setattr(campaign_store_service, "_store", store)
+    monkeypatch.setattr(similarity_service, "SIMILARITY_ENABLED", True)
+    monkeypatch.setattr(similarity_service, "_index", similarity_service.SimilarityIndex(str(tmp_path / "sim.sqlite3")))
+    return store
+
+
+def stream() -> list:
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            response = await client.post("/recommendation/generate-recommendation/stream", json=REQUEST)
+            return [json.loads(line) for line in response.text.splitlines()]
+    return asyncio.run(run())
+
+
+def test_failed_enrichment_keeps_unenriched_competitors(upstreams, monkeypatch):
+    async def enrich_competitors(competitors):
+        raise RuntimeError("traffic provider down")
+
+    monkeypatch.setattr(competitor_service, "enrich_competitors", enrich_competitors)
+    lines = stream()
+    by_section = {line["section"]: line.get("data") for line in lines}
+
+    assert {"section": "error", "data": {"section": "competitors", "detail": "traffic provider down"}} in lines
+    assert by_section["competitors"] == COMPETITORS
+    assert lines[-1] == {"section": "done"}
+    campaign = asyncio.run(upstreams.get(by_section["campaignId"]))
+    assert campaign["competitors"] == COMPETITORS
+
+
+def test_streamed_strategy_is_indexed_for_reuse(upstreams, monkeypatch):
+    async def enrich_competitors(competitors):
+        return [{**c, "estimatedMonthlyTraffic": 4321, "traffic": {"monthlyVisits": 4321}} for c in competitors]
+
+    monkeypatch.setattr(competitor_service, "enrich_competitors", enrich_competitors)
+
+    lines = stream()
+    assert "campaignId" in {line["section"] for line in lines}
+
+    partition, features = recommendation.strategy_similarity_key(recommendation.RecommendationRequest(**REQUEST))
+    match = asyncio.run(similarity_service.find("recommendation", partition, features))
+    assert match is not None
+    # Indexed as the LLM wrote it, like the non-streaming endpoint.
+    assert match["output"] == STRATEGY
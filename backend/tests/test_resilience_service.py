@@ -0,0 +1,154 @@
+"""resilience_service.request against an httpx.MockTransport: retries,
+Retry-After, circuit breaker and request deadline."""
+import asyncio
+import itertools
+import time
+
+import httpx
+import pytest
+
+from services import resilience_service, scheduler_service
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def provider():
+    """A provider with a fast policy of its own, so tests don't share breakers."""
+    name = f"test{next(_names)}"
+    resilience_service.POLICIES[name] = resilience_service.ProviderPolicy(
+        name, connect_timeout=1, read_timeout=1, max_attempts=3, base_delay=0.01, max_delay=0.02,
+        failure_threshold=3, reset_timeout=0.2,
+    )
+    yield name
+    resilience_service.POLICIES.pop(name, None)
+    resilience_service._breakers.pop(name, None)
+    scheduler_service._schedulers.pop(name, None)
+
+
+class Upstream:
+    """Answers each call with the next item of `plan`: a status code, a
+    (status, headers) pair, or an exception to raise."""
+
+    def __init__(self, *plan):
+        self.plan = list(plan)
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        step = self.plan.pop(0) if self.plan else 200
+        if isinstance(step, Exception):
+            raise step
+        status, headers = step if isinstance(step, tuple) else (step, {})
+        return httpx.Response(status, headers=headers, json={}, request=request)
+
+
+def call(provider: str, upstream, deadline=None) -> httpx.Response:
+    async def run():
+        resilience_service.set_deadline(deadline)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client:
+            return await resilience_service.request(
+                provider, lambda timeout: client.get("http://upstream.test/", timeout=timeout)
+            )
+    return asyncio.run(run())
+
+
+def open_circuit(provider: str):
+    assert call(provider, Upstream(503, 503, 503)).status_code == 503
+    assert resilience_service.get_breaker(provider).state == resilience_service.CircuitBreaker.OPEN
+
+
+def test_retries_5xx_then_succeeds(provider):
+    upstream = Upstream(503, 502, 200)
+    assert call(provider, upstream).status_code == 200
+    assert upstream.calls == 3
+
+
+def test_honors_retry_after(provider):
+    upstream = Upstream((429, {"retry-after": "0.3"}), 200)
+    started = time.monotonic()
+    assert call(provider, upstream).status_code == 200
+    assert time.monotonic() - started >= 0.3
+    assert upstream.calls == 2
+
+
+def test_retries_read_timeout(provider):
+    upstream = Upstream(httpx.ReadTimeout("slow"), 200)
+    assert call(provider, upstream).status_code == 200
+    assert upstream.calls == 2
+
+
+def test_returns_last_response_after_max_attempts(provider):
+    upstream = Upstream(500, 500, 500, 200)
+    assert call(provider, upstream).status_code == 500
+    assert upstream.calls == 3
+
+
+def test_client_errors_are_not_retried(provider):
+    upstream = Upstream(400)
+    assert call(provider, upstream).status_code == 400
+    assert upstream.calls == 1
+
+
+def test_open_circuit_rejects_without_calling_or_spending_a_token(provider, monkeypatch):
+    open_circuit(provider)
+    scheduler = scheduler_service.get_scheduler(provider)
+    acquired = []
+    original = scheduler.acquire
+
+    async def acquire(*args, **kwargs):
+        acquired.append(args)
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(scheduler, "acquire", acquire)
+    upstream = Upstream(200)
+    with pytest.raises(resilience_service.CircuitOpenError):
+        call(provider, upstream)
+    assert upstream.calls == 0
+    assert acquired == []
+
+
+def test_half_open_probe_closes_circuit(provider):
+    open_circuit(provider)
+    time.sleep(0.25)
+    assert call(provider, Upstream(200)).status_code == 200
+    assert resilience_service.get_breaker(provider).state == resilience_service.CircuitBreaker.CLOSED
+
+
+def test_failed_half_open_probe_reopens_circuit(provider):
+    open_circuit(provider)
+    time.sleep(0.25)
+    upstream = Upstream(503, 200)
+    with pytest.raises(resilience_service.CircuitOpenError):
+        call(provider, upstream)
+    assert upstream.calls == 1
+    assert resilience_service.get_breaker(provider).state == resilience_service.CircuitBreaker.OPEN
+
+
+def test_non_transport_error_in_half_open_probe_releases_it(provider):
+    open_circuit(provider)
+    time.sleep(0.25)
+    with pytest.raises(ValueError):
+        call(provider, Upstream(ValueError("bug in send")))
+    # The probe was given back: the next call probes and closes the circuit.
+    assert call(provider, Upstream(200)).status_code == 200
+    assert resilience_service.get_breaker(provider).state == resilience_service.CircuitBreaker.CLOSED
+
+
+def test_deadline_stops_retries(provider):
+    upstream = Upstream((503, {"retry-after": "5"}), 200)
+    started = time.monotonic()
+    with pytest.raises(resilience_service.DeadlineExceeded):
+        call(provider, upstream, deadline=1)
+    assert time.monotonic() - started < 1
+    assert upstream.calls == 1
+
+
+def test_expired_deadline_sends_nothing_and_frees_the_probe(provider):
+    open_circuit(provider)
+    time.sleep(0.25)
+    upstream = Upstream(200)
+    with pytest.raises(resilience_service.DeadlineExceeded):
+        call(provider, upstream, deadline=-1)
+    assert upstream.calls == 0
+    assert call(provider, upstream).status_code == 200
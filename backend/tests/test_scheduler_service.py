@@ -0,0 +1,28 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from services import scheduler_service
+
+
+def sample(name: str, provider: str, priority: str) -> float:
+    return REGISTRY.get_sample_value(name, {"provider": provider, "priority": priority}) or 0.0
+
+
+def test_queue_depth_and_wait_are_exported():
+    scheduler = scheduler_service.ProviderScheduler("metrics-test", rpm=0)
+    seen_depth = []
+
+    async def run():
+        # Held back as after a 429, so the call has to queue.
+        await scheduler.pause(0.3)
+        queued = asyncio.create_task(scheduler.acquire(priority=scheduler_service.BACKGROUND))
+        await asyncio.sleep(0.05)
+        seen_depth.append(sample("scheduler_queue_depth", "metrics-test", "background"))
+        await queued
+
+    asyncio.run(run())
+    assert seen_depth == [1.0]
+    assert sample("scheduler_queue_depth", "metrics-test", "background") == 0.0
+    assert sample("scheduler_wait_seconds_count", "metrics-test", "background") == 1.0
+    assert sample("scheduler_wait_seconds_sum", "metrics-test", "background") > 0.2
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from services import similarity_service
+
+DESCRIPTION = ("Boutique yoga studio in Austin offering vinyasa, hot yoga and prenatal classes "
+               "for busy professionals, with sunrise rooftop sessions and a friendly community")
+FIELDS = {"goals": ["Grow memberships", "Fill weekday classes"], "interests": ["Wellness", "Mindfulness"]}
+
+
+def feature_set(description=DESCRIPTION, **fields):
+    return similarity_service.features(description, **{**FIELDS, **fields})
+
+
+@pytest.fixture
+def index(tmp_path):
+    return similarity_service.SimilarityIndex(str(tmp_path / "similarity.sqlite3"))
+
+
+def find(index, partition, features, namespace="strategy"):
+    return asyncio.run(index.find(namespace, partition, features))
+
+
+def test_list_order_and_case_do_not_change_features():
+    assert feature_set() == feature_set(goals=["fill weekday classes", "GROW memberships"])
+
+
+def test_near_duplicate_above_threshold_is_a_hit(index):
+    asyncio.run(index.add("strategy", "instagram|austin tx", feature_set(), {"plan": "A"}, 12.5))
+    edited = DESCRIPTION.replace("busy professionals", "busy young professionals")
+    match = find(index, "instagram|austin tx", feature_set(edited))
+    assert match is not None
+    assert match["output"] == {"plan": "A"}
+    assert match["generationSeconds"] == 12.5
+    assert match["similarity"] >= similarity_service.threshold("strategy")
+
+
+def test_different_business_below_threshold_is_a_miss(index):
+    asyncio.run(index.add("strategy", "instagram|austin tx", feature_set(), {"plan": "A"}, 12.5))
+    other = feature_set("Family-owned bakery selling sourdough, croissants and custom birthday cakes downtown",
+                        goals=["Sell more cakes"], interests=["Baking"])
+    assert find(index, "instagram|austin tx", other) is None
+
+
+def test_threshold_is_per_namespace(index, monkeypatch):
+    asyncio.run(index.add("strategy", "p", feature_set(), {"plan": "A"}, 1.0))
+    edited = feature_set(DESCRIPTION.replace("friendly community", "welcoming neighbourhood community"))
+    assert find(index, "p", edited) is not None
+    monkeypatch.setenv("SIMILARITY_THRESHOLD_STRATEGY", "0.99")
+    assert find(index, "p", edited) is None
+
+
+def test_partitions_and_namespaces_are_isolated(index):
+    asyncio.run(index.add("strategy", similarity_service.partition_key("Instagram", "Austin, TX"),
+                          feature_set(), {"plan": "A"}, 1.0))
+    assert find(index, similarity_service.partition_key("instagram", "austin tx"), feature_set()) is not None
+    assert find(index, similarity_service.partition_key("Instagram", "Dallas, TX"), feature_set()) is None
+    assert find(index, similarity_service.partition_key("Instagram", "Austin, TX"), feature_set(),
+                namespace="content") is None
+
+
+def test_reuse_or_generate_indexes_new_generations(index, monkeypatch):
+    monkeypatch.setattr(similarity_service, "SIMILARITY_ENABLED", True)
+    monkeypatch.setattr(similarity_service, "_index", index)
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        return {"plan": len(calls)}
+
+    async def run():
+        first = await similarity_service.reuse_or_generate("strategy", "p", feature_set(), generate)
+        second = await similarity_service.reuse_or_generate("strategy", "p", feature_set(), generate)
+        return first, second
+
+    assert asyncio.run(run()) == ({"plan": 1}, {"plan": 1})
+    assert len(calls) == 1
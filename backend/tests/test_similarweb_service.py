@@ -0,0 +1,58 @@
+"""similarweb_service.fetch_traffic against an httpx.MockTransport."""
+import asyncio
+
+import httpx
+import pytest
+
+from services import similarweb_service
+
+VISITS = {"visits": [{"date": "2026-07-01", "visits": 1200.4}, {"date": "2026-08-01", "visits": 1500.6}]}
+RANK = {"similar_rank": {"rank": 4321}}
+
+
+def fetch(monkeypatch, visits, rank):
+    """fetch_traffic with each endpoint answering a (status, json-or-text) pair."""
+    def handler(request):
+        status, body = rank if "/similar-rank/" in request.url.path else visits
+        if isinstance(body, dict):
+            return httpx.Response(status, json=body)
+        return httpx.Response(status, text=body)
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(similarweb_service, "_client", client)
+        try:
+            return await similarweb_service.fetch_traffic("example.com")
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_visits_and_rank(monkeypatch):
+    assert fetch(monkeypatch, (200, VISITS), (200, RANK)) == {
+        "monthlyVisits": 1501,
+        "visitsByMonth": [{"month": "2026-07", "visits": 1200}, {"month": "2026-08", "visits": 1501}],
+        "globalRank": 4321,
+    }
+
+
+@pytest.mark.parametrize("status, body", [
+    (404, "Not found"),
+    (400, '{"meta": {"status": "Error", "error_message": "Data not found"}}'),
+])
+def test_unknown_domain_is_no_data(monkeypatch, status, body):
+    assert fetch(monkeypatch, (status, body), (status, body)) is None
+
+
+@pytest.mark.parametrize("status", [400, 401, 403])
+def test_other_client_errors_raise(monkeypatch, status):
+    with pytest.raises(similarweb_service.SimilarwebError) as error:
+        fetch(monkeypatch, (status, "Invalid API key"), (200, RANK))
+    assert error.value.status_code == status
+
+
+def test_failed_rank_keeps_visits(monkeypatch):
+    traffic = fetch(monkeypatch, (200, VISITS), (403, "Rank not in plan"))
+    assert traffic["monthlyVisits"] == 1501
+    assert traffic["globalRank"] is None
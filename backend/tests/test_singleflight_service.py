@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from services import singleflight_service
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    group = singleflight_service.SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    async def run():
+        results = await asyncio.gather(*(group.do("key", fetch, namespace="test") for _ in range(10)))
+        # Finished calls aren't remembered: the next one goes upstream again.
+        await group.do("key", fetch, namespace="test")
+        return results
+
+    results = asyncio.run(run())
+    assert results == [{"answer": 42}] * 10
+    assert len(calls) == 2
+    assert group._inflight == {}
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    group = singleflight_service.SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return "done"
+
+    async def run():
+        first = asyncio.create_task(group.do("key", fetch))
+        second = asyncio.create_task(group.do("key", fetch))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
+    assert len(calls) == 1
+
+
+def test_errors_reach_every_waiter():
+    group = singleflight_service.SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream")
+
+    async def run():
+        return await asyncio.gather(*(group.do("key", fail) for _ in range(3)), return_exceptions=True)
+
+    assert [type(r) for r in asyncio.run(run())] == [ValueError] * 3
@@ -0,0 +1,66 @@
+"""/market-trends must not block the event loop while it waits on Gemini and DataForSEO."""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import main
+from services import gemini_service, dataforseo_service, keyword_metrics_service
+
+UPSTREAM_SECONDS = 0.4
+TRENDS_CALLS = 10
+MAX_PROBE_SECONDS = 0.1
+
+
+class SlowModel:
+    async def generate_content(self, prompt: str, **config) -> str:
+        await asyncio.sleep(UPSTREAM_SECONDS)
+        return json.dumps({"keywords": ["yoga austin", "hot yoga", "prenatal yoga"]})
+
+
+async def slow_search_volume(keywords, location_code, language_code):
+    await asyncio.sleep(UPSTREAM_SECONDS)
+    return [{"keyword": k, "search_volume": 100, "cpc": 1.0, "competition": 0.5} for k in keywords]
+
+
+@pytest.fixture
+def slow_upstreams(monkeypatch, tmp_path):
+    monkeypatch.setattr(gemini_service, "_model", SlowModel())
+    monkeypatch.setattr(dataforseo_service, "configured", lambda: True)
+    monkeypatch.setattr(dataforseo_service, "search_volume", slow_search_volume)
+    monkeypatch.setattr(keyword_metrics_service, "_store",
+                        keyword_metrics_service.KeywordMetricsStore(str(tmp_path / "keywords.sqlite3")))
+    monkeypatch.setattr(keyword_metrics_service, "_batcher", None)
+
+
+def test_cheap_routes_stay_fast_during_trends_calls(slow_upstreams):
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            trends = [
+                asyncio.create_task(client.post("/market-trends", json={
+                    "businessName": f"Lotus Flow Yoga {i}", "businessDescription": "Yoga studio.",
+                    "industry": "Fitness", "location": "Austin, TX",
+                }))
+                for i in range(TRENDS_CALLS)
+            ]
+            started = time.perf_counter()
+            probes = []
+            while not all(task.done() for task in trends):
+                probe_started = time.perf_counter()
+                response = await client.get("/stats")
+                assert response.status_code == 200
+                probes.append(time.perf_counter() - probe_started)
+                await asyncio.sleep(0.02)
+            burst = time.perf_counter() - started
+            return [task.result() for task in trends], probes, burst
+
+    responses, probes, burst = asyncio.run(run())
+    assert [r.status_code for r in responses] == [200] * TRENDS_CALLS
+    assert responses[0].json()["keywords"][0]["volume"] == 100
+    assert len(probes) >= 5
+    assert max(probes) < MAX_PROBE_SECONDS
+    # Serialised calls would take TRENDS_CALLS x (Gemini + DataForSEO).
+    assert burst < 4 * UPSTREAM_SECONDS
@@ -12,7 +12,7 @@ const ImageGenerator = () => {
   const imageRef = useRef(null);
   const overlayRef = useRef(null);
 
-  const getFullImageSrc = (base64) => `data:image/png;base64,${base64}`;
+  const getFullImageSrc = (url) => (url.startsWith('/') ? `http://localhost:8000${url}` : url);
 
   const handleSave = ({ imageBase64 }) => {
     setEditedImage(getFullImageSrc(imageBase64));
@@ -49,13 +49,14 @@ const ImageGenerator = () => {
     setLoading(true);
     try {
       const campaignData = JSON.parse(localStorage.getItem('campaignData'));
+      const campaignRef = campaignData?.campaignId ? { campaignId: campaignData.campaignId } : { campaignData };
       const scriptQA = JSON.parse(localStorage.getItem('scriptQA'));
       const script = localStorage.getItem('generatedScript');
 
       const response = await fetch('http://localhost:8000/generate-image-ad', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ campaignData, scriptQA, script })
+        body: JSON.stringify({ ...campaignRef, scriptQA, script })
       });
 
       if (!response.ok) {
@@ -63,7 +64,7 @@ const ImageGenerator = () => {
       }
 
       const data = await response.json();
-      setImageUrl(data.imageUrl); // Base64 string only, prefix will be handled
+      setImageUrl(data.imageUrl); // Asset URL, relative to the API unless ASSET_PUBLIC_URL is set
     } catch (err) {
       alert('Error generating image');
       console.error(err);
@@ -17,6 +17,8 @@ const ScriptGenerator = () => {
   const [showGenerateVideo, setShowGenerateVideo] = useState(false);
 
   const stored = JSON.parse(localStorage.getItem('campaignData')) || {};
+  // Campaigns saved by the backend are referenced by id; older ones are sent inline.
+  const campaignRef = stored.campaignId ? { campaignId: stored.campaignId } : { campaignData: stored };
 
   useEffect(() => {
     const savedScript = localStorage.getItem('generatedScript');
@@ -44,7 +46,7 @@ const ScriptGenerator = () => {
       const res = await fetch('http://127.0.0.1:8000/script/ask-questions', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ platform: selected, campaignData: stored })
+        body: JSON.stringify({ platform: selected, ...campaignRef })
       });
       const data = await res.json();
       setAdTypeOptions(data.recommendedAdTypes);
@@ -66,7 +68,7 @@ const ScriptGenerator = () => {
       const res = await fetch(`http://127.0.0.1:8000/script/ask-questions/${encodeURIComponent(selectedAdType)}`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ platform, campaignData: stored })
+        body: JSON.stringify({ platform, ...campaignRef })
       });
       const data = await res.json();
       setQuestions(data.questions);
@@ -94,16 +96,42 @@ const ScriptGenerator = () => {
       const payload = {
         platform,
         adType,
-        campaignData: stored,
+        ...campaignRef,
         answers
       };
-      const response = await fetch('http://127.0.0.1:8000/script/generate-script', {
+      const response = await fetch('http://127.0.0.1:8000/script/generate-script/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify(payload)
       });
-      const data = await response.json();
-      const finalScript = data.script || 'No script returned';
+
+      // Server-Sent Events: show tokens as they arrive, the `done` event carries the full script.
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let partial = '';
+      let finalScript = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || 'null');
+          if (event === 'token') {
+            partial += data;
+            setScript(partial);
+            setLoading(false);
+          } else if (event === 'done') {
+            finalScript = data.script;
+          } else if (event === 'error') {
+            throw new Error(data.detail);
+          }
+        }
+      }
+      finalScript = finalScript || 'No script returned';
       setScript(finalScript);
       localStorage.setItem('generatedScript', finalScript);
 